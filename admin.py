@@ -20,16 +20,17 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import datetime, traceback, sys, urllib
+import datetime, threading, traceback, sys, urllib
 from django.contrib import admin, messages
 import django.core.management
 from django.core.urlresolvers import reverse
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.http import HttpResponseRedirect
 from django.utils import timezone, translation
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext as _
 
+from superlachaise_api import counters, reference_data, search_index
 from superlachaise_api.models import *
 
 class AdminUtils():
@@ -72,7 +73,7 @@ class AdminUtils():
         """ Return the localized object for the current language if it exists """
         
         # Get current language
-        language = Language.objects.filter(code=translation.get_language().split("-", 1)[0]).first()
+        language = reference_data.language(translation.get_language().split("-", 1)[0])
         
         if language:
             return object.localizations.filter(language=language).first()
@@ -120,6 +121,48 @@ class AdminUtils():
             
             return mark_safe(result)
 
+class SearchIndexAdmin(admin.ModelAdmin):
+    """ A model admin searching the words in the search index and in the search_fields which are not indexed, without duplicating rows """
+    
+    # The joined search_fields whose values are already in the search index of the model
+    indexed_search_fields = ()
+    
+    def get_search_results(self, request, queryset, search_term):
+        local_search_fields = [search_field for search_field in self.search_fields if not '__' in search_field]
+        joined_search_fields = [search_field for search_field in self.search_fields if '__' in search_field and not search_field in self.indexed_search_fields]
+        if search_term.split():
+            search_index.build_if_empty()
+        for search_term_part in search_term.split():
+            search_filter = search_index.term_filter(queryset.model, search_term_part)
+            for search_field in local_search_fields:
+                search_filter = search_filter | Q(**{search_field + '__icontains': search_term_part})
+            # Joined fields are searched in a subquery of the matching ids, so that the results need no distinct
+            for search_field in joined_search_fields:
+                search_filter = search_filter | Q(pk__in=queryset.model.objects.filter(**{search_field + '__icontains': search_term_part}).order_by().values('pk'))
+            queryset = queryset.filter(search_filter)
+        
+        return queryset, False
+
+class CountersAdmin(admin.ModelAdmin):
+    """ A model admin reading each type of counters once per request instead of once per listed object """
+    
+    def __init__(self, *args, **kwargs):
+        super(CountersAdmin, self).__init__(*args, **kwargs)
+        # Model admins are shared by the threads serving requests
+        self.request_counters = threading.local()
+    
+    def get_queryset(self, request):
+        # Changelists and change forms read their objects first
+        self.request_counters.values = {}
+        return super(CountersAdmin, self).get_queryset(request)
+    
+    def counter_value(self, counter_type, key):
+        if getattr(self.request_counters, 'values', None) is None:
+            self.request_counters.values = {}
+        if not counter_type in self.request_counters.values:
+            self.request_counters.values[counter_type] = counters.values(counter_type)
+        return self.request_counters.values[counter_type].get(key, 0)
+
 class LocalizedSynchronizationInline(admin.StackedInline):
     model = LocalizedSynchronization
     extra = 0
@@ -215,7 +258,7 @@ class SettingAdmin(admin.ModelAdmin):
     actions = [delete_notes]
 
 @admin.register(OpenStreetMapElement)
-class OpenStreetMapElementAdmin(admin.ModelAdmin):
+class OpenStreetMapElementAdmin(SearchIndexAdmin):
     list_display = ('__unicode__', 'name', 'sorting_name', 'openstreetmap_id', 'type', 'openstreetmap_link', 'wikidata_links', 'wikimedia_commons_link', 'latitude', 'longitude', 'modified', 'notes')
     list_filter = ('type', 'nature',)
     search_fields = ('name', 'openstreetmap_id', 'wikidata', 'wikimedia_commons', 'notes',)
@@ -267,9 +310,10 @@ class WikidataLocalizedEntryInline(admin.StackedInline):
     wikipedia_link.admin_order_field = 'wikipedia'
 
 @admin.register(WikidataEntry)
-class WikidataEntryAdmin(admin.ModelAdmin):
+class WikidataEntryAdmin(SearchIndexAdmin):
     list_display = ('__unicode__', 'name', 'wikidata_link', 'instance_of_link', 'sex_or_gender_link', 'occupations_link', 'grave_of_wikidata_link', 'wikimedia_commons_category_link', 'wikimedia_commons_grave_category_link', 'burial_plot_reference', 'date_of_birth_with_accuracy', 'date_of_death_with_accuracy', 'modified', 'notes')
     search_fields = ('localizations__name', 'wikidata_id', 'instance_of', 'sex_or_gender', 'occupations', 'wikimedia_commons_category', 'wikimedia_commons_grave_category', 'grave_of_wikidata', 'burial_plot_reference', 'notes',)
+    indexed_search_fields = ('localizations__name',)
     
     fieldsets = [
         (None, {'fields': ['created', 'modified', 'notes']}),
@@ -444,7 +488,7 @@ class WikipediaPageAdmin(admin.ModelAdmin):
     actions = [delete_notes, sync_entry]
 
 @admin.register(WikimediaCommonsCategory)
-class WikimediaCommonsCategoryAdmin(admin.ModelAdmin):
+class WikimediaCommonsCategoryAdmin(SearchIndexAdmin):
     list_display = ('__unicode__', 'wikimedia_commons_link', 'main_image_link', 'category_members_link', 'modified', 'notes')
     search_fields = ('wikimedia_commons_id', 'main_image', 'category_members', 'notes',)
     
@@ -485,7 +529,7 @@ class WikimediaCommonsCategoryAdmin(admin.ModelAdmin):
     actions = [delete_notes, sync_object]
 
 @admin.register(WikimediaCommonsFile)
-class WikimediaCommonsFileAdmin(admin.ModelAdmin):
+class WikimediaCommonsFileAdmin(SearchIndexAdmin):
     list_display = ('__unicode__', 'wikimedia_commons_link', 'author', 'license', 'url_512px_link', 'modified', 'notes')
     list_filter = ('license',)
     search_fields = ('wikimedia_commons_id', 'author', 'license', 'notes',)
@@ -570,10 +614,11 @@ class SuperLachaiseCategoryRelationInline(admin.StackedInline):
     verbose_name_plural = "superlachaise categories"
 
 @admin.register(SuperLachaisePOI)
-class SuperLachaisePOIAdmin(admin.ModelAdmin):
+class SuperLachaisePOIAdmin(SearchIndexAdmin):
     list_display = ('__unicode__', 'pk', 'openstreetmap_element_link', 'wikidata_entries_link', 'superlachaise_categories_link', 'burial_plot_reference', 'date_of_birth_with_accuracy', 'date_of_death_with_accuracy', 'wikimedia_commons_category_link', 'main_image_link', 'modified', 'notes')
     list_filter = ('superlachaise_categories',)
     search_fields = ('openstreetmap_element__name', 'wikidata_entries__id', 'wikidata_entries__localizations__name', 'burial_plot_reference', 'wikimedia_commons_category__id', 'main_image__id', 'notes',)
+    indexed_search_fields = ('openstreetmap_element__name', 'wikidata_entries__localizations__name',)
     
     fieldsets = [
         (None, {'fields': ['created', 'modified', 'notes']}),
@@ -683,7 +728,7 @@ class SuperLachaiseLocalizedCategoryInline(admin.StackedInline):
     ]
 
 @admin.register(SuperLachaiseCategory)
-class SuperLachaiseCategoryAdmin(admin.ModelAdmin):
+class SuperLachaiseCategoryAdmin(SearchIndexAdmin, CountersAdmin):
     list_display = ('__unicode__', 'code', 'type', 'values', 'members_count', 'wikidata_occupations_count', 'modified', 'notes')
     list_filter = ('type',)
     search_fields = ('code', 'type', 'values', 'notes',)
@@ -698,11 +743,11 @@ class SuperLachaiseCategoryAdmin(admin.ModelAdmin):
     ]
     
     def members_count(self, obj):
-        return obj.members.count()
+        return self.counter_value(Counter.CATEGORY_MEMBERS, obj.code)
     members_count.short_description = _('members count')
     
     def wikidata_occupations_count(self, obj):
-        return obj.wikidata_occupations.count()
+        return self.counter_value(Counter.CATEGORY_OCCUPATIONS, obj.code)
     wikidata_occupations_count.short_description = _('wikidata occupations count')
     
     def delete_notes(self, request, queryset):
@@ -712,7 +757,7 @@ class SuperLachaiseCategoryAdmin(admin.ModelAdmin):
     actions = [delete_notes]
 
 @admin.register(WikidataOccupation)
-class WikidataOccupationAdmin(admin.ModelAdmin):
+class WikidataOccupationAdmin(CountersAdmin):
     list_display = ('__unicode__', 'wikidata_link', 'name', 'superlachaise_category', 'used_in_link', 'modified', 'notes')
     list_filter = ('superlachaise_category',)
     list_editable = ('superlachaise_category',)
@@ -733,7 +778,7 @@ class WikidataOccupationAdmin(admin.ModelAdmin):
     wikidata_link.admin_order_field = 'wikidata_id'
     
     def used_in_count(self, obj):
-        return obj.used_in.count()
+        return self.counter_value(Counter.OCCUPATION_USAGE, obj.wikidata_id)
     used_in_count.short_description = _('used in count')
     
     def used_in_link(self, obj):
@@ -21,8 +21,55 @@ limitations under the License.
 """
 
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.utils.translation import ugettext_lazy as _
 
 class SuperLachaiseAPI(AppConfig):
     name = 'superlachaise_api'
     verbose_name = _('SuperLachaise API')
+    
+    def ready(self):
+        from django.contrib.admin.models import LogEntry
+        from superlachaise_api import changes, counters, filter_index, map_tiles, reference_data, search_index
+        from superlachaise_api.cache import invalidate_responses
+        
+        # Counters, the search index, the filter index and map tiles are updated when a synchronization ends or an admin edit is saved, before cached responses are invalidated
+        post_save.connect(counters.update_counters, sender=self.get_model('Synchronization'), dispatch_uid='superlachaise_api.synchronization_update_counters')
+        post_save.connect(counters.update_counters, sender=LogEntry, dispatch_uid='superlachaise_api.logentry_update_counters')
+        post_save.connect(search_index.update_search_index, sender=self.get_model('Synchronization'), dispatch_uid='superlachaise_api.synchronization_update_search_index')
+        post_save.connect(search_index.update_search_index, sender=LogEntry, dispatch_uid='superlachaise_api.logentry_update_search_index')
+        post_save.connect(filter_index.build_filter_index, sender=self.get_model('Synchronization'), dispatch_uid='superlachaise_api.synchronization_build_filter_index')
+        post_save.connect(filter_index.build_filter_index, sender=LogEntry, dispatch_uid='superlachaise_api.logentry_build_filter_index')
+        post_save.connect(map_tiles.build_map_tiles, sender=self.get_model('Synchronization'), dispatch_uid='superlachaise_api.synchronization_build_map_tiles')
+        post_save.connect(map_tiles.build_map_tiles, sender=LogEntry, dispatch_uid='superlachaise_api.logentry_build_map_tiles')
+        
+        # Cached responses are outdated when a synchronization ends or an admin edit is saved
+        post_save.connect(invalidate_responses, sender=self.get_model('Synchronization'), dispatch_uid='superlachaise_api.synchronization_invalidate_responses')
+        post_save.connect(invalidate_responses, sender=LogEntry, dispatch_uid='superlachaise_api.logentry_invalidate_responses')
+        
+        # Log the changes of API objects for the change feed, including deletions by sync commands
+        for model in changes.MODELS:
+            post_save.connect(changes.record_save, sender=model, dispatch_uid='superlachaise_api.%s_record_save' % model._meta.model_name)
+            post_delete.connect(changes.record_delete, sender=model, dispatch_uid='superlachaise_api.%s_record_delete' % model._meta.model_name)
+        
+        # Counters are updated for the changes of the models they count
+        for model in counters.MODELS:
+            post_save.connect(counters.record_save, sender=model, dispatch_uid='superlachaise_api.%s_record_counters_save' % model._meta.model_name)
+            post_delete.connect(counters.record_delete, sender=model, dispatch_uid='superlachaise_api.%s_record_counters_delete' % model._meta.model_name)
+        for through_model, counter_types in counters.M2M_COUNTER_TYPES:
+            m2m_changed.connect(counters.record_m2m_change, sender=through_model, dispatch_uid='superlachaise_api.%s_record_counters_change' % through_model._meta.model_name)
+        
+        # Map tiles are rebuilt for the changes of the models which can move POIs
+        for model in map_tiles.MODELS:
+            post_save.connect(map_tiles.record_save, sender=model, dispatch_uid='superlachaise_api.%s_record_map_tiles_save' % model._meta.model_name)
+            post_delete.connect(map_tiles.record_delete, sender=model, dispatch_uid='superlachaise_api.%s_record_map_tiles_delete' % model._meta.model_name)
+        
+        # The search index is updated for the changes of the indexed texts
+        for model in search_index.MODELS:
+            post_save.connect(search_index.record_save, sender=model, dispatch_uid='superlachaise_api.%s_record_search_index_save' % model._meta.model_name)
+            post_delete.connect(search_index.record_delete, sender=model, dispatch_uid='superlachaise_api.%s_record_search_index_delete' % model._meta.model_name)
+        
+        # Reference data loaded by this process is reloaded after changes
+        for model in reference_data.MODELS:
+            post_save.connect(reference_data.invalidate, sender=model, dispatch_uid='superlachaise_api.%s_invalidate_reference_data_save' % model._meta.model_name)
+            post_delete.connect(reference_data.invalidate, sender=model, dispatch_uid='superlachaise_api.%s_invalidate_reference_data_delete' % model._meta.model_name)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+"""
+cache.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib, time, urllib, uuid
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from superlachaise_api import renderers
+
+KEY_PREFIX = 'superlachaise_api'
+DATASET_VERSION_KEY = KEY_PREFIX + ':dataset_version'
+HITS_KEY = KEY_PREFIX + ':response_cache:hits'
+MISSES_KEY = KEY_PREFIX + ':response_cache:misses'
+
+# How long a request may compute a response while concurrent requests for the same key wait for it
+LOCK_TIMEOUT = 60
+LOCK_POLL_INTERVAL = 0.05
+
+def get_cache():
+    """ Return the cache configured by the RESPONSE_CACHE setting, or None if the response cache is disabled """
+    alias = getattr(settings, 'RESPONSE_CACHE', None)
+    if alias:
+        return caches[alias]
+
+def get_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', None)
+
+def dataset_version(cache):
+    version = cache.get(DATASET_VERSION_KEY)
+    if version is None:
+        # The version may have been evicted ; a new one never matches cached responses
+        cache.add(DATASET_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(DATASET_VERSION_KEY)
+    return version
+
+def bump_dataset_version():
+    cache = get_cache()
+    if cache is not None:
+        cache.set(DATASET_VERSION_KEY, uuid.uuid4().hex, None)
+
+def response_key(request, version):
+    path = '/' + '/'.join([part for part in request.path.split('/') if part])
+    if request.path.endswith('/') and path != '/':
+        path = path + '/'
+    # The format parameter is replaced by the negotiated format
+    params = [(key, value) for key in sorted(request.GET.keys()) if key != 'format' for value in request.GET.getlist(key)]
+    # Responses contain absolute URLs, which depend on the scheme and host of the request
+    full_path = request.scheme + '://' + request.get_host() + path + '?' + urllib.urlencode([(key.encode('utf-8'), value.encode('utf-8')) for (key, value) in params])
+    return u'{prefix}:response:{version}:{format}:{hash}'.format(prefix=KEY_PREFIX, version=version, format=renderers.negotiate_format(request), hash=hashlib.sha1(full_path.encode('utf-8')).hexdigest())
+
+def cached_count(queryset):
+    """ Return the count of a queryset, cached until the dataset version changes if the response cache is enabled """
+    cache = get_cache()
+    if cache is None:
+        return queryset.count()
+    
+    sql, params = queryset.query.sql_with_params()
+    key = u'{prefix}:count:{version}:{hash}'.format(prefix=KEY_PREFIX, version=dataset_version(cache), hash=hashlib.sha1(repr((sql, params))).hexdigest())
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, get_timeout())
+    return count
+
+def increment(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+def stats():
+    """ Return the (hits, misses) counters of the response cache """
+    cache = get_cache()
+    if cache is None:
+        return (0, 0)
+    return (cache.get(HITS_KEY, 0), cache.get(MISSES_KEY, 0))
+
+def reset_stats():
+    cache = get_cache()
+    if cache is not None:
+        cache.delete_many([HITS_KEY, MISSES_KEY])
+
+def cached_response(cache, key):
+    cached = cache.get(key)
+    if cached is not None:
+        (content, content_type) = cached
+        response = HttpResponse(content, content_type=content_type)
+        response['Vary'] = 'Accept'
+        response['X-Cache'] = 'HIT'
+        return response
+
+def cache_response(view):
+    """ Cache the successful GET responses of a view until the dataset version changes """
+    
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        cache = get_cache()
+        if cache is None or request.method != 'GET':
+            return view(request, *args, **kwargs)
+        
+        key = response_key(request, dataset_version(cache))
+        response = cached_response(cache, key)
+        if response is not None:
+            increment(cache, HITS_KEY)
+            return response
+        
+        # Single-flight : only the request holding the lock computes the response, the others wait for it
+        lock_key = key + ':lock'
+        locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+        if not locked:
+            deadline = time.time() + LOCK_TIMEOUT
+            while True:
+                time.sleep(LOCK_POLL_INTERVAL)
+                response = cached_response(cache, key)
+                if response is not None:
+                    increment(cache, HITS_KEY)
+                    return response
+                if cache.get(lock_key) is None or time.time() > deadline:
+                    break
+        
+        increment(cache, MISSES_KEY)
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']), get_timeout())
+            response['X-Cache'] = 'MISS'
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        
+        return response
+    
+    return wrapper
+
+def invalidate_responses(sender, **kwargs):
+    """ Signal receiver bumping the dataset version """
+    bump_dataset_version()
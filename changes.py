@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+changes.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from superlachaise_api.models import *
+
+# The fields identifying the objects of the API models across databases
+NATURAL_KEY_FIELDS = [
+    (OpenStreetMapElement, ['type', 'openstreetmap_id']),
+    (WikidataEntry, ['wikidata_id']),
+    (WikimediaCommonsCategory, ['wikimedia_commons_id']),
+    (WikimediaCommonsFile, ['wikimedia_commons_id']),
+    (SuperLachaiseCategory, ['code']),
+    (SuperLachaisePOI, ['pk']),
+]
+
+MODELS = [natural_key_model for natural_key_model, natural_key_fields in NATURAL_KEY_FIELDS]
+
+def object_type(model):
+    return model._meta.model_name
+
+def object_model(type):
+    for model in MODELS:
+        if object_type(model) == type:
+            return model
+
+def natural_key(obj):
+    natural_key_fields = dict(NATURAL_KEY_FIELDS)[obj._meta.concrete_model]
+    return u'/'.join(unicode(getattr(obj, field)) for field in natural_key_fields)
+
+def natural_key_objects(model, natural_keys):
+    """ Return the objects of a model with natural keys, by natural key """
+    natural_key_fields = dict(NATURAL_KEY_FIELDS)[model]
+    
+    # The last field may contain the separator, like Wikimedia Commons titles
+    field_values = [set() for field in natural_key_fields]
+    for key in natural_keys:
+        values = key.split(u'/', len(natural_key_fields) - 1)
+        if len(values) == len(natural_key_fields) and all(value.isdigit() for field, value in zip(natural_key_fields, values) if field == 'pk'):
+            for index, value in enumerate(values):
+                field_values[index].add(value)
+    
+    if not all(field_values):
+        return {}
+    
+    # Composite keys select the combinations of their values, filtered on the complete natural key
+    objects = model.objects.filter(**{field + '__in': values for field, values in zip(natural_key_fields, field_values)})
+    objects = objects.only('pk', 'modified', *[field for field in natural_key_fields if field != 'pk']).order_by()
+    return {natural_key(obj): obj for obj in objects if natural_key(obj) in natural_keys}
+
+def record(obj, action):
+    """ Log the change of an API object, replacing its previous entry so that the log keeps one entry per object """
+    filters = {
+        'object_type': object_type(obj._meta.concrete_model),
+        'natural_key': natural_key(obj),
+    }
+    ChangeLogEntry.objects.filter(**filters).delete()
+    ChangeLogEntry.objects.create(action=action, **filters)
+
+def record_save(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        record(instance, ChangeLogEntry.CREATE if created else ChangeLogEntry.UPDATE)
+
+def record_delete(sender, instance, **kwargs):
+    record(instance, ChangeLogEntry.DELETE)
+
+def changes(since, limit):
+    """ Return the log entries after the since sequence number in sequence order, at most limit, and whether more entries follow """
+    change_log_entries = ChangeLogEntry.objects.all()
+    if since:
+        change_log_entries = change_log_entries.filter(pk__gt=since)
+    
+    result = list(change_log_entries.order_by('pk')[:limit + 1])
+    return (result[:limit], len(result) > limit)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""
+counters.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import threading
+from django.db.models import Count
+
+from superlachaise_api import changes
+from superlachaise_api.models import *
+
+def object_counts(models=changes.MODELS):
+    return {model.__name__: model.objects.count() for model in models}
+
+def category_member_counts():
+    return dict(SuperLachaiseCategoryRelation.objects.order_by().values_list('superlachaise_category__code').annotate(Count('superlachaise_poi', distinct=True)))
+
+def category_occupation_counts():
+    return dict(WikidataOccupation.objects.exclude(superlachaise_category=None).order_by().values_list('superlachaise_category__code').annotate(Count('pk')))
+
+def occupation_usage_counts():
+    return dict(WikidataOccupation.used_in.through.objects.order_by().values_list('wikidataoccupation__wikidata_id').annotate(Count('wikidataentry')))
+
+def sector_poi_counts():
+    # Sectors are the burial plot references of wikidata entries, like the sector parameter
+    return dict(SuperLachaiseWikidataRelation.objects.exclude(wikidata_entry__burial_plot_reference='').order_by().values_list('wikidata_entry__burial_plot_reference').annotate(Count('superlachaise_poi', distinct=True)))
+
+COUNTERS = [
+    (Counter.OBJECTS, object_counts),
+    (Counter.CATEGORY_MEMBERS, category_member_counts),
+    (Counter.CATEGORY_OCCUPATIONS, category_occupation_counts),
+    (Counter.OCCUPATION_USAGE, occupation_usage_counts),
+    (Counter.SECTOR_POIS, sector_poi_counts),
+]
+
+# The counter types computed from the rows of each model ; object counts also change when API objects are created or deleted
+MODEL_COUNTER_TYPES = [
+    (SuperLachaiseCategory, [Counter.CATEGORY_MEMBERS, Counter.CATEGORY_OCCUPATIONS]),
+    (SuperLachaiseCategoryRelation, [Counter.CATEGORY_MEMBERS]),
+    (SuperLachaisePOI, [Counter.CATEGORY_MEMBERS, Counter.SECTOR_POIS]),
+    (WikidataOccupation, [Counter.CATEGORY_OCCUPATIONS, Counter.OCCUPATION_USAGE]),
+    (WikidataEntry, [Counter.OCCUPATION_USAGE, Counter.SECTOR_POIS]),
+    (SuperLachaiseWikidataRelation, [Counter.SECTOR_POIS]),
+]
+
+MODELS = [model for model, counter_types in MODEL_COUNTER_TYPES] + [model for model in changes.MODELS if not model in dict(MODEL_COUNTER_TYPES)]
+
+# The relations whose changes are sent by m2m_changed
+M2M_COUNTER_TYPES = [
+    (WikidataOccupation.used_in.through, [Counter.OCCUPATION_USAGE]),
+]
+
+# The counter types and object counts changed since the last update by this process
+changes_lock = threading.Lock()
+changed_counter_types = set()
+changed_object_models = set()
+
+def record_change(model, counter_types, count_changed):
+    with changes_lock:
+        changed_counter_types.update(counter_types)
+        if count_changed and model in changes.MODELS:
+            changed_object_models.add(model)
+
+def record_save(sender, instance, created=False, update_fields=None, **kwargs):
+    # Saving the modified date only does not change counted rows
+    if update_fields is not None and set(update_fields) == set(['modified']):
+        return
+    record_change(sender, dict(MODEL_COUNTER_TYPES).get(sender, []), created)
+
+def record_delete(sender, instance, **kwargs):
+    record_change(sender, dict(MODEL_COUNTER_TYPES).get(sender, []), True)
+
+def record_m2m_change(sender, action, **kwargs):
+    if action in ['post_add', 'post_remove', 'post_clear']:
+        record_change(sender, dict(M2M_COUNTER_TYPES)[sender], False)
+
+def pop_changes():
+    """ Return and forget the (counter types, object models) changed since the last call """
+    with changes_lock:
+        result = (set(changed_counter_types), set(changed_object_models))
+        changed_counter_types.clear()
+        changed_object_models.clear()
+    return result
+
+def update(counter_types=None, object_models=None):
+    """ Count the objects with one grouped query per counter type, and write the counters that changed ; return (created or updated, deleted) counts
+    
+    If counter_types or object_models are given, only the counters of these types and the object counts of these models are updated """
+    update_all = counter_types is None and object_models is None
+    updated = 0
+    deleted = 0
+    changed_keys = {}
+    for counter_type, counts in COUNTERS:
+        stored_counters = Counter.objects.filter(type=counter_type)
+        if update_all or counter_type in (counter_types or []):
+            values = counts()
+        elif counter_type == Counter.OBJECTS and object_models:
+            values = object_counts(object_models)
+            stored_counters = stored_counters.filter(key__in=values.keys())
+        else:
+            continue
+        stored_counters = {counter.key: counter for counter in stored_counters}
+        changed_keys[counter_type] = set()
+        
+        for key, value in values.iteritems():
+            counter = stored_counters.get(key)
+            if counter is None:
+                Counter.objects.create(type=counter_type, key=key, value=value)
+                updated = updated + 1
+                changed_keys[counter_type].add(key)
+            elif counter.value != value:
+                counter.value = value
+                counter.save()
+                updated = updated + 1
+                changed_keys[counter_type].add(key)
+        
+        deleted_keys = [key for key in stored_counters if not key in values]
+        if deleted_keys:
+            Counter.objects.filter(type=counter_type, key__in=deleted_keys).delete()
+            deleted = deleted + len(deleted_keys)
+            changed_keys[counter_type].update(deleted_keys)
+    
+    # Touch SuperLachaise categories whose member count changed, so that their fragments and change log entries are updated
+    if changed_keys.get(Counter.CATEGORY_MEMBERS):
+        for superlachaise_category in SuperLachaiseCategory.objects.filter(code__in=changed_keys[Counter.CATEGORY_MEMBERS]):
+            superlachaise_category.save(update_fields=['modified'])
+    
+    return (updated, deleted)
+
+def update_counters(sender, **kwargs):
+    """ Signal receiver updating the counters changed since the last update """
+    (counter_types, object_models) = pop_changes()
+    if counter_types or object_models:
+        update(counter_types, object_models)
+
+def values(counter_type):
+    """ Return the counters of a type by key """
+    return dict(Counter.objects.filter(type=counter_type).values_list('key', 'value'))
+
+def value(counter_type, key):
+    """ Return a counter, 0 if no object is counted """
+    result = Counter.objects.filter(type=counter_type, key=key).values_list('value', flat=True)
+    return result[0] if result else 0
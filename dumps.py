@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+"""
+dumps.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import errno, gzip, hashlib, json, os, tempfile
+from django.utils import timezone
+
+from superlachaise_api import conf
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_FILE_NAME = 'manifest.json'
+
+class HashingFile(object):
+    """ A writable file computing the size and SHA-256 hash of the bytes written to it """
+    
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hash = hashlib.sha256()
+        self.size = 0
+    
+    def write(self, data):
+        self.fileobj.write(data)
+        self.hash.update(data)
+        self.size += len(data)
+    
+    def flush(self):
+        self.fileobj.flush()
+    
+    def close(self):
+        self.fileobj.close()
+    
+    def entry(self):
+        return {
+            'size': self.size,
+            'sha256': self.hash.hexdigest(),
+        }
+
+class GzipFile(object):
+    """ A writable file compressing the bytes written to it with gzip """
+    
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        # A constant modification time keeps the compressed bytes of the same content identical
+        self.gzip_file = gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=9, mtime=0)
+    
+    def write(self, data):
+        self.gzip_file.write(data)
+    
+    def close(self):
+        self.gzip_file.close()
+        self.fileobj.close()
+
+class BrotliFile(object):
+    """ A writable file compressing the bytes written to it with brotli """
+    
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.compressor = brotli.Compressor()
+    
+    def write(self, data):
+        self.fileobj.write(self.compressor.process(data))
+    
+    def close(self):
+        self.fileobj.write(self.compressor.finish())
+        self.fileobj.close()
+
+def compressions():
+    """ Return the (encoding, file extension, file class) of the compressed variants written next to each file """
+    result = [('gzip', '.gz', GzipFile)]
+    if brotli is not None:
+        result.append(('br', '.br', BrotliFile))
+    return result
+
+def mkdir_p(path):
+    try:
+        os.makedirs(path)
+    except OSError as exc: # Python >2.5
+        if exc.errno == errno.EEXIST and os.path.isdir(path):
+            pass
+        else: raise
+
+def temporary_file(path):
+    """ Return the (file, path) of a new temporary file in the directory of path """
+    (fd, temp_path) = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.' + os.path.basename(path) + '.')
+    return (os.fdopen(fd, 'wb'), temp_path)
+
+def publish(temp_path, path):
+    # Renaming replaces the file at once, so that readers never see a partial file
+    os.chmod(temp_path, 0644)
+    os.rename(temp_path, path)
+
+def write_atomically(path, content):
+    """ Write a file through a temporary file renamed over it """
+    (temp_file, temp_path) = temporary_file(path)
+    try:
+        with temp_file:
+            temp_file.write(content)
+        publish(temp_path, path)
+    except:
+        os.remove(temp_path)
+        raise
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE_NAME), 'rb') as manifest_file:
+            return json.load(manifest_file)
+    except (IOError, ValueError):
+        return {'files': {}}
+
+def write_manifest(directory, manifest):
+    manifest['api_version'] = conf.VERSION
+    write_atomically(os.path.join(directory, MANIFEST_FILE_NAME), json.dumps(manifest, indent=4, separators=(',', ': '), sort_keys=True) + '\n')
+
+def is_unchanged(directory, file_name, entry, content_hash):
+    """ Return True if the files of a manifest entry have the hash of the content and still exist """
+    if not entry or entry.get('sha256') != content_hash:
+        return False
+    # Variants are added when a compression becomes available
+    if sorted(entry['variants'].keys()) != sorted(encoding for (encoding, extension, file_class) in compressions()):
+        return False
+    file_names = [file_name] + [variant['file'] for variant in entry['variants'].values()]
+    return all(os.path.exists(os.path.join(directory, name)) for name in file_names)
+
+def stage_artifact(directory, file_name, chunks, manifest_entry):
+    """ Stream the byte string chunks of a file and its compressed variants to temporary files ; return the staged files to publish, or None if the content did not change """
+    targets = [(None, file_name, None)] + [(encoding, file_name + extension, file_class) for (encoding, extension, file_class) in compressions()]
+    temp_paths = []
+    try:
+        hashing_files = []
+        writers = []
+        for (encoding, target_file_name, file_class) in targets:
+            (temp_file, temp_path) = temporary_file(os.path.join(directory, target_file_name))
+            temp_paths.append(temp_path)
+            hashing_file = HashingFile(temp_file)
+            hashing_files.append(hashing_file)
+            writers.append(file_class(hashing_file) if file_class else hashing_file)
+        
+        for chunk in chunks:
+            for writer in writers:
+                writer.write(chunk)
+        for writer in writers:
+            writer.close()
+    except:
+        discard_paths(temp_paths)
+        raise
+    
+    entry = hashing_files[0].entry()
+    if is_unchanged(directory, file_name, manifest_entry, entry['sha256']):
+        discard_paths(temp_paths)
+        return None
+    
+    entry['variants'] = {}
+    for (encoding, target_file_name, file_class), hashing_file in zip(targets, hashing_files)[1:]:
+        entry['variants'][encoding] = hashing_file.entry()
+        entry['variants'][encoding]['file'] = target_file_name
+    
+    # Compressed variants are published first, so that the new plain file is never served with outdated variants
+    return {
+        'file_name': file_name,
+        'entry': entry,
+        'files': [(temp_path, target_file_name) for (encoding, target_file_name, file_class), temp_path in reversed(zip(targets, temp_paths))],
+    }
+
+def discard_paths(temp_paths):
+    for temp_path in temp_paths:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def discard_artifacts(staged_artifacts):
+    """ Remove the temporary files of staged artifacts """
+    discard_paths([temp_path for staged in staged_artifacts for (temp_path, target_file_name) in staged['files']])
+
+def publish_artifacts(directory, staged_artifacts, manifest):
+    """ Rename the temporary files of staged artifacts over their files, and add their entries to the manifest """
+    modified = timezone.now().isoformat()
+    try:
+        for staged in staged_artifacts:
+            for (temp_path, target_file_name) in staged['files']:
+                publish(temp_path, os.path.join(directory, target_file_name))
+    except:
+        discard_artifacts(staged_artifacts)
+        raise
+    
+    for staged in staged_artifacts:
+        staged['entry']['modified'] = modified
+        manifest['files'][staged['file_name']] = staged['entry']
+
+def write_artifact(directory, file_name, chunks, manifest):
+    """ Write a file and its compressed variants from byte string chunks, unless the content did not change ; return True if the files were written """
+    staged = stage_artifact(directory, file_name, chunks, manifest['files'].get(file_name))
+    if staged is None:
+        return False
+    publish_artifacts(directory, [staged], manifest)
+    return True
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+filter_index.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Max
+
+from superlachaise_api.models import *
+
+# The index loaded by this process, as (version, index)
+loaded_index = (None, None)
+
+def encode_ids(object_ids):
+    return u','.join(unicode(object_id) for object_id in sorted(object_ids))
+
+def decode_ids(object_ids):
+    return [int(object_id) for object_id in object_ids.split(',')] if object_ids else []
+
+def bitmap(object_ids):
+    """ Return the bitmap of a list of ids, as an integer whose bit n is set for id n """
+    if not object_ids:
+        return 0
+    bits = ['0'] * (max(object_ids) + 1)
+    for object_id in object_ids:
+        bits[-1 - object_id] = '1'
+    return int(''.join(bits), 2)
+
+def bitmap_ids(bitmap):
+    """ Return the sorted ids of a bitmap """
+    return [object_id for object_id, bit in enumerate(bin(bitmap)[:1:-1]) if bit == '1']
+
+def bitmap_count(bitmap):
+    return bin(bitmap).count('1')
+
+def build():
+    """ Replace the index with the ids of the POIs of every category, sector and date ; return the number of entries """
+    index = defaultdict(set)
+    
+    for pk in SuperLachaisePOI.objects.order_by().values_list('pk', flat=True):
+        index[(FilterIndexEntry.ALL, u'')].add(pk)
+    
+    for code, superlachaise_poi_id in SuperLachaiseCategoryRelation.objects.order_by().values_list('superlachaise_category__code', 'superlachaise_poi_id'):
+        index[(FilterIndexEntry.CATEGORY, code)].add(superlachaise_poi_id)
+    
+    # Sectors and dates are read from wikidata entries, like the filters of superlachaise_poi_list
+    for burial_plot_reference, date_of_birth, date_of_death, superlachaise_poi_id in SuperLachaiseWikidataRelation.objects.order_by().values_list('wikidata_entry__burial_plot_reference', 'wikidata_entry__date_of_birth', 'wikidata_entry__date_of_death', 'superlachaise_poi_id'):
+        if burial_plot_reference:
+            index[(FilterIndexEntry.SECTOR, burial_plot_reference)].add(superlachaise_poi_id)
+        if date_of_birth:
+            index[(FilterIndexEntry.DATE_OF_BIRTH, date_of_birth.isoformat())].add(superlachaise_poi_id)
+        if date_of_death:
+            index[(FilterIndexEntry.DATE_OF_DEATH, date_of_death.isoformat())].add(superlachaise_poi_id)
+    
+    with transaction.atomic():
+        FilterIndexEntry.objects.all().delete()
+        FilterIndexEntry.objects.bulk_create([FilterIndexEntry(facet=facet, value=value, object_ids=encode_ids(object_ids)) for (facet, value), object_ids in index.iteritems()], batch_size=500)
+    
+    return len(index)
+
+def build_filter_index(sender, **kwargs):
+    build()
+
+def load():
+    """ Return the index as {facet: {value: bitmap}}, reading the entries only when they were rebuilt since the last call """
+    global loaded_index
+    
+    # Entries are recreated by every build, so their greatest pk identifies a build
+    version = FilterIndexEntry.objects.aggregate(version=Max('pk'))['version']
+    if version is None:
+        # The index was never built, e.g. right after migrating
+        build()
+        version = FilterIndexEntry.objects.aggregate(version=Max('pk'))['version']
+    
+    if loaded_index[0] != version:
+        index = defaultdict(dict)
+        for facet, value, object_ids in FilterIndexEntry.objects.order_by().values_list('facet', 'value', 'object_ids'):
+            index[facet][value] = bitmap(decode_ids(object_ids))
+        loaded_index = (version, index)
+    
+    return loaded_index[1]
+
+def union(bitmaps):
+    result = 0
+    for value in bitmaps:
+        result |= value
+    return result
+
+def date_bitmap(index, facet, min_date=None, max_date=None):
+    """ Return the bitmap of the POIs with a date between min_date and max_date included """
+    # ISO dates sort like dates
+    return union(value_bitmap for value, value_bitmap in index[facet].iteritems() if (min_date is None or value >= min_date.isoformat()) and (max_date is None or value <= max_date.isoformat()))
+
+def has_filters(categories=[], sector=u'', born_after=None, born_before=None, died_after=None, died_before=None):
+    return bool(categories or sector or born_after or born_before or died_after or died_before)
+
+def matching_bitmap(index, categories=[], sector=u'', born_after=None, born_before=None, died_after=None, died_before=None):
+    """ Return the bitmap of the POIs matching the filters of superlachaise_poi_list, each filter matching any wikidata entry of a POI """
+    result = index[FilterIndexEntry.ALL].get(u'', 0)
+    
+    # AND between category parameters, OR between the codes of a parameter
+    for category in categories:
+        result &= union(index[FilterIndexEntry.CATEGORY].get(code, 0) for code in category.split())
+    
+    if sector:
+        result &= union(index[FilterIndexEntry.SECTOR].get(value, 0) for value in sector.split())
+    
+    if born_after:
+        result &= date_bitmap(index, FilterIndexEntry.DATE_OF_BIRTH, min_date=born_after)
+    if born_before:
+        result &= date_bitmap(index, FilterIndexEntry.DATE_OF_BIRTH, max_date=born_before)
+    if died_after:
+        result &= date_bitmap(index, FilterIndexEntry.DATE_OF_DEATH, min_date=died_after)
+    if died_before:
+        result &= date_bitmap(index, FilterIndexEntry.DATE_OF_DEATH, max_date=died_before)
+    
+    return result
+
+def matching_ids(index, **filters):
+    """ Return the sorted ids of the POIs matching the filters of superlachaise_poi_list """
+    return bitmap_ids(matching_bitmap(index, **filters))
+
+def decades(index, facet):
+    """ Return the bitmaps of the POIs by decade of their dates, e.g. '1880' """
+    result = defaultdict(int)
+    for value, value_bitmap in index[facet].iteritems():
+        year = int(value.split('-')[0])
+        result[unicode(year - year % 10)] |= value_bitmap
+    return result
+
+def facet_counts(index, objects_bitmap):
+    """ Return the number of POIs of a bitmap in each category, sector and decade of birth and death """
+    return {
+        'object_count': bitmap_count(objects_bitmap),
+        'categories': {value: bitmap_count(objects_bitmap & value_bitmap) for value, value_bitmap in index[FilterIndexEntry.CATEGORY].iteritems()},
+        'sectors': {value: bitmap_count(objects_bitmap & value_bitmap) for value, value_bitmap in index[FilterIndexEntry.SECTOR].iteritems()},
+        'decades_of_birth': {value: bitmap_count(objects_bitmap & value_bitmap) for value, value_bitmap in decades(index, FilterIndexEntry.DATE_OF_BIRTH).iteritems()},
+        'decades_of_death': {value: bitmap_count(objects_bitmap & value_bitmap) for value, value_bitmap in decades(index, FilterIndexEntry.DATE_OF_DEATH).iteritems()},
+    }
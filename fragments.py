@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""
+fragments.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.db import models, transaction
+from django.db.models.query import QuerySet
+from django.http import Http404
+from django.utils.translation import ugettext as _
+
+from superlachaise_api import renderers
+from superlachaise_api.models import *
+
+class FragmentStore(object):
+    """ Read and write the pre-encoded JSON of API objects for the languages, restrict_fields and JSON format of an encoder """
+    
+    MODELS = [OpenStreetMapElement, WikidataEntry, WikimediaCommonsCategory, WikimediaCommonsFile, SuperLachaiseCategory, SuperLachaisePOI]
+    LOCALIZED_MODELS = [WikidataEntry, SuperLachaiseCategory, SuperLachaisePOI]
+    
+    RESULT_MARKER = u'\x00result\x00'
+    INDENT = u' ' * 4
+    
+    def __init__(self, encoder):
+        self.encoder = encoder
+    
+    @classmethod
+    def object_type(cls, model):
+        return model._meta.model_name
+    
+    @classmethod
+    def languages_key(cls, model, languages):
+        if model in cls.LOCALIZED_MODELS and languages:
+            return u','.join(sorted(language.code for language in languages))
+        else:
+            return u''
+    
+    def fragment_filter(self, model):
+        return {
+            'object_type': self.object_type(model),
+            'languages': self.languages_key(model, self.encoder.languages),
+            'restrict_fields': self.restrict_fields,
+            'pretty': self.pretty,
+        }
+    
+    @property
+    def restrict_fields(self):
+        return bool(self.encoder.restrict_fields)
+    
+    @property
+    def pretty(self):
+        return self.encoder.response_format == renderers.PRETTY_JSON
+    
+    def encode_object(self, obj):
+        return self.encoder.dumps(self.encoder.obj_dict(obj))
+    
+    def fragments(self, model, objects, store=False):
+        """ Return the fragments of objects (which need only pk and modified), encoding the missing or outdated ones, and storing them if store is True ; objects deleted in the meantime are skipped """
+        stored_fragments = {}
+        # Fragments contain every field, and are not used for sparse fieldsets
+        if objects and self.encoder.fields is None:
+            for object_id, object_modified, content in JSONFragment.objects.filter(object_id__in=[obj.pk for obj in objects], **self.fragment_filter(model)).order_by().values_list('object_id', 'object_modified', 'content'):
+                stored_fragments[object_id] = (object_modified, content)
+        
+        result = {}
+        missing_pks = []
+        for obj in objects:
+            if obj.pk in stored_fragments and stored_fragments[obj.pk][0] == obj.modified:
+                result[obj.pk] = stored_fragments[obj.pk][1]
+            else:
+                missing_pks.append(obj.pk)
+        
+        if missing_pks:
+            new_fragments = []
+            for obj in self.encoder.prefetch(model.objects.filter(pk__in=missing_pks)):
+                result[obj.pk] = self.encode_object(obj)
+                new_fragments.append(JSONFragment(object_id=obj.pk, object_modified=obj.modified, content=result[obj.pk], **self.fragment_filter(model)))
+            if store and self.encoder.fields is None:
+                with transaction.atomic():
+                    JSONFragment.objects.filter(object_id__in=missing_pks, **self.fragment_filter(model)).delete()
+                    JSONFragment.objects.bulk_create(new_fragments)
+        
+        return [result[obj.pk] for obj in objects if obj.pk in result]
+    
+    def build(self, model, chunk_size=100):
+        """ Encode and store the fragments of the objects created or modified since their fragment was built ; return (created or updated, deleted) counts """
+        fragment_filter = self.fragment_filter(model)
+        stored_modified = dict(JSONFragment.objects.filter(**fragment_filter).values_list('object_id', 'object_modified'))
+        
+        object_pks = set()
+        outdated_pks = []
+        for pk, modified in model.objects.values_list('pk', 'modified').order_by('pk'):
+            object_pks.add(pk)
+            if stored_modified.get(pk) != modified:
+                outdated_pks.append(pk)
+        
+        deleted_pks = [pk for pk in stored_modified if not pk in object_pks]
+        for chunk in [deleted_pks[i:i+chunk_size] for i in range(0,len(deleted_pks),chunk_size)]:
+            JSONFragment.objects.filter(object_id__in=chunk, **fragment_filter).delete()
+        
+        for chunk in [outdated_pks[i:i+chunk_size] for i in range(0,len(outdated_pks),chunk_size)]:
+            fragments = []
+            for obj in self.encoder.prefetch(model.objects.filter(pk__in=chunk)):
+                fragments.append(JSONFragment(object_id=obj.pk, object_modified=obj.modified, content=self.encode_object(obj), **fragment_filter))
+            JSONFragment.objects.filter(object_id__in=chunk, **fragment_filter).delete()
+            JSONFragment.objects.bulk_create(fragments)
+        
+        return (len(outdated_pks), len(deleted_pks))
+    
+    def prefetched_objects(self, model, objects):
+        """ Return the objects read with the relations used by obj_dict, in the same order ; objects deleted in the meantime are skipped """
+        prefetched = {obj.pk: obj for obj in self.encoder.prefetch(model.objects.filter(pk__in=[obj.pk for obj in objects]))} if objects else {}
+        return [prefetched[obj.pk] for obj in objects if obj.pk in prefetched]
+    
+    def indent(self, fragment, depth):
+        # JSON strings never contain raw new lines, so every new line starts an indented line
+        return fragment.replace(u'\n', u'\n' + self.INDENT * depth)
+    
+    def list_model(self, result):
+        """ Return the API model of a queryset or of a non empty list of objects of the same model, or None """
+        if isinstance(result, QuerySet):
+            model = result.model
+        elif isinstance(result, list) and result and all(isinstance(item, models.Model) for item in result):
+            model = result[0]._meta.concrete_model
+            if any(item._meta.concrete_model != model for item in result):
+                return None
+        else:
+            return None
+        
+        return model if model in self.MODELS else None
+    
+    def single_result(self, results):
+        # The object may have been deleted since the view read it, e.g. by a running synchronization
+        if not results:
+            raise Http404(_('Object does not exist'))
+        return results[0]
+    
+    def encode(self, obj):
+        """ Encode an API response like SuperLachaiseEncoder.encode, using fragments for its 'result' objects """
+        result = obj.get('result')
+        list_model = self.list_model(result)
+        if isinstance(result, models.Model) and result._meta.concrete_model in self.MODELS:
+            object_model = result._meta.concrete_model
+        else:
+            object_model = None
+        
+        if self.encoder.response_format == renderers.MSGPACK:
+            # MessagePack is packed from the objects, without JSON fragments
+            if list_model:
+                obj['result'] = self.prefetched_objects(list_model, list(result))
+            elif object_model:
+                obj['result'] = self.single_result(self.prefetched_objects(object_model, [result]))
+            return self.encoder.encode(obj)
+        
+        if list_model:
+            fragments = self.fragments(list_model, list(result))
+            if not fragments:
+                encoded_result = u'[]'
+            elif self.pretty:
+                encoded_result = u'[\n' + u',\n'.join(self.INDENT * 2 + self.indent(fragment, 2) for fragment in fragments) + u'\n' + self.INDENT + u']'
+            else:
+                encoded_result = u'[' + u','.join(fragments) + u']'
+        elif object_model:
+            fragment = self.single_result(self.fragments(object_model, [result]))
+            encoded_result = self.indent(fragment, 1) if self.pretty else fragment
+        else:
+            return self.encoder.encode(obj)
+        
+        obj['result'] = self.RESULT_MARKER
+        content = self.encoder.encode(obj)
+        
+        return content.replace(self.encoder.dumps(self.RESULT_MARKER), encoded_result, 1)
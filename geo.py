@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+geo.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import math
+from decimal import Decimal
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Value
+
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 12
+
+# Length of one degree of latitude, for the mean radius of the Earth
+METERS_PER_DEGREE = 6371008.8 * math.pi / 180
+
+# Maximum number of geohash cells covering a searched area
+MAX_CELLS = 16
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """ Return the geohash of a location """
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+    
+    result = []
+    bits = 0
+    bit_count = 0
+    even_bit = True
+    while len(result) < precision:
+        coordinate_range, coordinate = (longitude_range, longitude) if even_bit else (latitude_range, latitude)
+        middle = (coordinate_range[0] + coordinate_range[1]) / 2
+        if coordinate >= middle:
+            bits = bits * 2 + 1
+            coordinate_range[0] = middle
+        else:
+            bits = bits * 2
+            coordinate_range[1] = middle
+        even_bit = not even_bit
+        bit_count += 1
+        if bit_count == 5:
+            result.append(GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    
+    return ''.join(result)
+
+def cell_size(precision):
+    """ Return the (latitude, longitude) size in degrees of the geohash cells of a precision """
+    longitude_bits = (5 * precision + 1) // 2
+    latitude_bits = 5 * precision // 2
+    return (180.0 / 2 ** latitude_bits, 360.0 / 2 ** longitude_bits)
+
+def cell_indexes(minimum, maximum, origin, size, count):
+    first = int(math.floor((minimum - origin) / size))
+    last = int(math.floor((maximum - origin) / size))
+    return range(max(first, 0), min(last, count - 1) + 1)
+
+def covering_cells(min_latitude, min_longitude, max_latitude, max_longitude):
+    """ Return the geohashes of the smallest cells covering a bounding box in at most MAX_CELLS cells """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        (latitude_size, longitude_size) = cell_size(precision)
+        latitude_indexes = cell_indexes(min_latitude, max_latitude, -90.0, latitude_size, int(round(180.0 / latitude_size)))
+        longitude_indexes = cell_indexes(min_longitude, max_longitude, -180.0, longitude_size, int(round(360.0 / longitude_size)))
+        if len(latitude_indexes) * len(longitude_indexes) <= MAX_CELLS:
+            return sorted(set([encode_geohash(-90.0 + (latitude_index + 0.5) * latitude_size, -180.0 + (longitude_index + 0.5) * longitude_size, precision) for latitude_index in latitude_indexes for longitude_index in longitude_indexes]))
+    
+    # The bounding box covers the whole world
+    return ['']
+
+def radius_bbox(latitude, longitude, radius):
+    """ Return the (min_latitude, min_longitude, max_latitude, max_longitude) bounding box of a circle """
+    latitude_delta = radius / METERS_PER_DEGREE
+    longitude_delta = latitude_delta / max(math.cos(math.radians(latitude)), 1e-6)
+    return (max(latitude - latitude_delta, -90.0), max(longitude - longitude_delta, -180.0), min(latitude + latitude_delta, 90.0), min(longitude + longitude_delta, 180.0))
+
+def bbox_filter(min_latitude, min_longitude, max_latitude, max_longitude, prefix=''):
+    """ Return the filter of the elements inside a bounding box, using the geohash index to select the candidate cells """
+    cells_filter = Q()
+    for cell in covering_cells(min_latitude, min_longitude, max_latitude, max_longitude):
+        cells_filter = cells_filter | Q(**{prefix + 'geohash__startswith': cell})
+    
+    return cells_filter & Q(**{
+        prefix + 'latitude__gte': Decimal(repr(min_latitude)),
+        prefix + 'latitude__lte': Decimal(repr(max_latitude)),
+        prefix + 'longitude__gte': Decimal(repr(min_longitude)),
+        prefix + 'longitude__lte': Decimal(repr(max_longitude)),
+    })
+
+def distance_expression(latitude, longitude, prefix=''):
+    """ Return the expression of the squared distance in degrees of latitude to a location (equirectangular approximation) """
+    latitude_delta = F(prefix + 'latitude') - Value(Decimal(repr(latitude)))
+    longitude_delta = (F(prefix + 'longitude') - Value(Decimal(repr(longitude)))) * Value(Decimal(repr(math.cos(math.radians(latitude)))))
+    return ExpressionWrapper(latitude_delta * latitude_delta + longitude_delta * longitude_delta, output_field=FloatField())
+
+def near(queryset, latitude, longitude, radius, prefix=''):
+    """ Filter a queryset with the elements less than radius meters from a location, ordered by distance """
+    queryset = queryset.filter(bbox_filter(*radius_bbox(latitude, longitude, radius), prefix=prefix))
+    queryset = queryset.annotate(distance=distance_expression(latitude, longitude, prefix))
+    return queryset.filter(distance__lte=(radius / METERS_PER_DEGREE) ** 2).order_by('distance', 'pk')
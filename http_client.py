@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+"""
+http_client.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import fcntl, os, requests, tempfile, threading, time
+from contextlib import contextmanager
+from urlparse import urlparse
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.translation import ugettext as _
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (10, 60)
+OVERPASS_TIMEOUT = (10, 300)
+
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# Ask MediaWiki APIs to refuse requests while their replication lag is greater, as they recommend for bots
+MAXLAG_SECONDS = 5
+
+def requests_per_second():
+    return getattr(settings, 'HTTP_REQUESTS_PER_SECOND', 10)
+
+def rate_limit_dir():
+    return getattr(settings, 'HTTP_RATE_LIMIT_DIR', None) or tempfile.gettempdir()
+
+class HostLimiter(object):
+    """ Limit the concurrent requests of this process and the request rate of every process to each host """
+    
+    def __init__(self, max_concurrent_requests, max_requests_per_second, directory):
+        self.max_concurrent_requests = max_concurrent_requests
+        self.min_interval = 1.0 / max_requests_per_second if max_requests_per_second else 0.0
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.semaphores = {}
+    
+    def reserve_request_time(self, host):
+        """ Return the time of the next request to a host, spaced by min_interval from the requests of every process """
+        # The next request time of a host is shared through a file, locked while it is read and written
+        with open(os.path.join(self.directory, 'superlachaise_api_%s.next_request' % host), 'a+') as next_request_file:
+            fcntl.flock(next_request_file, fcntl.LOCK_EX)
+            try:
+                next_request_file.seek(0)
+                content = next_request_file.read().strip()
+                now = time.time()
+                request_time = max(now, float(content)) if content else now
+                next_request_file.seek(0)
+                next_request_file.truncate()
+                next_request_file.write(repr(request_time + self.min_interval))
+                next_request_file.flush()
+            finally:
+                fcntl.flock(next_request_file, fcntl.LOCK_UN)
+        return request_time
+    
+    @contextmanager
+    def limit(self, host):
+        with self.lock:
+            if not host in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.max_concurrent_requests)
+            semaphore = self.semaphores[host]
+        
+        with semaphore:
+            if self.min_interval:
+                delay = self.reserve_request_time(host) - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            yield
+
+class Metrics(object):
+    """ The latency, size and retries of the requests of a client """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+    
+    def record(self, method, url, status_code, latency, size, retries):
+        with self.lock:
+            self.requests.append({
+                'method': method,
+                'host': urlparse(url).netloc,
+                'status_code': status_code,
+                'latency': latency,
+                'bytes': size,
+                'retries': retries,
+            })
+    
+    def summary(self):
+        """ Return {host: {'requests', 'retries', 'bytes', 'latency', 'max_latency'}} """
+        result = {}
+        with self.lock:
+            for request in self.requests:
+                host_summary = result.setdefault(request['host'], {'requests': 0, 'retries': 0, 'bytes': 0, 'latency': 0.0, 'max_latency': 0.0})
+                host_summary['requests'] += 1
+                host_summary['retries'] += request['retries']
+                host_summary['bytes'] += request['bytes']
+                host_summary['latency'] += request['latency']
+                host_summary['max_latency'] = max(host_summary['max_latency'], request['latency'])
+        return result
+    
+    def summary_lines(self):
+        result = []
+        for host, host_summary in sorted(self.summary().iteritems()):
+            result.append(_('{host}: {requests} requests, {retries} retries, {bytes} bytes, {latency:.0f} ms average latency, {max_latency:.0f} ms max latency').format(host=host, requests=host_summary['requests'], retries=host_summary['retries'], bytes=host_summary['bytes'], latency=host_summary['latency'] * 1000 / host_summary['requests'], max_latency=host_summary['max_latency'] * 1000))
+        return result
+
+class Client(object):
+    """ An HTTP client keeping connections alive, with timeouts, retries, politeness limits and metrics """
+    
+    def __init__(self, max_concurrent_requests=2, max_requests_per_second=None, directory=None, max_retries=MAX_RETRIES):
+        self.session = requests.Session()
+        # One pooled connection per concurrent request
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(10, max_concurrent_requests))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        if getattr(settings, 'MEDIAWIKI_USER_AGENT', ''):
+            self.session.headers['User-Agent'] = settings.MEDIAWIKI_USER_AGENT
+        
+        if max_requests_per_second is None:
+            max_requests_per_second = requests_per_second()
+        self.host_limiter = HostLimiter(max_concurrent_requests, max_requests_per_second, directory or rate_limit_dir())
+        self.max_retries = max_retries
+        self.metrics = Metrics()
+    
+    def retry_delay(self, response, retries):
+        """ Return the seconds to wait before retrying a response, or None if it must not be retried """
+        maxlag = response.headers.get('MediaWiki-API-Error') == 'maxlag'
+        if not maxlag and not response.status_code in RETRY_STATUS_CODES:
+            return None
+        
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return BACKOFF_SECONDS * 2 ** retries
+    
+    def request(self, method, url, timeout=TIMEOUT, **kwargs):
+        """ Return the response of a request, retried with an exponential backoff after connection errors, timeouts, server errors and MediaWiki maxlag errors """
+        host = urlparse(url).netloc
+        retries = 0
+        while True:
+            with self.host_limiter.limit(host):
+                start = time.time()
+                try:
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if retries >= self.max_retries:
+                        self.metrics.record(method, url, None, time.time() - start, 0, retries)
+                        raise
+                    response = None
+                    delay = BACKOFF_SECONDS * 2 ** retries
+                else:
+                    delay = self.retry_delay(response, retries)
+            
+            if response is not None and (delay is None or retries >= self.max_retries):
+                self.metrics.record(method, url, response.status_code, time.time() - start, len(response.content), retries)
+                if delay is not None and response.status_code < 400:
+                    raise requests.HTTPError('MediaWiki API lagged after %d retries' % retries, response=response)
+                response.raise_for_status()
+                return response
+            
+            retries += 1
+            time.sleep(delay)
+    
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+    
+    def mediawiki_result(self, url, params):
+        """ Return the JSON result of a MediaWiki API request """
+        if not getattr(settings, 'MEDIAWIKI_USER_AGENT', ''):
+            raise ImproperlyConfigured('no MEDIAWIKI_USER_AGENT defined in settings.py')
+        
+        return self.get(url, params=dict(params, format='json', maxlag=MAXLAG_SECONDS)).json()
+    
+    def mediawiki_results(self, url, params):
+        """ Yield the JSON results of a MediaWiki API query, following its continue parameters """
+        last_continue = {
+            'continue': '',
+        }
+        while True:
+            json_result = self.mediawiki_result(url, dict(params, **last_continue))
+            yield json_result
+            
+            if 'continue' not in json_result: break
+            
+            last_continue = json_result['continue']
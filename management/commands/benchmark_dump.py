@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmark_dump.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, resource, shutil, sys, tempfile, time, traceback
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import translation
+from django.utils.translation import ugettext as _
+
+from superlachaise_api.management.commands import benchmark_queries
+from superlachaise_api.models import *
+
+def print_unicode(str):
+    print str.encode('utf-8')
+
+def peak_rss():
+    """ Return the peak resident set size of the process in kilobytes """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on OS X and in kilobytes on Linux
+    return peak / 1024 if sys.platform == 'darwin' else peak
+
+class Command(benchmark_queries.Command):
+    """ Print the time and peak memory of dump_database on a synthetic dataset, which is rolled back at the end """
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--count',
+            action='store',
+            type=int,
+            default=None,
+            dest='count')
+        parser.add_argument('--chunk_size',
+            action='store',
+            type=int,
+            default=500,
+            dest='chunk_size')
+    
+    def handle(self, *args, **options):
+        translation.activate(settings.LANGUAGE_CODE)
+        try:
+            count = options['count']
+            if count is None:
+                # 10 times the current dataset
+                count = SuperLachaisePOI.objects.count() * 10 or 1000
+            
+            directory = tempfile.mkdtemp()
+            try:
+                with override_settings(DATABASE_DUMP_DIR=directory + '/'):
+                    try:
+                        with transaction.atomic():
+                            start = time.time()
+                            self.create_dataset(count)
+                            print_unicode(_('Created {count} synthetic POIs in {seconds:.1f} s').format(count=count, seconds=time.time() - start))
+                            
+                            # The peak is a high-water mark of the process : it only increases when the dump needs more memory than the dataset creation
+                            peak_before = peak_rss()
+                            start = time.time()
+                            call_command('dump_database', chunk_size=options['chunk_size'])
+                            seconds = time.time() - start
+                            peak_after = peak_rss()
+                            
+                            print_unicode(u'')
+                            print_unicode(_('Dump time: {seconds:.1f} s').format(seconds=seconds))
+                            print_unicode(_('Peak RSS before the dump: {size} KB').format(size=peak_before))
+                            print_unicode(_('Peak RSS after the dump: {size} KB').format(size=peak_after))
+                            for file_name in sorted(os.listdir(directory)):
+                                print_unicode(_('{file_name}: {size} bytes').format(file_name=file_name, size=os.path.getsize(os.path.join(directory, file_name))))
+                            
+                            raise benchmark_queries.Rollback
+                    except benchmark_queries.Rollback:
+                        pass
+            finally:
+                shutil.rmtree(directory)
+            
+            translation.deactivate()
+        except:
+            print_unicode(traceback.format_exc())
+            translation.deactivate()
+            raise CommandError(sys.exc_info()[1])
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmark_queries.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import datetime, sys, time, traceback
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import translation
+from django.utils.translation import ugettext as _
+
+from superlachaise_api import filter_index, map_tiles, search_index, views
+from superlachaise_api.models import *
+
+def print_unicode(str):
+    print str.encode('utf-8')
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    """ Print the timings and query plans of the API endpoints on a synthetic dataset, which is rolled back at the end """
+    
+    CATEGORIES_COUNT = 20
+    SECTORS_COUNT = 97
+    
+    ENDPOINTS = [
+        (views.openstreetmap_element_list, {}, ''),
+        (views.openstreetmap_element_list, {}, 'bbox=2.390,48.860,2.395,48.863'),
+        (views.wikidata_entry_list, {}, ''),
+        (views.wikidata_entry_list, {}, 'modified_since=2000-01-01'),
+        (views.wikimedia_commons_category_list, {}, ''),
+        (views.wikimedia_commons_file_list, {}, ''),
+        (views.superlachaise_category_list, {}, ''),
+        (views.superlachaise_poi_list, {}, ''),
+        (views.superlachaise_poi_list, {}, 'restrict_fields=1'),
+        (views.superlachaise_poi_list, {}, 'modified_since=2000-01-01'),
+        (views.superlachaise_poi_list, {}, 'search=benchmark'),
+        (views.superlachaise_poi_list, {}, 'category=benchmark_0+benchmark_1&category=benchmark_2'),
+        (views.superlachaise_poi_list, {}, 'sector=1+2+3&born_after=1800&died_before=1900'),
+        (views.superlachaise_poi_list, {}, 'near=48.8614,2.3933&radius=200'),
+        (views.superlachaise_poi_facets, {}, 'category=benchmark_0&born_after=1800'),
+        (views.superlachaise_poi_geojson, {}, 'language=fr'),
+        (views.map_tile, {'zoom': '16', 'x': '33203', 'y': '22544'}, ''),
+        (views.objects, {}, ''),
+        (views.change_list, {}, ''),
+    ]
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--count',
+            action='store',
+            type=int,
+            default=1000,
+            dest='count')
+        parser.add_argument('--repeat',
+            action='store',
+            type=int,
+            default=5,
+            dest='repeat')
+    
+    def create_superlachaise_poi(self, index, languages, superlachaise_categories):
+        openstreetmap_element = OpenStreetMapElement.objects.create(openstreetmap_id='benchmark%d' % index, type=OpenStreetMapElement.NODE, name=u'benchmark %d' % index, sorting_name=u'benchmark %d' % index, latitude=Decimal('48.8580') + Decimal(index % 100) / 10000, longitude=Decimal('2.3890') + Decimal(index / 100 % 100) / 10000, wikidata=u'Qbenchmark%d' % index)
+        wikimedia_commons_category = WikimediaCommonsCategory.objects.create(wikimedia_commons_id=u'Category:benchmark %d' % index, main_image=u'File:benchmark %d.jpg' % index, category_members=u'File:benchmark %d.jpg' % index)
+        wikimedia_commons_file = WikimediaCommonsFile.objects.create(wikimedia_commons_id=u'File:benchmark %d.jpg' % index)
+        superlachaise_poi = SuperLachaisePOI.objects.create(openstreetmap_element=openstreetmap_element, wikimedia_commons_category=wikimedia_commons_category, main_image=wikimedia_commons_file, burial_plot_reference=unicode(index % self.SECTORS_COUNT))
+        
+        for superlachaise_category in [superlachaise_categories[index % self.CATEGORIES_COUNT], superlachaise_categories[index * 7 % self.CATEGORIES_COUNT]]:
+            SuperLachaiseCategoryRelation.objects.get_or_create(superlachaise_poi=superlachaise_poi, superlachaise_category=superlachaise_category)
+        
+        date_of_birth = datetime.date(1700 + index % 250, 1 + index % 12, 1 + index % 28)
+        wikidata_entry = WikidataEntry.objects.create(wikidata_id=u'Qbenchmark%d' % index, instance_of=u'Q5', date_of_birth=date_of_birth, date_of_death=date_of_birth + datetime.timedelta(days=365 * (20 + index % 70)), burial_plot_reference=unicode(index % self.SECTORS_COUNT))
+        SuperLachaiseWikidataRelation.objects.create(superlachaise_poi=superlachaise_poi, wikidata_entry=wikidata_entry, relation_type=SuperLachaiseWikidataRelation.PERSONS)
+        for language in languages:
+            wikidata_localized_entry = WikidataLocalizedEntry.objects.create(wikidata_entry=wikidata_entry, language=language, name=u'benchmark %d' % index, wikipedia=u'benchmark %d' % index)
+            WikipediaPage.objects.create(wikidata_localized_entry=wikidata_localized_entry, title=u'benchmark %d' % index, default_sort=u'benchmark, %d' % index)
+            SuperLachaiseLocalizedPOI.objects.create(superlachaise_poi=superlachaise_poi, language=language, name=u'benchmark %d' % index, sorting_name=u'benchmark %d' % index)
+    
+    def create_dataset(self, count):
+        languages = list(Language.objects.all())
+        if not languages:
+            languages = [Language.objects.create(code=code, enumeration_separator=u', ', last_enumeration_separator=u' & ', artist_prefix=u'') for code in ['en', 'fr']]
+        
+        superlachaise_categories = []
+        for index in range(self.CATEGORIES_COUNT):
+            superlachaise_category = SuperLachaiseCategory.objects.create(code=u'benchmark_%d' % index, type=SuperLachaiseCategory.OCCUPATION)
+            for language in languages:
+                SuperLachaiseLocalizedCategory.objects.create(superlachaise_category=superlachaise_category, language=language, name=u'benchmark %d' % index)
+            superlachaise_categories.append(superlachaise_category)
+        
+        for index in range(count):
+            self.create_superlachaise_poi(index, languages, superlachaise_categories)
+        
+        search_index.build_all()
+        filter_index.build()
+        map_tiles.build()
+    
+    def explain_prefix(self):
+        if connection.vendor == 'postgresql':
+            return 'EXPLAIN ANALYZE '
+        elif connection.vendor == 'sqlite':
+            return 'EXPLAIN QUERY PLAN '
+        else:
+            return 'EXPLAIN '
+    
+    def explain(self, sql):
+        cursor = connection.cursor()
+        try:
+            cursor.execute(self.explain_prefix() + sql)
+            return [u' | '.join(unicode(column) for column in row) for row in cursor.fetchall()]
+        except:
+            return [_('Query plan unavailable: {error}').format(error=sys.exc_info()[1])]
+        finally:
+            cursor.close()
+    
+    def benchmark(self, view, kwargs, query, repeat):
+        path = reverse(view, kwargs=kwargs) + ('?' + query if query else '')
+        factory = RequestFactory()
+        
+        timings = []
+        for i in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.time()
+                response = view(factory.get(path), **kwargs)
+                if response.streaming:
+                    list(response.streaming_content)
+                timings.append(time.time() - start)
+        
+        print_unicode(u'== %s ==' % path)
+        print_unicode(_('Status: {status}').format(status=response.status_code))
+        print_unicode(_('Time: {best:.1f} ms (best), {worst:.1f} ms (worst)').format(best=min(timings) * 1000, worst=max(timings) * 1000))
+        print_unicode(_('Queries: {count}').format(count=len(queries)))
+        for query in queries.captured_queries:
+            print_unicode(u'')
+            print_unicode(u'%s (%s ms)' % (query['sql'], float(query['time']) * 1000))
+            if query['sql'].lstrip().upper().startswith('SELECT'):
+                for line in self.explain(query['sql']):
+                    print_unicode(u'    ' + line)
+        print_unicode(u'')
+    
+    def handle(self, *args, **options):
+        translation.activate(settings.LANGUAGE_CODE)
+        try:
+            # Responses are not cached, and requests are built for the test server
+            with override_settings(RESPONSE_CACHE=None, ALLOWED_HOSTS=['testserver']):
+                try:
+                    with transaction.atomic():
+                        start = time.time()
+                        self.create_dataset(options['count'])
+                        print_unicode(_('Created {count} synthetic POIs in {seconds:.1f} s').format(count=options['count'], seconds=time.time() - start))
+                        print_unicode(u'')
+                        
+                        for view, kwargs, query in self.ENDPOINTS:
+                            self.benchmark(view, kwargs, query, options['repeat'])
+                        
+                        raise Rollback
+                except Rollback:
+                    pass
+            
+            translation.deactivate()
+        except:
+            print_unicode(traceback.format_exc())
+            translation.deactivate()
+            raise CommandError(sys.exc_info()[1])
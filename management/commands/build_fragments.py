@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+build_fragments.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys, traceback
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import translation
+from django.utils.translation import ugettext as _
+
+from superlachaise_api import reference_data, renderers
+from superlachaise_api.fragments import FragmentStore
+from superlachaise_api.models import *
+from superlachaise_api.views import SuperLachaiseEncoder
+
+def print_unicode(str):
+    print str.encode('utf-8')
+
+class Command(BaseCommand):
+    
+    def language_sets(self):
+        languages = reference_data.languages()
+        language_sets = [languages]
+        if len(languages) > 1:
+            language_sets.extend([[language] for language in languages])
+        return language_sets
+    
+    def build_fragments(self, model):
+        language_sets = self.language_sets() if model in FragmentStore.LOCALIZED_MODELS else [None]
+        # Compact fragments are served by default, pretty ones to browsers and in database dumps
+        for response_format in [renderers.JSON, renderers.PRETTY_JSON]:
+            for restrict_fields in [False, True]:
+                for languages in language_sets:
+                    fragment_store = FragmentStore(SuperLachaiseEncoder(None, languages=languages, restrict_fields=restrict_fields, response_format=response_format))
+                    (updated, deleted) = fragment_store.build(model)
+                    self.updated_fragments += updated
+                    self.deleted_fragments += deleted
+        
+        # Delete the fragments of languages sets which are not built anymore
+        languages_keys = [FragmentStore.languages_key(model, languages) for languages in language_sets]
+        deleted, _rows = JSONFragment.objects.filter(object_type=FragmentStore.object_type(model)).exclude(languages__in=languages_keys).delete()
+        self.deleted_fragments += deleted
+    
+    def handle(self, *args, **options):
+        translation.activate(settings.LANGUAGE_CODE)
+        try:
+            self.updated_fragments = 0
+            self.deleted_fragments = 0
+            
+            for model in FragmentStore.MODELS:
+                self.build_fragments(model)
+            
+            print_unicode(_('Updated JSON fragments: {count}').format(count=self.updated_fragments))
+            print_unicode(_('Deleted JSON fragments: {count}').format(count=self.deleted_fragments))
+            
+            translation.deactivate()
+        except:
+            print_unicode(traceback.format_exc())
+            translation.deactivate()
+            raise CommandError(sys.exc_info()[1])
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+"""
+build_map_tiles.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys, traceback
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import translation
+from django.utils.translation import ugettext as _
+
+from superlachaise_api import map_tiles
+
+def print_unicode(str):
+    print str.encode('utf-8')
+
+class Command(BaseCommand):
+    
+    def handle(self, *args, **options):
+        translation.activate(settings.LANGUAGE_CODE)
+        try:
+            tiles_count = map_tiles.build()
+            
+            print_unicode(_('Map tiles: {count}').format(count=tiles_count))
+            
+            translation.deactivate()
+        except:
+            print_unicode(traceback.format_exc())
+            translation.deactivate()
+            raise CommandError(sys.exc_info()[1])
@@ -20,58 +20,136 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import json, errno, os, sys
+import multiprocessing, os, sys, traceback
 import os.path
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from django.db.models import Max
 from django.utils import formats, timezone, translation
 from django.utils.translation import ugettext as _
 
-from superlachaise_api import conf
+from superlachaise_api import conf, dumps, reference_data
 from superlachaise_api.models import *
 from superlachaise_api.views import *
 
 def print_unicode(str):
     print str.encode('utf-8')
 
-def mkdir_p(path):
+def stage_model_job(arguments):
+    """ Stage the dump of a model ; return (staged artifact or None, None) or (None, traceback) so that the other jobs complete """
+    (index, chunk_size, manifest_entry) = arguments
     try:
-        os.makedirs(path)
-    except OSError as exc: # Python >2.5
-        if exc.errno == errno.EEXIST and os.path.isdir(path):
-            pass
-        else: raise
+        return (Command().stage_model(index, chunk_size, manifest_entry), None)
+    except:
+        return (None, traceback.format_exc())
+
+def stage_model_process(arguments):
+    try:
+        return stage_model_job(arguments)
+    finally:
+        # The connection of a job process is never shared with the command process
+        connections.close_all()
 
 class Command(BaseCommand):
     
+    MODELS_TO_DUMP = [
+        (OpenStreetMapElement, 'openstreetmap_elements', 'openstreetmap_id', 'openstreetmap_elements.json'),
+        (WikimediaCommonsCategory, 'wikimedia_commons_categories', 'wikimedia_commons_id', 'wikimedia_commons_categories.json'),
+        (WikimediaCommonsFile, 'wikimedia_commons_files', 'wikimedia_commons_id', 'wikimedia_commons_files.json'),
+        (SuperLachaiseCategory, 'superlachaise_categories', 'code', 'superlachaise_categories.json'),
+        (WikidataEntry, 'wikidata_entries', 'wikidata_id', 'wikidata_entries.json'),
+        (SuperLachaisePOI, 'superlachaise_pois', 'openstreetmap_element_id', 'superlachaise_pois.json'),
+    ]
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk_size',
+            action='store',
+            type=int,
+            default=500,
+            dest='chunk_size')
+        parser.add_argument('--jobs',
+            action='store',
+            type=int,
+            default=1,
+            dest='jobs')
+    def object_chunks(self, model, order_field, chunk_size):
+        """ Yield the objects of a model in dump order, with only their pk and modified, by lists of chunk_size """
+        chunk = []
+        for obj in model.objects.order_by(order_field, 'pk').only('pk', 'modified').iterator():
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def dump_chunks(self, encoder, about, model, key, order_field, chunk_size):
+        """ Yield the UTF-8 chunks of the dump of a model, with the same content as encoder.encode ; only the objects modified since their JSON fragment was stored are encoded, chunk_size at a time """
+        INDENT = FragmentStore.INDENT
+        fragment_store = FragmentStore(encoder)
+        (prefix, suffix) = encoder.encode({'about': about, key: FragmentStore.RESULT_MARKER}).split(encoder.dumps(FragmentStore.RESULT_MARKER), 1)
+        yield prefix.encode('utf8')
+        
+        separator = u'[\n'
+        for chunk in self.object_chunks(model, order_field, chunk_size):
+            fragments = fragment_store.fragments(model, chunk, store=True)
+            if fragments:
+                yield (separator + u',\n'.join(INDENT * 2 + fragment_store.indent(fragment, 2) for fragment in fragments)).encode('utf8')
+                separator = u',\n'
+        
+        yield ((u'[]' if separator == u'[\n' else u'\n' + INDENT + u']') + suffix).encode('utf8')
+    
+    def stage_model(self, index, chunk_size, manifest_entry):
+        (model, key, order_field, file_name) = self.MODELS_TO_DUMP[index]
+        encoder = SuperLachaiseEncoder(None, languages=reference_data.languages(), restrict_fields=True)
+        about = {
+            'licence': "https://api.superlachaise.fr/perelachaise/api/licence/",
+            'source': 'https://api.superlachaise.fr',
+            'api_version': conf.VERSION,
+        }
+        chunks = self.dump_chunks(encoder, about, model, key, order_field, chunk_size)
+        
+        return dumps.stage_artifact(settings.DATABASE_DUMP_DIR, file_name, chunks, manifest_entry)
+    
+    def stage_models(self, manifest, chunk_size, jobs):
+        """ Stage the dump of each model, in jobs processes ; return the staged artifacts and the tracebacks of the failed models """
+        tasks = [(index, chunk_size, manifest['files'].get(file_name)) for index, (model, key, order_field, file_name) in enumerate(self.MODELS_TO_DUMP)]
+        if jobs > 1:
+            # Job processes open their own database connection instead of sharing the one of this process
+            connections.close_all()
+            pool = multiprocessing.Pool(min(jobs, len(tasks)))
+            try:
+                results = pool.map(stage_model_process, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [stage_model_job(task) for task in tasks]
+        
+        staged_artifacts = [staged for (staged, error) in results if staged is not None]
+        errors = [error for (staged, error) in results if error is not None]
+        return (staged_artifacts, errors)
+    
     def handle(self, *args, **options):
         translation.activate(settings.LANGUAGE_CODE)
         try:
-            models_to_dump = [
-                (OpenStreetMapElement, 'openstreetmap_elements', 'openstreetmap_id', 'openstreetmap_elements.json'),
-                (WikimediaCommonsCategory, 'wikimedia_commons_categories', 'wikimedia_commons_id', 'wikimedia_commons_categories.json'),
-                (WikimediaCommonsFile, 'wikimedia_commons_files', 'wikimedia_commons_id', 'wikimedia_commons_files.json'),
-                (SuperLachaiseCategory, 'superlachaise_categories', 'code', 'superlachaise_categories.json'),
-                (WikidataEntry, 'wikidata_entries', 'wikidata_id', 'wikidata_entries.json'),
-                (SuperLachaisePOI, 'superlachaise_pois', 'openstreetmap_element_id', 'superlachaise_pois.json'),
-            ]
+            dumps.mkdir_p(settings.DATABASE_DUMP_DIR)
+            manifest = dumps.read_manifest(settings.DATABASE_DUMP_DIR)
             
-            for (model, key, order_field, file_name) in models_to_dump:
-                obj_to_encode = {
-                    'about': {
-                        'licence': "https://api.superlachaise.fr/perelachaise/api/licence/",
-                        'source': 'https://api.superlachaise.fr',
-                        'api_version': conf.VERSION,
-                    },
-                    key: model.objects.all().order_by(order_field),
-                }
-        
-                content = SuperLachaiseEncoder(None, languages=Language.objects.all(), restrict_fields=True).encode(obj_to_encode)
+            (staged_artifacts, errors) = self.stage_models(manifest, options['chunk_size'], options['jobs'])
+            if errors:
+                # No file is published unless every model was dumped
+                dumps.discard_artifacts(staged_artifacts)
+                for error in errors:
+                    print_unicode(error)
+                raise CommandError(_('Failed dumps: {count}').format(count=len(errors)))
+            
+            dumps.publish_artifacts(settings.DATABASE_DUMP_DIR, staged_artifacts, manifest)
+            dumps.write_manifest(settings.DATABASE_DUMP_DIR, manifest)
             
-                mkdir_p(settings.DATABASE_DUMP_DIR)
-                with open(settings.DATABASE_DUMP_DIR + file_name, 'w') as database_dump_file:
-                    database_dump_file.write(content.encode('utf8'))
+            print_unicode(_('Written dump files: {count}').format(count=len(staged_artifacts)))
+            print_unicode(_('Unchanged dump files: {count}').format(count=len(self.MODELS_TO_DUMP) - len(staged_artifacts)))
             
         except:
             print_unicode(traceback.format_exc())
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+"""
+dump_sqlite.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import datetime, os, sqlite3, sys, traceback
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from django.utils import translation
+from django.utils.translation import ugettext as _
+
+from superlachaise_api import conf, dumps
+from superlachaise_api.models import *
+
+def print_unicode(str):
+    print str.encode('utf-8')
+
+class Command(BaseCommand):
+    """ Write the API objects to a SQLite database with normalized tables, a full-text index and a coordinates index, for offline use """
+    
+    FILE_NAME = 'superlachaise.sqlite'
+    
+    # Incremented when the tables change, and stored in PRAGMA user_version
+    SCHEMA_VERSION = 1
+    
+    # (table, model, columns) ; a column is named after its model field, and foreign keys after their column
+    TABLES = [
+        ('languages', Language, ['code']),
+        ('openstreetmap_elements', OpenStreetMapElement, ['openstreetmap_id', 'type', 'name', 'sorting_name', 'nature', 'latitude', 'longitude', 'geohash', 'wikidata', 'wikimedia_commons']),
+        ('wikidata_entries', WikidataEntry, ['wikidata_id', 'instance_of', 'sex_or_gender', 'occupations', 'wikimedia_commons_category', 'wikimedia_commons_grave_category', 'grave_of_wikidata', 'date_of_birth', 'date_of_death', 'date_of_birth_accuracy', 'date_of_death_accuracy', 'burial_plot_reference']),
+        ('wikidata_localized_entries', WikidataLocalizedEntry, ['wikidata_entry_id', 'language_id', 'name', 'wikipedia', 'description']),
+        ('wikimedia_commons_categories', WikimediaCommonsCategory, ['wikimedia_commons_id', 'main_image', 'category_members']),
+        ('wikimedia_commons_files', WikimediaCommonsFile, ['wikimedia_commons_id', 'author', 'license', 'url_512px', 'url_1024px', 'url_2048px']),
+        ('superlachaise_categories', SuperLachaiseCategory, ['code', 'type', 'values']),
+        ('superlachaise_localized_categories', SuperLachaiseLocalizedCategory, ['superlachaise_category_id', 'language_id', 'name']),
+        ('superlachaise_pois', SuperLachaisePOI, ['openstreetmap_element_id', 'wikimedia_commons_category_id', 'main_image_id', 'date_of_birth', 'date_of_death', 'date_of_birth_accuracy', 'date_of_death_accuracy', 'burial_plot_reference']),
+        ('superlachaise_localized_pois', SuperLachaiseLocalizedPOI, ['superlachaise_poi_id', 'language_id', 'name', 'sorting_name', 'description']),
+        ('superlachaise_category_relations', SuperLachaiseCategoryRelation, ['superlachaise_poi_id', 'superlachaise_category_id']),
+        ('superlachaise_wikidata_relations', SuperLachaiseWikidataRelation, ['superlachaise_poi_id', 'wikidata_entry_id', 'relation_type']),
+    ]
+    
+    INDEXES = [
+        ('openstreetmap_elements', ['latitude', 'longitude']),
+        ('openstreetmap_elements', ['geohash']),
+        ('wikidata_entries', ['wikidata_id']),
+        ('wikidata_localized_entries', ['wikidata_entry_id', 'language_id']),
+        ('superlachaise_localized_categories', ['superlachaise_category_id', 'language_id']),
+        ('superlachaise_pois', ['openstreetmap_element_id']),
+        ('superlachaise_localized_pois', ['superlachaise_poi_id', 'language_id']),
+        ('superlachaise_localized_pois', ['language_id', 'sorting_name']),
+        ('superlachaise_category_relations', ['superlachaise_poi_id']),
+        ('superlachaise_category_relations', ['superlachaise_category_id']),
+        ('superlachaise_wikidata_relations', ['superlachaise_poi_id']),
+        ('superlachaise_wikidata_relations', ['wikidata_entry_id']),
+    ]
+    
+    # The full-text index of localized POIs, which finds names regardless of case and accents
+    SEARCH_TABLE = ('superlachaise_localized_pois_search', 'superlachaise_localized_pois', ['name', 'sorting_name', 'description'])
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk_size',
+            action='store',
+            type=int,
+            default=1000,
+            dest='chunk_size')
+    
+    def column_type(self, model, column):
+        # Foreign key columns are found by their attribute name
+        field = [field for field in model._meta.concrete_fields if field.attname == column][0]
+        if field.is_relation or isinstance(field, (models.IntegerField, models.BooleanField)):
+            return 'INTEGER'
+        elif isinstance(field, models.DecimalField):
+            return 'REAL'
+        else:
+            return 'TEXT'
+    
+    def sqlite_value(self, value):
+        if isinstance(value, Decimal):
+            return float(value)
+        elif isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        else:
+            return value
+    
+    def create_table(self, cursor, table, model, columns, chunk_size):
+        column_definitions = ['"id" INTEGER PRIMARY KEY'] + ['"%s" %s' % (column, self.column_type(model, column)) for column in columns]
+        cursor.execute('CREATE TABLE "%s" (%s)' % (table, ', '.join(column_definitions)))
+        
+        insert = 'INSERT INTO "%s" VALUES (%s)' % (table, ', '.join(['?'] * (len(columns) + 1)))
+        rows = []
+        for row in model.objects.order_by('pk').values_list('pk', *columns).iterator():
+            rows.append([self.sqlite_value(value) for value in row])
+            if len(rows) == chunk_size:
+                cursor.executemany(insert, rows)
+                rows = []
+        cursor.executemany(insert, rows)
+    
+    def create_search_table(self, cursor):
+        (table, content_table, columns) = self.SEARCH_TABLE
+        cursor.execute('CREATE VIRTUAL TABLE "%s" USING fts4(content="%s", %s, tokenize=unicode61 "remove_diacritics=1")' % (table, content_table, ', '.join('"%s"' % column for column in columns)))
+        cursor.execute('INSERT INTO "%s"("%s") VALUES (\'rebuild\')' % (table, table))
+        cursor.execute('INSERT INTO "%s"("%s") VALUES (\'optimize\')' % (table, table))
+    
+    def write_database(self, path, chunk_size):
+        connection = sqlite3.connect(path)
+        try:
+            cursor = connection.cursor()
+            cursor.execute('PRAGMA user_version = %d' % self.SCHEMA_VERSION)
+            
+            cursor.execute('CREATE TABLE "about" ("key" TEXT PRIMARY KEY, "value" TEXT)')
+            cursor.executemany('INSERT INTO "about" VALUES (?, ?)', [
+                ('licence', "https://api.superlachaise.fr/perelachaise/api/licence/"),
+                ('source', 'https://api.superlachaise.fr'),
+                ('api_version', conf.VERSION),
+            ])
+            
+            for (table, model, columns) in self.TABLES:
+                self.create_table(cursor, table, model, columns, chunk_size)
+            for (table, columns) in self.INDEXES:
+                cursor.execute('CREATE INDEX "%s_%s" ON "%s" (%s)' % (table, '_'.join(columns), table, ', '.join('"%s"' % column for column in columns)))
+            self.create_search_table(cursor)
+            cursor.execute('ANALYZE')
+            connection.commit()
+            
+            # Pack the pages, so that devices can open the file as it is
+            cursor.execute('VACUUM')
+        finally:
+            connection.close()
+    
+    def file_chunks(self, path, chunk_size=65536):
+        with open(path, 'rb') as database_file:
+            while True:
+                chunk = database_file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    
+    def handle(self, *args, **options):
+        translation.activate(settings.LANGUAGE_CODE)
+        try:
+            dumps.mkdir_p(settings.DATABASE_DUMP_DIR)
+            manifest = dumps.read_manifest(settings.DATABASE_DUMP_DIR)
+            
+            (temp_file, temp_path) = dumps.temporary_file(os.path.join(settings.DATABASE_DUMP_DIR, self.FILE_NAME))
+            # SQLite opens the empty temporary file as a new database
+            temp_file.close()
+            try:
+                self.write_database(temp_path, options['chunk_size'])
+                staged = dumps.stage_artifact(settings.DATABASE_DUMP_DIR, self.FILE_NAME, self.file_chunks(temp_path), manifest['files'].get(self.FILE_NAME))
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            
+            if staged:
+                dumps.publish_artifacts(settings.DATABASE_DUMP_DIR, [staged], manifest)
+                dumps.write_manifest(settings.DATABASE_DUMP_DIR, manifest)
+                print_unicode(_('Written dump files: {count}').format(count=1))
+            else:
+                print_unicode(_('Unchanged dump files: {count}').format(count=1))
+            
+            translation.deactivate()
+        except:
+            print_unicode(traceback.format_exc())
+            translation.deactivate()
+            raise CommandError(sys.exc_info()[1])
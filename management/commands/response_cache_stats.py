@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""
+response_cache_stats.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils.translation import ugettext as _
+
+from superlachaise_api import cache
+
+def print_unicode(str):
+    print str.encode('utf-8')
+
+class Command(BaseCommand):
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--reset',
+            action='store_true',
+            dest='reset')
+    
+    def handle(self, *args, **options):
+        if cache.get_cache() is None:
+            print_unicode(_('The response cache is disabled'))
+            return
+        
+        (hits, misses) = cache.stats()
+        print_unicode(_('Hits: {count}').format(count=hits))
+        print_unicode(_('Misses: {count}').format(count=misses))
+        if hits + misses:
+            print_unicode(_('Hit ratio: {ratio:.1%}').format(ratio=float(hits) / (hits + misses)))
+        
+        if options['reset']:
+            cache.reset_stats()
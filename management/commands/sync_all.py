@@ -103,9 +103,12 @@ class Command(BaseCommand):
             self.sync_all()
             if settings.EMAIL_ENABLED:
                 self.send_mail_to_managers()
+            print_unicode(_('Build JSON fragments'))
+            call_command('build_fragments')
             if settings.DUMP_DATABASE:
                 print_unicode(_('Dump database'))
-                call_command('dump_database')
+                call_command('dump_database', jobs=getattr(settings, 'DATABASE_DUMP_JOBS', 1))
+                call_command('dump_sqlite')
             print_unicode(_('== End %s ==') % self.synchronization.name)
             
             self.synchronization.created_objects = self.created_objects
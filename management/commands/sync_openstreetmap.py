@@ -20,13 +20,14 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import json, math, os, requests, sys, traceback
+import math, os, sys, traceback
 from decimal import Decimal
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone, translation
 from django.utils.translation import ugettext as _
 
+from superlachaise_api import http_client, reference_data
 from superlachaise_api.models import *
 
 def print_unicode(str):
@@ -44,38 +45,22 @@ class Command(BaseCommand):
     
     def request_wikidata_with_wikipedia_links(self, language_code, wikipedia_links):
         result = {}
-        last_continue = {
-            'continue': '',
-        }
-        languages = Language.objects.all().values_list('code', flat=True)
+        languages = [language.code for language in reference_data.languages()]
         titles = '|'.join(wikipedia_links).encode('utf8')
         sites = language_code + 'wiki'
         
-        while True:
-            # Request properties
-            params = {
-                'languages': languages,
-                'action': 'wbgetentities',
-                'props': 'sitelinks',
-                'format': 'json',
-                'sites': sites,
-                'titles': titles,
-            }
-            params.update(last_continue)
-            
-            if settings.MEDIAWIKI_USER_AGENT:
-                headers = {"User-Agent" : settings.MEDIAWIKI_USER_AGENT}
-            else:
-                raise 'no USER_AGENT defined in settings.py'
-            
-            json_result = requests.get('https://www.wikidata.org/w/api.php', params=params, headers=headers).json()
-            
+        # Request properties
+        params = {
+            'languages': languages,
+            'action': 'wbgetentities',
+            'props': 'sitelinks',
+            'sites': sites,
+            'titles': titles,
+        }
+        
+        for json_result in self.client.mediawiki_results('https://www.wikidata.org/w/api.php', params):
             if 'entities' in json_result:
                 result.update(json_result['entities'])
-            
-            if 'continue' not in json_result: break
-            
-            last_continue = json_result['continue']
         
         return result
     
@@ -99,9 +84,9 @@ class Command(BaseCommand):
         query_string = "".join(query_string_list)
         
         # Kill any other query
-        requests.get('http://overpass-api.de/api/kill_my_queries')
+        self.client.get('http://overpass-api.de/api/kill_my_queries')
         
-        result = requests.get('http://overpass-api.de/api/interpreter', data=query_string).json()
+        result = self.client.get('http://overpass-api.de/api/interpreter', data=query_string, timeout=http_client.OVERPASS_TIMEOUT).json()
         
         return result
     
@@ -280,17 +265,20 @@ class Command(BaseCommand):
         try:
             translation.activate(settings.LANGUAGE_CODE)
             
-            self.bounding_box = Setting.objects.get(key=u'openstreetmap:bounding_box').value
-            self.exclude_ids = json.loads(Setting.objects.get(key=u'openstreetmap:exclude_ids').value)
-            self.synced_tags = json.loads(Setting.objects.get(key=u'openstreetmap:synced_tags').value)
+            self.bounding_box = reference_data.setting(u'openstreetmap:bounding_box')
+            self.exclude_ids = reference_data.json_setting(u'openstreetmap:exclude_ids')
+            self.synced_tags = reference_data.json_setting(u'openstreetmap:synced_tags')
         
             self.created_objects = 0
             self.modified_objects = 0
             self.deleted_objects = 0
             self.errors = []
+            self.client = http_client.Client()
             
             print_unicode(_('== Start %s ==') % self.synchronization.name)
             self.sync_openstreetmap()
+            for line in self.client.metrics.summary_lines():
+                print_unicode(line)
             print_unicode(_('== End %s ==') % self.synchronization.name)
             
             self.synchronization.created_objects = self.created_objects
@@ -20,13 +20,14 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import datetime, json, os, sys, time, traceback
+import datetime, os, sys, time, traceback
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db.models import Q
 from django.utils import timezone, translation
 from django.utils.translation import ugettext as _
 
+from superlachaise_api import reference_data
 from superlachaise_api.models import *
 
 def print_unicode(str):
@@ -127,15 +128,19 @@ class Command(BaseCommand):
                             properties[SuperLachaiseCategory.OCCUPATION].append(occupation)
         
         result = []
+        all_superlachaise_categories = reference_data.superlachaise_categories()
         for type, values in properties.iteritems():
             superlachaise_categories = []
             for value in values:
-                for superlachaise_category in SuperLachaiseCategory.objects.filter(type=type).exclude(code__in=superlachaise_categories, values__exact=''):
-                    if value in superlachaise_category.values.split(';'):
+                for superlachaise_category in all_superlachaise_categories:
+                    if superlachaise_category.type == type and superlachaise_category.values and value in superlachaise_category.values.split(';'):
+                        superlachaise_categories.append(superlachaise_category)
+                codes = [superlachaise_category.code for superlachaise_category in superlachaise_categories]
+                for superlachaise_category in all_superlachaise_categories:
+                    if superlachaise_category.type == type and not superlachaise_category.code in codes and value in [wikidata_occupation.wikidata_id for wikidata_occupation in superlachaise_category.wikidata_occupations.all()]:
                         superlachaise_categories.append(superlachaise_category)
-                superlachaise_categories.extend(SuperLachaiseCategory.objects.filter(type=type, wikidata_occupations__wikidata_id=value).exclude(code__in=superlachaise_categories))
             if not superlachaise_categories and type == SuperLachaiseCategory.OCCUPATION:
-                superlachaise_categories = SuperLachaiseCategory.objects.filter(code=u'other')
+                superlachaise_categories = [superlachaise_category for superlachaise_category in all_superlachaise_categories if superlachaise_category.code == u'other']
             result.extend(superlachaise_categories)
         
         result.sort()
@@ -455,7 +460,7 @@ class Command(BaseCommand):
                 setattr(superlachaise_poi, field, value)
             superlachaise_poi.save()
         
-        for language in Language.objects.all():
+        for language in reference_data.languages():
             localized_values_dict = self.get_localized_values_for_openstreetmap_element(language, openstreetmap_element, wikidata_entries)
             self.sync_superlachaise_localized_poi(superlachaise_poi, language, localized_values_dict)
         
@@ -522,8 +527,8 @@ class Command(BaseCommand):
         try:
             translation.activate(settings.LANGUAGE_CODE)
             
-            self.openstreetmap_name_tag_language = Setting.objects.get(key=u'openstreetmap:name_tag_language').value
-            self.synced_instance_of = json.loads(Setting.objects.get(key=u'wikimedia_commons:synced_instance_of').value)
+            self.openstreetmap_name_tag_language = reference_data.setting(u'openstreetmap:name_tag_language')
+            self.synced_instance_of = reference_data.json_setting(u'wikimedia_commons:synced_instance_of')
             
             self.created_objects = 0
             self.modified_objects = 0
@@ -20,13 +20,14 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import datetime, json, os, requests, sys, time, traceback
+import datetime, os, sys, time, traceback
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db.models import Q
 from django.utils import timezone, translation
 from django.utils.translation import ugettext as _
 
+from superlachaise_api import http_client, reference_data
 from superlachaise_api.models import *
 
 def print_unicode(str):
@@ -44,37 +45,21 @@ class Command(BaseCommand):
     
     def request_wikidata(self, wikidata_codes):
         result = {}
-        last_continue = {
-            'continue': '',
-        }
-        languages = '|'.join(Language.objects.all().values_list('code', flat=True))
+        languages = '|'.join([language.code for language in reference_data.languages()])
         ids = '|'.join(wikidata_codes).encode('utf8')
         props = '|'.join(['labels', 'descriptions', 'claims', 'sitelinks'])
         
-        while True:
-            # Request properties
-            params = {
-                'languages': languages,
-                'action': 'wbgetentities',
-                'props': props,
-                'format': 'json',
-                'ids': ids,
-            }
-            params.update(last_continue)
-            
-            if settings.MEDIAWIKI_USER_AGENT:
-                headers = {"User-Agent" : settings.MEDIAWIKI_USER_AGENT}
-            else:
-                raise 'no USER_AGENT defined in settings.py'
-            
-            json_result = requests.get('https://www.wikidata.org/w/api.php', params=params, headers=headers).json()
-            
+        # Request properties
+        params = {
+            'languages': languages,
+            'action': 'wbgetentities',
+            'props': props,
+            'ids': ids,
+        }
+        
+        for json_result in self.client.mediawiki_results('https://www.wikidata.org/w/api.php', params):
             if 'entities' in json_result:
                 result.update(json_result['entities'])
-            
-            if 'continue' not in json_result: break
-            
-            last_continue = json_result['continue']
         
         return result
     
@@ -330,7 +315,7 @@ class Command(BaseCommand):
                 setattr(wikidata_entry, field, value)
             wikidata_entry.save()
         
-        for language in Language.objects.all():
+        for language in reference_data.languages():
             localized_values_dict = self.get_localized_values_from_entity(entity, language.code)
             if localized_values_dict:
                 self.handle_localized_entity(wikidata_entry, language, localized_values_dict)
@@ -413,15 +398,18 @@ class Command(BaseCommand):
         try:
             translation.activate(settings.LANGUAGE_CODE)
             
-            self.accepted_locations_of_burial = json.loads(Setting.objects.get(key=u'wikidata:accepted_locations_of_burial').value)
+            self.accepted_locations_of_burial = reference_data.json_setting(u'wikidata:accepted_locations_of_burial')
             
             self.created_objects = 0
             self.modified_objects = 0
             self.deleted_objects = 0
             self.errors = []
+            self.client = http_client.Client()
             
             print_unicode(_('== Start %s ==') % self.synchronization.name)
             self.sync_wikidata(options['wikidata_ids'])
+            for line in self.client.metrics.summary_lines():
+                print_unicode(line)
             print_unicode(_('== End %s ==') % self.synchronization.name)
             
             self.synchronization.created_objects = self.created_objects
@@ -20,12 +20,13 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import datetime, json, os, requests, sys, time, traceback
+import datetime, json, os, sys, time, traceback
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone, translation
 from django.utils.translation import ugettext as _
 
+from superlachaise_api import http_client, reference_data
 from superlachaise_api.models import *
 
 def print_unicode(str):
@@ -35,36 +36,20 @@ class Command(BaseCommand):
     
     def request_wikidata(self, wikidata_codes):
         result = {}
-        last_continue = {
-            'continue': '',
-        }
-        languages = Language.objects.all().values_list('code', flat=True)
+        languages = [language.code for language in reference_data.languages()]
         ids = '|'.join(wikidata_codes).encode('utf8')
         
-        while True:
-            # Request properties
-            params = {
-                'languages': languages,
-                'action': 'wbgetentities',
-                'props': 'labels',
-                'format': 'json',
-                'ids': ids,
-            }
-            params.update(last_continue)
-            
-            if settings.MEDIAWIKI_USER_AGENT:
-                headers = {"User-Agent" : settings.MEDIAWIKI_USER_AGENT}
-            else:
-                raise 'no USER_AGENT defined in settings.py'
-            
-            json_result = requests.get('https://www.wikidata.org/w/api.php', params=params, headers=headers).json()
-            
+        # Request properties
+        params = {
+            'languages': languages,
+            'action': 'wbgetentities',
+            'props': 'labels',
+            'ids': ids,
+        }
+        
+        for json_result in self.client.mediawiki_results('https://www.wikidata.org/w/api.php', params):
             if 'entities' in json_result:
                 result.update(json_result['entities'])
-            
-            if 'continue' not in json_result: break
-            
-            last_continue = json_result['continue']
         
         return result
     
@@ -101,7 +86,7 @@ class Command(BaseCommand):
         for wikidata_occupation in WikidataOccupation.objects.all():
             wikidata_entity = wikidata_entities[wikidata_occupation.wikidata_id]
             names = {}
-            for language in Language.objects.all():
+            for language in reference_data.languages():
                 try:
                     name = wikidata_entity['labels'][language.code]['value']
                     if not name in names:
@@ -134,9 +119,12 @@ class Command(BaseCommand):
             self.modified_objects = 0
             self.deleted_objects = 0
             self.errors = []
+            self.client = http_client.Client()
             
             print_unicode(_('== Start %s ==') % self.synchronization.name)
             self.sync_wikidata_occupations()
+            for line in self.client.metrics.summary_lines():
+                print_unicode(line)
             print_unicode(_('== End %s ==') % self.synchronization.name)
             
             self.synchronization.created_objects = self.created_objects
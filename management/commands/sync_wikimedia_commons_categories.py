@@ -20,12 +20,13 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import json, os, re, requests, sys, traceback
+import os, re, sys, traceback
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone, translation
 from django.utils.translation import ugettext as _
 
+from superlachaise_api import http_client, reference_data
 from superlachaise_api.models import *
 
 def print_unicode(str):
@@ -36,72 +37,38 @@ class Command(BaseCommand):
     def request_wikimedia_commons_categories(self, wikimedia_commons_categories):
         pages = {}
         
-        last_continue = {
-            'continue': '',
-        }
-        
         categories = '|'.join(wikimedia_commons_categories).encode('utf8')
         
-        while True:
-            # Request properties
-            params = {
-                'action': 'query',
-                'prop': 'title|revisions',
-                'rvprop': 'content',
-                'format': 'json',
-                'titles': categories,
-            }
-            params.update(last_continue)
-            
-            if settings.MEDIAWIKI_USER_AGENT:
-                headers = {"User-Agent" : settings.MEDIAWIKI_USER_AGENT}
-            else:
-                raise 'no USER_AGENT defined in settings.py'
-            
-            json_result = requests.get('https://commons.wikimedia.org/w/api.php', params=params, headers=headers).json()
-            
+        # Request properties
+        params = {
+            'action': 'query',
+            'prop': 'title|revisions',
+            'rvprop': 'content',
+            'titles': categories,
+        }
+        
+        for json_result in self.client.mediawiki_results('https://commons.wikimedia.org/w/api.php', params):
             if 'pages' in json_result['query']:
                 pages.update(json_result['query']['pages'])
-            
-            if 'continue' not in json_result: break
-            
-            last_continue = json_result['continue']
         
         return pages
     
     def request_category_members(self, wikimedia_commons_category):
         category_members = []
         
-        last_continue = {
-            'continue': '',
-        }
-        
         category = wikimedia_commons_category.encode('utf8')
         
-        while True:
-            # Request properties
-            params = {
-                'action': 'query',
-                'list': 'categorymembers',
-                'cmtype': 'file',
-                'format': 'json',
-                'cmtitle': category,
-            }
-            params.update(last_continue)
-            
-            if settings.MEDIAWIKI_USER_AGENT:
-                headers = {"User-Agent" : settings.MEDIAWIKI_USER_AGENT}
-            else:
-                raise 'no USER_AGENT defined in settings.py'
-            
-            json_result = requests.get('https://commons.wikimedia.org/w/api.php', params=params, headers=headers).json()
-            
+        # Request properties
+        params = {
+            'action': 'query',
+            'list': 'categorymembers',
+            'cmtype': 'file',
+            'cmtitle': category,
+        }
+        
+        for json_result in self.client.mediawiki_results('https://commons.wikimedia.org/w/api.php', params):
             if 'categorymembers' in json_result['query']:
                 category_members.extend(json_result['query']['categorymembers'])
-            
-            if 'continue' not in json_result: break
-            
-            last_continue = json_result['continue']
         
         return [category_member['title'] for category_member in category_members]
     
@@ -241,15 +208,18 @@ class Command(BaseCommand):
         try:
             translation.activate(settings.LANGUAGE_CODE)
             
-            self.synced_instance_of = json.loads(Setting.objects.get(key=u'wikimedia_commons:synced_instance_of').value)
+            self.synced_instance_of = reference_data.json_setting(u'wikimedia_commons:synced_instance_of')
             
             self.created_objects = 0
             self.modified_objects = 0
             self.deleted_objects = 0
             self.errors = []
+            self.client = http_client.Client()
             
             print_unicode(_('== Start %s ==') % self.synchronization.name)
             self.sync_wikimedia_commons_categories(options['wikimedia_commons_categories'])
+            for line in self.client.metrics.summary_lines():
+                print_unicode(line)
             print_unicode(_('== End %s ==') % self.synchronization.name)
             
             self.synchronization.created_objects = self.created_objects
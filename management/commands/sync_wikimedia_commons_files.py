@@ -20,13 +20,14 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import json, os, re, requests, sys, traceback
+import json, os, re, sys, traceback
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone, translation
 from django.utils.translation import ugettext as _
 from HTMLParser import HTMLParser
 
+from superlachaise_api import http_client
 from superlachaise_api.models import *
 
 class MLStripper(HTMLParser):
@@ -55,37 +56,21 @@ class Command(BaseCommand):
     
     def request_wikimedia_commons_files(self, wikimedia_commons_files):
         result = {}
-        last_continue = {
-            'continue': '',
-        }
         titles = '|'.join(wikimedia_commons_files).encode('utf8')
         
-        while True:
-            # Request properties
-            params = {
-                'action': 'query',
-                'prop': 'imageinfo',
-                'iiprop': 'url|size|extmetadata',
-                'format': 'json',
-                'iiurlwidth': 50,
-                'titles': titles,
-            }
-            params.update(last_continue)
-            
-            if settings.MEDIAWIKI_USER_AGENT:
-                headers = {"User-Agent" : settings.MEDIAWIKI_USER_AGENT}
-            else:
-                raise 'no USER_AGENT defined in settings.py'
-            
-            json_result = requests.get('https://commons.wikimedia.org/w/api.php', params=params, headers=headers).json()
-            
+        # Request properties
+        params = {
+            'action': 'query',
+            'prop': 'imageinfo',
+            'iiprop': 'url|size|extmetadata',
+            'iiurlwidth': 50,
+            'titles': titles,
+        }
+        
+        for json_result in self.client.mediawiki_results('https://commons.wikimedia.org/w/api.php', params):
             if 'pages' in json_result['query']:
                 for page_id, page in json_result['query']['pages'].iteritems():
                     result[page['title']] = page
-            
-            if 'continue' not in json_result: break
-            
-            last_continue = json_result['continue']
         
         return result
     
@@ -276,9 +261,12 @@ class Command(BaseCommand):
             self.modified_objects = 0
             self.deleted_objects = 0
             self.errors = []
+            self.client = http_client.Client()
             
             print_unicode(_('== Start %s ==') % self.synchronization.name)
             self.sync_wikimedia_commons_files(options['wikimedia_commons_files'])
+            for line in self.client.metrics.summary_lines():
+                print_unicode(line)
             print_unicode(_('== End %s ==') % self.synchronization.name)
             
             self.synchronization.created_objects = self.created_objects
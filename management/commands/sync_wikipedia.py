@@ -20,13 +20,15 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import json, os, re, requests, sys, traceback
+import json, os, re, sys, traceback
+from multiprocessing.pool import ThreadPool
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone, translation
 from django.utils.translation import ugettext as _
 from HTMLParser import HTMLParser
 
+from superlachaise_api import http_client, reference_data
 from superlachaise_api.models import *
 
 def print_unicode(str):
@@ -154,37 +156,20 @@ class Command(BaseCommand):
     def request_wikipedia_pages(self, language_code, wikipedia_titles):
         pages = {}
         
-        last_continue = {
-            'continue': '',
-        }
-        
         titles = '|'.join(wikipedia_titles).encode('utf8')
         
-        while True:
-            # Request properties
-            params = {
-                'action': 'query',
-                'prop': 'revisions',
-                'rvprop': 'content',
-                'format': 'json',
-                'titles': titles,
-            }
-            params.update(last_continue)
-            
-            if settings.MEDIAWIKI_USER_AGENT:
-                headers = {"User-Agent" : settings.MEDIAWIKI_USER_AGENT}
-            else:
-                raise 'no USER_AGENT defined in settings.py'
-            
-            json_result = requests.get('https://%s.wikipedia.org/w/api.php' % (language_code), params=params, headers=headers).json()
-            
+        # Request properties
+        params = {
+            'action': 'query',
+            'prop': 'revisions',
+            'rvprop': 'content',
+            'titles': titles,
+        }
+        
+        for json_result in self.client.mediawiki_results('https://%s.wikipedia.org/w/api.php' % (language_code), params):
             if 'pages' in json_result['query']:
                 for page in json_result['query']['pages'].values():
                     pages[page['title']] = page
-            
-            if 'continue' not in json_result: break
-            
-            last_continue = json_result['continue']
         
         return pages
     
@@ -194,23 +179,18 @@ class Command(BaseCommand):
             'action': 'parse',
             'prop': 'text',
             'section': '0',
-            'format': 'json',
             'page': title.encode('utf8'),
         }
         
-        if settings.MEDIAWIKI_USER_AGENT:
-            headers = {"User-Agent" : settings.MEDIAWIKI_USER_AGENT}
-        else:
-            raise 'no USER_AGENT defined in settings.py'
-        
-        json_result = requests.get('https://%s.wikipedia.org/w/api.php' % (language_code), params=params, headers=headers).json()
+        json_result = self.client.mediawiki_result('https://%s.wikipedia.org/w/api.php' % (language_code), params)
         
         return json_result['parse']['text']['*']
     
-    def get_wikipedia_intro(self, language_code, title):
-        # Get wikipedia pre-section (intro)
-        pre_section = self.request_wikipedia_pre_section(language_code, title)
-        
+    def fetch_wikipedia_pre_section(self, wikidata_localized_entry):
+        # Called by the threads of the pool, which only make requests
+        return self.request_wikipedia_pre_section(wikidata_localized_entry.language.code, wikidata_localized_entry.wikipedia)
+    
+    def get_wikipedia_intro(self, language_code, pre_section):
         # Process HTML
         parser = WikipediaIntroHTMLParser(language_code)
         parser.feed(pre_section)
@@ -238,11 +218,11 @@ class Command(BaseCommand):
         except:
             return u''
     
-    def hande_wikidata_localized_entry(self, wikidata_localized_entry):
+    def hande_wikidata_localized_entry(self, wikidata_localized_entry, pre_section):
         # Get values
         values_dict = {
             'title': wikidata_localized_entry.wikipedia,
-            'intro': self.get_wikipedia_intro(wikidata_localized_entry.language.code, wikidata_localized_entry.wikipedia),
+            'intro': self.get_wikipedia_intro(wikidata_localized_entry.language.code, pre_section),
         }
         
         # Get or create object in database
@@ -271,18 +251,19 @@ class Command(BaseCommand):
                 setattr(wikipedia_page, field, value)
             wikipedia_page.save()
     
-    def sync_wikipedia(self, wikidata_localized_entry_ids):
+    def sync_wikipedia(self, wikidata_localized_entry_ids, concurrency):
         if wikidata_localized_entry_ids:
             wikidata_localized_entries = WikidataLocalizedEntry.objects.filter(id__in=wikidata_localized_entry_ids.split('|')).exclude(wikipedia__exact='')
         else:
             wikidata_localized_entries = WikidataLocalizedEntry.objects.exclude(wikipedia__exact='')
+        wikidata_localized_entries = wikidata_localized_entries.select_related('language').order_by('pk')
         
         print_unicode(_('Requesting Wikipedia revisions...'))
         self.default_sort = {}
         total = len(wikidata_localized_entries)
         count = 0
         max_count_per_request = 25
-        for language in Language.objects.all():
+        for language in reference_data.languages():
             self.default_sort[language.code] = {}
             wikipedia_titles = wikidata_localized_entries.filter(language=language).values_list('wikipedia', flat=True)
             for chunk in [wikipedia_titles[i:i+max_count_per_request] for i in range(0,len(wikipedia_titles),max_count_per_request)]:
@@ -299,12 +280,20 @@ class Command(BaseCommand):
         count = 0
         max_count_per_request = 25
         self.fetched_objects_pks = []
-        for chunk in [wikidata_localized_entries[i:i+max_count_per_request] for i in range(0,len(wikidata_localized_entries),max_count_per_request)]:
-            print_unicode(str(count) + u'/' + str(total))
-            count += len(chunk)
-            
-            for wikidata_localized_entry in chunk:
-                self.hande_wikidata_localized_entry(wikidata_localized_entry)
+        # Pages are requested concurrently, but parsed and saved by this thread in the order of the entries
+        wikidata_localized_entries = list(wikidata_localized_entries)
+        pool = ThreadPool(concurrency)
+        try:
+            pre_sections = pool.imap(self.fetch_wikipedia_pre_section, wikidata_localized_entries)
+            for wikidata_localized_entry in wikidata_localized_entries:
+                if count % max_count_per_request == 0:
+                    print_unicode(str(count) + u'/' + str(total))
+                count += 1
+                
+                self.hande_wikidata_localized_entry(wikidata_localized_entry, pre_sections.next())
+        finally:
+            pool.terminate()
+            pool.join()
         print_unicode(str(count) + u'/' + str(total))
         
         if not wikidata_localized_entry_ids:
@@ -317,6 +306,21 @@ class Command(BaseCommand):
         parser.add_argument('--wikidata_localized_entry_ids',
             action='store',
             dest='wikidata_localized_entry_ids')
+        parser.add_argument('--concurrency',
+            action='store',
+            type=int,
+            default=4,
+            dest='concurrency')
+        parser.add_argument('--host_concurrency',
+            action='store',
+            type=int,
+            default=2,
+            dest='host_concurrency')
+        parser.add_argument('--host_rate',
+            action='store',
+            type=float,
+            default=10,
+            dest='host_rate')
     
     def handle(self, *args, **options):
         
@@ -334,9 +338,12 @@ class Command(BaseCommand):
             self.modified_objects = 0
             self.deleted_objects = 0
             self.errors = []
+            self.client = http_client.Client(max_concurrent_requests=options['host_concurrency'], max_requests_per_second=options['host_rate'])
             
             print_unicode(_('== Start %s ==') % self.synchronization.name)
-            self.sync_wikipedia(options['wikidata_localized_entry_ids'])
+            self.sync_wikipedia(options['wikidata_localized_entry_ids'], options['concurrency'])
+            for line in self.client.metrics.summary_lines():
+                print_unicode(line)
             print_unicode(_('== End %s ==') % self.synchronization.name)
             
             self.synchronization.created_objects = self.created_objects
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2016-10-17 17:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlachaise_api', '0024_auto_20160603_2331'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JSONFragment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notes', models.TextField(blank=True, verbose_name='notes')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='modified')),
+                ('object_type', models.CharField(max_length=255, verbose_name='object type')),
+                ('object_id', models.IntegerField(verbose_name='object id')),
+                ('languages', models.CharField(blank=True, max_length=255, verbose_name='languages')),
+                ('restrict_fields', models.BooleanField(default=False, verbose_name='restrict fields')),
+                ('object_modified', models.DateTimeField(verbose_name='object modified')),
+                ('content', models.TextField(verbose_name='content')),
+            ],
+            options={
+                'ordering': ['object_type', 'object_id', 'languages', 'restrict_fields'],
+                'verbose_name': 'JSON fragment',
+                'verbose_name_plural': 'JSON fragments',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='jsonfragment',
+            unique_together=set([('object_type', 'object_id', 'languages', 'restrict_fields')]),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2016-10-17 17:38
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlachaise_api', '0025_auto_20161017_1730'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notes', models.TextField(blank=True, verbose_name='notes')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='modified')),
+                ('object_type', models.CharField(max_length=255, verbose_name='object type')),
+                ('object_id', models.IntegerField(verbose_name='object id')),
+                ('language_code', models.CharField(blank=True, max_length=255, verbose_name='language code')),
+                ('token', models.CharField(db_index=True, max_length=255, verbose_name='token')),
+            ],
+            options={
+                'ordering': ['object_type', 'token', 'object_id'],
+                'verbose_name': 'search index entry',
+                'verbose_name_plural': 'search index entries',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='searchindexentry',
+            index_together=set([('object_type', 'token')]),
+        ),
+    ]
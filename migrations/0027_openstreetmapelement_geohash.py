@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2016-10-17 17:43
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from superlachaise_api import geo
+
+
+def set_geohash(apps, schema_editor):
+    OpenStreetMapElement = apps.get_model('superlachaise_api', 'OpenStreetMapElement')
+    for openstreetmap_element in OpenStreetMapElement.objects.all():
+        openstreetmap_element.geohash = geo.encode_geohash(openstreetmap_element.latitude, openstreetmap_element.longitude)
+        openstreetmap_element.save(update_fields=['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlachaise_api', '0026_auto_20161017_1738'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='openstreetmapelement',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, max_length=12, verbose_name='geohash'),
+        ),
+        migrations.RunPython(set_geohash, migrations.RunPython.noop),
+    ]
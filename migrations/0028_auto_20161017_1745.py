@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2016-10-17 17:45
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def create_change_log_entries(apps, schema_editor):
+    # Existing objects are logged as created, so that a change feed read from the start lists every object
+    ChangeLogEntry = apps.get_model('superlachaise_api', 'ChangeLogEntry')
+    for model_name, natural_key_fields in [
+        ('OpenStreetMapElement', ['type', 'openstreetmap_id']),
+        ('WikidataEntry', ['wikidata_id']),
+        ('WikimediaCommonsCategory', ['wikimedia_commons_id']),
+        ('WikimediaCommonsFile', ['wikimedia_commons_id']),
+        ('SuperLachaiseCategory', ['code']),
+        ('SuperLachaisePOI', ['pk']),
+    ]:
+        model = apps.get_model('superlachaise_api', model_name)
+        change_log_entries = []
+        for values in model.objects.order_by('pk').values_list(*natural_key_fields):
+            change_log_entries.append(ChangeLogEntry(action='create', object_type=model._meta.model_name, natural_key=u'/'.join(unicode(value) for value in values)))
+        ChangeLogEntry.objects.bulk_create(change_log_entries, batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlachaise_api', '0027_openstreetmapelement_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notes', models.TextField(blank=True, verbose_name='notes')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='modified')),
+                ('action', models.CharField(choices=[(b'create', 'create'), (b'update', 'update'), (b'delete', 'delete')], max_length=255, verbose_name='action')),
+                ('object_type', models.CharField(max_length=255, verbose_name='object type')),
+                ('natural_key', models.CharField(max_length=255, verbose_name='natural key')),
+            ],
+            options={
+                'ordering': ['pk'],
+                'verbose_name': 'change log entry',
+                'verbose_name_plural': 'change log entries',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='changelogentry',
+            index_together=set([('object_type', 'natural_key')]),
+        ),
+        migrations.RunPython(create_change_log_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2016-10-17 17:52
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlachaise_api', '0028_auto_20161017_1745'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notes', models.TextField(blank=True, verbose_name='notes')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='modified')),
+                ('type', models.CharField(choices=[(b'objects', 'objects'), (b'category_members', 'category members'), (b'category_occupations', 'category occupations'), (b'occupation_usage', 'occupation usage'), (b'sector_pois', 'sector POIs')], max_length=255, verbose_name='type')),
+                ('key', models.CharField(max_length=255, verbose_name='key')),
+                ('value', models.IntegerField(default=0, verbose_name='value')),
+            ],
+            options={
+                'ordering': ['type', 'key'],
+                'verbose_name': 'counter',
+                'verbose_name_plural': 'counters',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='counter',
+            unique_together=set([('type', 'key')]),
+        ),
+    ]
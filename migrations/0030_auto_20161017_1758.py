@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2016-10-17 17:58
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlachaise_api', '0029_auto_20161017_1752'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilterIndexEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notes', models.TextField(blank=True, verbose_name='notes')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='modified')),
+                ('facet', models.CharField(choices=[(b'all', 'all'), (b'category', 'category'), (b'sector', 'sector'), (b'date_of_birth', 'date of birth'), (b'date_of_death', 'date of death')], max_length=255, verbose_name='facet')),
+                ('value', models.CharField(blank=True, max_length=255, verbose_name='value')),
+                ('object_ids', models.TextField(blank=True, verbose_name='object ids')),
+            ],
+            options={
+                'ordering': ['facet', 'value'],
+                'verbose_name': 'filter index entry',
+                'verbose_name_plural': 'filter index entries',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='filterindexentry',
+            unique_together=set([('facet', 'value')]),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2016-10-17 18:12
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlachaise_api', '0030_auto_20161017_1758'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='openstreetmapelement',
+            index_together=set([('sorting_name', 'openstreetmap_id'), ('modified',)]),
+        ),
+        migrations.AlterIndexTogether(
+            name='superlachaisecategory',
+            index_together=set([('modified',)]),
+        ),
+        migrations.AlterIndexTogether(
+            name='superlachaisepoi',
+            index_together=set([('modified',)]),
+        ),
+        migrations.AlterIndexTogether(
+            name='wikidataentry',
+            index_together=set([('modified',)]),
+        ),
+        migrations.AlterIndexTogether(
+            name='wikimediacommonscategory',
+            index_together=set([('modified',)]),
+        ),
+        migrations.AlterIndexTogether(
+            name='wikimediacommonsfile',
+            index_together=set([('modified',)]),
+        ),
+    ]
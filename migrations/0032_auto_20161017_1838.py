@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2016-10-17 18:38
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlachaise_api', '0031_auto_20161017_1812'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapTile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notes', models.TextField(blank=True, verbose_name='notes')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='modified')),
+                ('zoom', models.IntegerField(verbose_name='zoom')),
+                ('x', models.IntegerField(verbose_name='x')),
+                ('y', models.IntegerField(verbose_name='y')),
+                ('content', models.TextField(verbose_name='content')),
+            ],
+            options={
+                'ordering': ['zoom', 'x', 'y'],
+                'verbose_name': 'map tile',
+                'verbose_name_plural': 'map tiles',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='maptile',
+            unique_together=set([('zoom', 'x', 'y')]),
+        ),
+    ]
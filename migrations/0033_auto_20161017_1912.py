@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2016-10-17 19:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlachaise_api', '0032_auto_20161017_1838'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='jsonfragment',
+            options={'ordering': ['object_type', 'object_id', 'languages', 'restrict_fields', 'pretty'], 'verbose_name': 'JSON fragment', 'verbose_name_plural': 'JSON fragments'},
+        ),
+        migrations.AddField(
+            model_name='jsonfragment',
+            name='pretty',
+            field=models.BooleanField(default=True, verbose_name='pretty'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='jsonfragment',
+            unique_together=set([('object_type', 'object_id', 'languages', 'restrict_fields', 'pretty')]),
+        ),
+    ]
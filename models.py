@@ -26,6 +26,8 @@ from django.core.management import call_command
 from django.db import models
 from django.utils.translation import ugettext as _
 
+from superlachaise_api import geo
+
 class SuperLachaiseModel(models.Model):
     """ An abstract model with common fields """
     
@@ -153,6 +155,12 @@ class OpenStreetMapElement(SuperLachaiseModel):
     longitude = models.DecimalField(max_digits=10, default=0, decimal_places=7, verbose_name=_('longitude'))
     wikidata = models.CharField(max_length=255, blank=True, verbose_name=_('wikidata'))
     wikimedia_commons = models.CharField(max_length=255, blank=True, verbose_name=_('wikimedia commons'))
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, verbose_name=_('geohash'))
+    
+    def save(self, *args, **kwargs):
+        self.geohash = geo.encode_geohash(self.latitude, self.longitude)
+        
+        super(OpenStreetMapElement, self).save(*args, **kwargs)
     
     def openstreetmap_url(self):
         if self.type:
@@ -177,6 +185,7 @@ class OpenStreetMapElement(SuperLachaiseModel):
         verbose_name = _('openstreetmap element')
         verbose_name_plural = _('openstreetmap elements')
         unique_together = ('type', 'openstreetmap_id',)
+        index_together = [('sorting_name', 'openstreetmap_id',), ('modified',)]
 
 class WikidataEntry(SuperLachaiseModel):
     
@@ -225,6 +234,7 @@ class WikidataEntry(SuperLachaiseModel):
         ordering = ['wikidata_id']
         verbose_name = _('wikidata entry')
         verbose_name_plural = _('wikidata entries')
+        index_together = [('modified',)]
 
 class WikidataLocalizedEntry(SuperLachaiseModel):
     """ The part of a wikidata entry specific to a language """
@@ -325,6 +335,7 @@ class WikimediaCommonsCategory(SuperLachaiseModel):
         ordering = ['wikimedia_commons_id']
         verbose_name = _('wikimedia commons category')
         verbose_name_plural = _('wikimedia commons categories')
+        index_together = [('modified',)]
 
 class WikimediaCommonsFile(SuperLachaiseModel):
     
@@ -345,6 +356,7 @@ class WikimediaCommonsFile(SuperLachaiseModel):
         ordering = ['wikimedia_commons_id']
         verbose_name = _('wikimedia commons file')
         verbose_name_plural = _('wikimedia commons files')
+        index_together = [('modified',)]
 
 class SuperLachaisePOI(SuperLachaiseModel):
     """ An object linking multiple data sources for representing a single Point Of Interest """
@@ -367,6 +379,7 @@ class SuperLachaisePOI(SuperLachaiseModel):
         ordering = ['openstreetmap_element']
         verbose_name = _('superlachaise POI')
         verbose_name_plural = _('superlachaise POIs')
+        index_together = [('modified',)]
 
 class SuperLachaiseLocalizedPOI(SuperLachaiseModel):
     """ The part of a SuperLachaise POI specific to a language """
@@ -448,6 +461,7 @@ class SuperLachaiseCategory(SuperLachaiseModel):
         ordering = ['type', 'code']
         verbose_name = _('superlachaise category')
         verbose_name_plural = _('superlachaise categories')
+        index_together = [('modified',)]
 
 class SuperLachaiseLocalizedCategory(SuperLachaiseModel):
     """ The part of a SuperLachaise category specific to a language """
@@ -512,6 +526,26 @@ class WikidataOccupation(SuperLachaiseModel):
     superlachaise_category = models.ForeignKey('SuperLachaiseCategory', null=True, blank=True, limit_choices_to={'type': SuperLachaiseCategory.OCCUPATION}, related_name='wikidata_occupations', verbose_name=_('superlachaise category'))
     used_in = models.ManyToManyField('WikidataEntry', blank=True, related_name='wikidata_occupations', verbose_name=_('used in'))
     
+    def __init__(self, *args, **kwargs):
+        super(WikidataOccupation, self).__init__(*args, **kwargs)
+        self.saved_superlachaise_category_id = self.superlachaise_category_id
+    
+    def save(self, *args, **kwargs):
+        super(WikidataOccupation, self).save(*args, **kwargs)
+        
+        # Touch SuperLachaise categories if the occupation moved
+        if self.superlachaise_category_id != self.saved_superlachaise_category_id:
+            for superlachaise_category in SuperLachaiseCategory.objects.filter(pk__in=[self.superlachaise_category_id, self.saved_superlachaise_category_id]):
+                superlachaise_category.save()
+            self.saved_superlachaise_category_id = self.superlachaise_category_id
+    
+    def delete(self):
+        # Touch SuperLachaise category
+        if self.superlachaise_category:
+            self.superlachaise_category.save()
+        
+        super(WikidataOccupation, self).delete()
+    
     def wikidata_url(self, language_code):
         return WikidataEntry.URL_FORMAT.format(id=self.wikidata_id, language_code=language_code)
     
@@ -522,3 +556,143 @@ class WikidataOccupation(SuperLachaiseModel):
         ordering = ['wikidata_id']
         verbose_name = _('wikidata occupation')
         verbose_name_plural = _('wikidata occupations')
+
+class JSONFragment(SuperLachaiseModel):
+    """ The pre-encoded JSON of an API object for a set of languages """
+    
+    object_type = models.CharField(max_length=255, verbose_name=_('object type'))
+    object_id = models.IntegerField(verbose_name=_('object id'))
+    languages = models.CharField(max_length=255, blank=True, verbose_name=_('languages'))
+    restrict_fields = models.BooleanField(default=False, verbose_name=_('restrict fields'))
+    pretty = models.BooleanField(default=True, verbose_name=_('pretty'))
+    object_modified = models.DateTimeField(verbose_name=_('object modified'))
+    content = models.TextField(verbose_name=_('content'))
+    
+    def __unicode__(self):
+        return u'%s:%s (%s)' % (self.object_type, self.object_id, self.languages)
+    
+    class Meta:
+        ordering = ['object_type', 'object_id', 'languages', 'restrict_fields', 'pretty']
+        verbose_name = _('JSON fragment')
+        verbose_name_plural = _('JSON fragments')
+        unique_together = ('object_type', 'object_id', 'languages', 'restrict_fields', 'pretty',)
+
+class SearchIndexEntry(SuperLachaiseModel):
+    """ An accent-folded and case-folded token found in the searched fields of an API object """
+    
+    object_type = models.CharField(max_length=255, verbose_name=_('object type'))
+    object_id = models.IntegerField(verbose_name=_('object id'))
+    language_code = models.CharField(max_length=255, blank=True, verbose_name=_('language code'))
+    token = models.CharField(max_length=255, db_index=True, verbose_name=_('token'))
+    
+    def __unicode__(self):
+        return u'%s:%s (%s)' % (self.object_type, self.object_id, self.token)
+    
+    class Meta:
+        ordering = ['object_type', 'token', 'object_id']
+        verbose_name = _('search index entry')
+        verbose_name_plural = _('search index entries')
+        index_together = ('object_type', 'token',)
+
+class ChangeLogEntry(SuperLachaiseModel):
+    """ The last creation, modification or deletion of an API object, kept after the object is deleted """
+    
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    
+    action_choices = (
+        (CREATE, _('create')),
+        (UPDATE, _('update')),
+        (DELETE, _('delete')),
+    )
+    
+    action = models.CharField(max_length=255, choices=action_choices, verbose_name=_('action'))
+    object_type = models.CharField(max_length=255, verbose_name=_('object type'))
+    natural_key = models.CharField(max_length=255, verbose_name=_('natural key'))
+    
+    def __unicode__(self):
+        return u'%s %s:%s' % (self.action, self.object_type, self.natural_key)
+    
+    class Meta:
+        ordering = ['pk']
+        verbose_name = _('change log entry')
+        verbose_name_plural = _('change log entries')
+        index_together = ('object_type', 'natural_key',)
+
+class Counter(SuperLachaiseModel):
+    """ A count of objects updated after synchronizations and admin edits, read instead of counting rows """
+    
+    OBJECTS = 'objects'
+    CATEGORY_MEMBERS = 'category_members'
+    CATEGORY_OCCUPATIONS = 'category_occupations'
+    OCCUPATION_USAGE = 'occupation_usage'
+    SECTOR_POIS = 'sector_pois'
+    
+    type_choices = (
+        (OBJECTS, _('objects')),
+        (CATEGORY_MEMBERS, _('category members')),
+        (CATEGORY_OCCUPATIONS, _('category occupations')),
+        (OCCUPATION_USAGE, _('occupation usage')),
+        (SECTOR_POIS, _('sector POIs')),
+    )
+    
+    type = models.CharField(max_length=255, choices=type_choices, verbose_name=_('type'))
+    key = models.CharField(max_length=255, verbose_name=_('key'))
+    value = models.IntegerField(default=0, verbose_name=_('value'))
+    
+    def __unicode__(self):
+        return u'%s:%s (%d)' % (self.type, self.key, self.value)
+    
+    class Meta:
+        ordering = ['type', 'key']
+        verbose_name = _('counter')
+        verbose_name_plural = _('counters')
+        unique_together = ('type', 'key',)
+
+class FilterIndexEntry(SuperLachaiseModel):
+    """ The ids of the SuperLachaise POIs matching a value of a filter, read instead of joining the filtered relations """
+    
+    ALL = 'all'
+    CATEGORY = 'category'
+    SECTOR = 'sector'
+    DATE_OF_BIRTH = 'date_of_birth'
+    DATE_OF_DEATH = 'date_of_death'
+    
+    facet_choices = (
+        (ALL, _('all')),
+        (CATEGORY, _('category')),
+        (SECTOR, _('sector')),
+        (DATE_OF_BIRTH, _('date of birth')),
+        (DATE_OF_DEATH, _('date of death')),
+    )
+    
+    facet = models.CharField(max_length=255, choices=facet_choices, verbose_name=_('facet'))
+    value = models.CharField(max_length=255, blank=True, verbose_name=_('value'))
+    object_ids = models.TextField(blank=True, verbose_name=_('object ids'))
+    
+    def __unicode__(self):
+        return u'%s:%s' % (self.facet, self.value)
+    
+    class Meta:
+        ordering = ['facet', 'value']
+        verbose_name = _('filter index entry')
+        verbose_name_plural = _('filter index entries')
+        unique_together = ('facet', 'value',)
+
+class MapTile(SuperLachaiseModel):
+    """ The GeoJSON of the SuperLachaise POIs and POI clusters of a map tile, computed after each synchronization """
+    
+    zoom = models.IntegerField(verbose_name=_('zoom'))
+    x = models.IntegerField(verbose_name=_('x'))
+    y = models.IntegerField(verbose_name=_('y'))
+    content = models.TextField(verbose_name=_('content'))
+    
+    def __unicode__(self):
+        return u'%d/%d/%d' % (self.zoom, self.x, self.y)
+    
+    class Meta:
+        ordering = ['zoom', 'x', 'y']
+        verbose_name = _('map tile')
+        verbose_name_plural = _('map tiles')
+        unique_together = ('zoom', 'x', 'y',)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+reference_data.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+
+from superlachaise_api import cache
+from superlachaise_api.models import *
+
+# The reference data loaded by this process, by name, as (version, data)
+loaded_data = {}
+
+# The models whose changes invalidate the loaded data
+MODELS = [Language, Setting, SuperLachaiseCategory, WikidataOccupation]
+
+def current_version():
+    # Admin edits in other processes bump the dataset version of the shared response cache
+    response_cache = cache.get_cache()
+    if response_cache is not None:
+        return cache.dataset_version(response_cache)
+
+def cached(name, load):
+    version = current_version()
+    if not name in loaded_data or loaded_data[name][0] != version:
+        loaded_data[name] = (version, load())
+    return loaded_data[name][1]
+
+def clear():
+    loaded_data.clear()
+
+def invalidate(sender, **kwargs):
+    """ Signal receiver clearing the loaded data when a reference object is saved or deleted """
+    clear()
+
+def languages():
+    """ Return the languages ordered by code """
+    return cached('languages', lambda: list(Language.objects.order_by('code')))
+
+def language(code):
+    """ Return the language of a code, or None """
+    for language in languages():
+        if language.code == code:
+            return language
+
+def setting(key):
+    """ Return the value of a setting ; raise Setting.DoesNotExist if there is no setting for key """
+    values = cached('settings', lambda: dict(Setting.objects.values_list('key', 'value')))
+    if not key in values:
+        raise Setting.DoesNotExist(u'No setting for key %s' % key)
+    return values[key]
+
+def json_setting(key):
+    """ Return the decoded JSON value of a setting """
+    values = cached('json_settings', dict)
+    if not key in values:
+        values[key] = json.loads(setting(key))
+    return values[key]
+
+def superlachaise_categories():
+    """ Return the SuperLachaise categories with their wikidata occupations """
+    return cached('superlachaise_categories', lambda: list(SuperLachaiseCategory.objects.prefetch_related('wikidata_occupations')))
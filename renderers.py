@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+renderers.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+from importlib import import_module
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.http import HttpResponse, StreamingHttpResponse
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'json'
+PRETTY_JSON = 'pretty'
+MSGPACK = 'msgpack'
+
+CONTENT_TYPES = {
+    JSON: 'application/json; charset=utf-8',
+    PRETTY_JSON: 'application/json; charset=utf-8',
+    MSGPACK: 'application/x-msgpack',
+}
+
+MSGPACK_MEDIA_TYPES = ['application/x-msgpack', 'application/msgpack']
+
+# GeoJSON has its own media type, except for human browsing
+GEOJSON_CONTENT_TYPES = dict(CONTENT_TYPES, **{JSON: 'application/geo+json; charset=utf-8'})
+
+# One compact JSON object per line
+NDJSON_CONTENT_TYPE = 'application/x-ndjson; charset=utf-8'
+
+def json_backend():
+    """ Return the JSON module set by the JSON_BACKEND setting, or simplejson and its C encoder if available """
+    name = getattr(settings, 'JSON_BACKEND', None)
+    if name:
+        return import_module(name)
+    try:
+        return import_module('simplejson')
+    except ImportError:
+        return json
+
+def dumps(obj, default=None, pretty=True):
+    """ Return the JSON of an object, indented as served to browsers and written to database dumps if pretty, else compact """
+    backend = json_backend()
+    options = {}
+    if backend.__name__ == 'simplejson':
+        # Decimals are encoded by default like other objects
+        options['use_decimal'] = False
+    if pretty:
+        return backend.dumps(obj, ensure_ascii=False, indent=4, separators=(',', ': '), sort_keys=True, default=default, **options)
+    else:
+        return backend.dumps(obj, ensure_ascii=False, separators=(',', ':'), sort_keys=True, default=default, **options)
+
+def packb(obj, default=None):
+    """ Return the MessagePack of an object ; byte and unicode strings are both packed as strings, like the JSON formats """
+    return msgpack.packb(obj, default=default, use_bin_type=False)
+
+def encode(response_format, obj, default=None):
+    """ Return an object encoded in a response format """
+    if response_format == JSON:
+        return dumps(obj, default=default, pretty=False)
+    elif response_format == MSGPACK:
+        return packb(obj, default=default)
+    else:
+        return dumps(obj, default=default)
+
+def available_formats():
+    result = [JSON, PRETTY_JSON]
+    if msgpack is not None:
+        result.append(MSGPACK)
+    return result
+
+def negotiate_format(request):
+    """ Return the response format from the format parameter or the Accept header """
+    result = request.GET.get('format', None)
+    if result:
+        if not result in available_formats():
+            raise SuspiciousOperation('Invalid parameter : format')
+        return result
+    
+    media_types = [media_type.split(';')[0].strip() for media_type in request.META.get('HTTP_ACCEPT', '').split(',')]
+    if msgpack is not None and any([media_type in MSGPACK_MEDIA_TYPES for media_type in media_types]):
+        return MSGPACK
+    elif 'text/html' in media_types:
+        # Pretty JSON for human browsing
+        return PRETTY_JSON
+    else:
+        return JSON
+
+def render(request, content, content_types=CONTENT_TYPES):
+    """ Return the response for content encoded in the requested format """
+    response = HttpResponse(content, content_type=content_types[negotiate_format(request)])
+    response['Vary'] = 'Accept'
+    return response
+
+def stream(contents):
+    """ Return a streaming NDJSON response for an iterator of compact JSON contents """
+    return StreamingHttpResponse((content + u'\n' for content in contents), content_type=NDJSON_CONTENT_TYPE)
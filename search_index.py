@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+"""
+search_index.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import re, threading, unicodedata
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Prefetch, Q
+
+from superlachaise_api.models import *
+
+# Letters which are not decomposed by unicode normalization
+LIGATURES = {u'æ': u'ae', u'œ': u'oe', u'ß': u'ss', u'ø': u'o', u'ł': u'l', u'đ': u'd', u'ð': u'd', u'þ': u'th'}
+TOKEN_REGEX = re.compile(r'[^\W_]+', re.UNICODE)
+
+# Typo tolerant matching is not applied to shorter tokens
+FUZZY_MIN_LENGTH = 4
+
+def fold(text):
+    """ Return a text without case and accents """
+    text = unicodedata.normalize('NFKD', unicode(text).lower())
+    text = u''.join([character for character in text if not unicodedata.combining(character)])
+    return u''.join([LIGATURES.get(character, character) for character in text])
+
+def tokens(text):
+    """ Return the folded words of a text """
+    if not text:
+        return []
+    return TOKEN_REGEX.findall(fold(text))
+
+def edit_distance(string_1, string_2):
+    """ Return the Damerau-Levenshtein distance (optimal string alignment) between two strings """
+    rows = [range(len(string_2) + 1)]
+    for i in range(1, len(string_1) + 1):
+        row = [i]
+        for j in range(1, len(string_2) + 1):
+            cost = 0 if string_1[i-1] == string_2[j-1] else 1
+            distance = min(rows[i-1][j] + 1, row[j-1] + 1, rows[i-1][j-1] + cost)
+            if i > 1 and j > 1 and string_1[i-1] == string_2[j-2] and string_1[i-2] == string_2[j-1]:
+                distance = min(distance, rows[i-2][j-2] + 1)
+            row.append(distance)
+        rows.append(row)
+    return rows[-1][-1]
+
+def max_typos(token):
+    return 1 if len(token) < 8 else 2
+
+def wikidata_localized_entry_texts(wikidata_localized_entry):
+    language_code = wikidata_localized_entry.language.code
+    return [(language_code, wikidata_localized_entry.name), (language_code, wikidata_localized_entry.description), (language_code, wikidata_localized_entry.wikipedia)]
+
+def openstreetmap_element_texts(openstreetmap_element):
+    return [(u'', openstreetmap_element.name)]
+
+def wikidata_entry_texts(wikidata_entry):
+    return sum([wikidata_localized_entry_texts(wikidata_localized_entry) for wikidata_localized_entry in wikidata_entry.localizations.all()], [])
+
+def wikimedia_commons_category_texts(wikimedia_commons_category):
+    return [(u'', wikimedia_commons_category.wikimedia_commons_id), (u'', wikimedia_commons_category.main_image)]
+
+def wikimedia_commons_file_texts(wikimedia_commons_file):
+    return [(u'', wikimedia_commons_file.wikimedia_commons_id)]
+
+def superlachaise_category_texts(superlachaise_category):
+    texts = [(u'', superlachaise_category.code), (u'', superlachaise_category.type), (u'', superlachaise_category.values)]
+    for superlachaise_localized_category in superlachaise_category.localizations.all():
+        texts.append((superlachaise_localized_category.language.code, superlachaise_localized_category.name))
+    return texts
+
+def superlachaise_poi_texts(superlachaise_poi):
+    texts = []
+    if superlachaise_poi.openstreetmap_element:
+        texts.extend(openstreetmap_element_texts(superlachaise_poi.openstreetmap_element))
+    for superlachaise_localized_poi in superlachaise_poi.localizations.all():
+        texts.append((superlachaise_localized_poi.language.code, superlachaise_localized_poi.name))
+        texts.append((superlachaise_localized_poi.language.code, superlachaise_localized_poi.description))
+    for wikidata_entry in superlachaise_poi.wikidata_entries.all():
+        texts.extend(wikidata_entry_texts(wikidata_entry))
+    return texts
+
+# The indexed models, with the related objects of their searched fields and the function returning their (language code, text) pairs
+INDEXES = [
+    (OpenStreetMapElement, [], openstreetmap_element_texts),
+    (WikidataEntry, [Prefetch('localizations', queryset=WikidataLocalizedEntry.objects.select_related('language').order_by())], wikidata_entry_texts),
+    (WikimediaCommonsCategory, [], wikimedia_commons_category_texts),
+    (WikimediaCommonsFile, [], wikimedia_commons_file_texts),
+    (SuperLachaiseCategory, [Prefetch('localizations', queryset=SuperLachaiseLocalizedCategory.objects.select_related('language').order_by())], superlachaise_category_texts),
+    (SuperLachaisePOI, ['openstreetmap_element', Prefetch('localizations', queryset=SuperLachaiseLocalizedPOI.objects.select_related('language').order_by()), Prefetch('wikidata_entries', queryset=WikidataEntry.objects.prefetch_related(Prefetch('localizations', queryset=WikidataLocalizedEntry.objects.select_related('language').order_by())).order_by())], superlachaise_poi_texts),
+]
+
+def object_type(model):
+    return model._meta.model_name
+
+# The models of the related objects whose texts are indexed with another object, with the indexed model and the field of its id
+RELATED_OBJECTS = [
+    (WikidataLocalizedEntry, WikidataEntry, 'wikidata_entry_id'),
+    (SuperLachaiseLocalizedCategory, SuperLachaiseCategory, 'superlachaise_category_id'),
+    (SuperLachaiseLocalizedPOI, SuperLachaisePOI, 'superlachaise_poi_id'),
+    (SuperLachaiseWikidataRelation, SuperLachaisePOI, 'superlachaise_poi_id'),
+]
+
+# The indexed model and the field of the id of the indexed object of a changed object, by model
+INDEXED_OBJECT_FIELDS = dict([(model, (model, 'pk')) for (model, related, texts) in INDEXES] + [(model, (indexed_model, field)) for (model, indexed_model, field) in RELATED_OBJECTS])
+
+MODELS = [model for (model, related, texts) in INDEXES] + [model for (model, indexed_model, field) in RELATED_OBJECTS]
+
+# The ids of the indexed objects changed since the last update by this process, by model
+changes_lock = threading.Lock()
+changed_ids = defaultdict(set)
+
+def build(model, related, texts, object_ids=None, chunk_size=500):
+    """ Replace the search index entries of a model, or of the objects of a model with object_ids ; return the number of entries """
+    entries_count = 0
+    
+    with transaction.atomic():
+        if object_ids is None:
+            SearchIndexEntry.objects.filter(object_type=object_type(model)).delete()
+            pks = list(model.objects.values_list('pk', flat=True).order_by('pk'))
+        else:
+            pks = sorted(object_ids)
+        for chunk in [pks[i:i+chunk_size] for i in range(0,len(pks),chunk_size)]:
+            if object_ids is not None:
+                SearchIndexEntry.objects.filter(object_type=object_type(model), object_id__in=chunk).delete()
+            entries = []
+            # Deleted objects are not found, so they keep no entries
+            queryset = model.objects.filter(pk__in=chunk).order_by()
+            for lookup in related:
+                if isinstance(lookup, basestring):
+                    queryset = queryset.select_related(lookup)
+                else:
+                    queryset = queryset.prefetch_related(lookup)
+            for obj in queryset:
+                object_tokens = set()
+                for (language_code, text) in texts(obj):
+                    object_tokens.update([(language_code, token[:255]) for token in tokens(text)])
+                for (language_code, token) in object_tokens:
+                    entries.append(SearchIndexEntry(object_type=object_type(model), object_id=obj.pk, language_code=language_code, token=token))
+            SearchIndexEntry.objects.bulk_create(entries)
+            entries_count += len(entries)
+    
+    return entries_count
+
+def build_all():
+    """ Rebuild the search index of all indexed models ; return the number of entries """
+    return sum([build(model, related, texts) for (model, related, texts) in INDEXES])
+
+def build_if_empty():
+    # The index was never built, e.g. right after migrating
+    if not SearchIndexEntry.objects.exists():
+        build_all()
+
+def update(object_ids, chunk_size=500):
+    """ Replace the search index entries of the objects with object_ids by model, and of the POIs containing their texts ; return the number of entries """
+    superlachaise_poi_ids = set(object_ids.get(SuperLachaisePOI, []))
+    for (model, field) in [(OpenStreetMapElement, 'openstreetmap_element_id__in'), (WikidataEntry, 'wikidata_entries__in')]:
+        pks = sorted(object_ids.get(model, []))
+        for chunk in [pks[i:i+chunk_size] for i in range(0,len(pks),chunk_size)]:
+            superlachaise_poi_ids.update(SuperLachaisePOI.objects.filter(**{field: chunk}).order_by().values_list('pk', flat=True))
+    object_ids = dict(object_ids, **{SuperLachaisePOI: superlachaise_poi_ids})
+    
+    return sum([build(model, related, texts, object_ids[model]) for (model, related, texts) in INDEXES if object_ids.get(model)])
+
+def record_change(sender, instance):
+    (indexed_model, field) = INDEXED_OBJECT_FIELDS[sender]
+    object_id = getattr(instance, field)
+    if object_id is not None:
+        with changes_lock:
+            changed_ids[indexed_model].add(object_id)
+
+def record_save(sender, instance, update_fields=None, **kwargs):
+    # Saving the modified date only does not change indexed texts
+    if update_fields is not None and set(update_fields) == set(['modified']):
+        return
+    record_change(sender, instance)
+
+def record_delete(sender, instance, **kwargs):
+    record_change(sender, instance)
+
+def pop_changes():
+    """ Return and forget the ids of the indexed objects changed since the last call, by model """
+    with changes_lock:
+        result = {model: set(ids) for model, ids in changed_ids.iteritems()}
+        changed_ids.clear()
+    return result
+
+def update_search_index(sender, **kwargs):
+    """ Signal receiver updating the search index entries of the objects changed since the last update """
+    object_ids = pop_changes()
+    if not SearchIndexEntry.objects.exists():
+        build_all()
+    elif object_ids:
+        update(object_ids)
+
+def similar_tokens(model, token):
+    """ Return the indexed tokens starting like token with a few typos """
+    result = []
+    candidates = SearchIndexEntry.objects.filter(object_type=object_type(model), token__startswith=token[0]).order_by().values_list('token', flat=True).distinct()
+    for candidate in candidates:
+        if edit_distance(token, candidate[:len(token)]) <= max_typos(token):
+            result.append(candidate)
+    return result
+
+def matching_ids(model, token, fuzzy=False):
+    """ Return the queryset of the ids of the objects with a token starting with token """
+    token_filter = Q(token__startswith=token)
+    if fuzzy and len(token) >= FUZZY_MIN_LENGTH:
+        token_filter = token_filter | Q(token__in=similar_tokens(model, token))
+    return SearchIndexEntry.objects.filter(token_filter, object_type=object_type(model)).order_by().values('object_id')
+
+def term_filter(model, search_term, fuzzy=False):
+    """ Return the filter of the objects matching all the tokens of a search word """
+    result = Q()
+    for token in tokens(search_term):
+        result &= Q(pk__in=matching_ids(model, token, fuzzy))
+    return result
+
+def search(queryset, search, fuzzy=False):
+    """ Filter a queryset with the objects matching all the words of search """
+    if search.split():
+        build_if_empty()
+    for search_term in search.split():
+        queryset = queryset.filter(term_filter(queryset.model, search_term, fuzzy))
+    return queryset
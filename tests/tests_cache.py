@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_cache.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import threading
+from django.contrib.admin.models import LogEntry, ADDITION
+from django.contrib.auth.models import User
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from superlachaise_api import cache, views
+from superlachaise_api.models import *
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'responses'},
+}
+
+@override_settings(CACHES=CACHES, RESPONSE_CACHE='responses', ROOT_URLCONF='superlachaise_api.urls')
+class CacheResponseTestCase(TestCase):
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.calls = 0
+        cache.get_cache().clear()
+    
+    def view(self, request):
+        self.calls += 1
+        return HttpResponse(u'content %d' % self.calls, content_type='application/json; charset=utf-8')
+    
+    def get(self, path='/', view=None):
+        return cache.cache_response(view or self.view)(self.factory.get(path))
+    
+    def cache_response_for(self, request):
+        return cache.cache_response(self.view)(request)
+    
+    def test_second_request_returns_cached_response(self):
+        first_response = self.get('/objects/?a=1')
+        second_response = self.get('/objects/?a=1')
+        
+        self.assertEqual(1, self.calls)
+        self.assertEqual('MISS', first_response['X-Cache'])
+        self.assertEqual('HIT', second_response['X-Cache'])
+        self.assertEqual(first_response.content, second_response.content)
+        self.assertEqual(first_response['Content-Type'], second_response['Content-Type'])
+    
+    def test_cached_api_response_does_not_query_database(self):
+        request = self.factory.get('/superlachaise_pois/')
+        content = views.superlachaise_poi_list(request).content
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(content, views.superlachaise_poi_list(self.factory.get('/superlachaise_pois/')).content)
+    
+    def test_non_ascii_detail_path_is_cached(self):
+        WikimediaCommonsCategory.objects.create(wikimedia_commons_id=u'Category:Frédéric Chopin')
+        first_response = self.client.get(u'/wikimedia_commons_categories/Category:Frédéric Chopin/')
+        second_response = self.client.get(u'/wikimedia_commons_categories/Category:Frédéric Chopin/')
+        
+        self.assertEqual(200, first_response.status_code)
+        self.assertEqual('MISS', first_response['X-Cache'])
+        self.assertEqual('HIT', second_response['X-Cache'])
+        self.assertEqual(first_response.content, second_response.content)
+    
+    def test_query_parameters_order_does_not_change_key(self):
+        self.get('/objects/?a=1&b=2')
+        self.get('/objects/?b=2&a=1')
+        
+        self.assertEqual(1, self.calls)
+    
+    def test_different_query_parameters_change_key(self):
+        self.get('/objects/?a=1')
+        self.get('/objects/?a=2')
+        self.get('/other_objects/?a=1')
+        
+        self.assertEqual(3, self.calls)
+    
+    def test_response_formats_change_key(self):
+        self.cache_response_for(self.factory.get('/objects/'))
+        self.cache_response_for(self.factory.get('/objects/', HTTP_ACCEPT='text/html'))
+        self.cache_response_for(self.factory.get('/objects/?format=pretty'))
+        
+        self.assertEqual(2, self.calls)
+    
+    def test_schemes_and_hosts_change_key(self):
+        self.cache_response_for(self.factory.get('/objects/', HTTP_HOST='a.example'))
+        self.cache_response_for(self.factory.get('/objects/', HTTP_HOST='a.example'))
+        self.cache_response_for(self.factory.get('/objects/', HTTP_HOST='b.example'))
+        self.cache_response_for(self.factory.get('/objects/', HTTP_HOST='a.example', secure=True))
+        
+        self.assertEqual(3, self.calls)
+    
+    def test_cached_absolute_urls_match_request_host(self):
+        request = self.factory.get('/superlachaise_pois/', HTTP_HOST='a.example')
+        views.superlachaise_poi_list(request)
+        
+        response = views.superlachaise_poi_list(self.factory.get('/superlachaise_pois/', HTTP_HOST='b.example', secure=True))
+        
+        self.assertEqual('MISS', response['X-Cache'])
+        self.assertIn('https://b.example/', response.content)
+        self.assertNotIn('a.example', response.content)
+    
+    def test_response_is_not_cached_if_cache_is_disabled(self):
+        with self.settings(RESPONSE_CACHE=None):
+            self.get()
+            self.get()
+        
+        self.assertEqual(2, self.calls)
+    
+    def test_error_response_is_not_cached(self):
+        def view(request):
+            self.calls += 1
+            raise Http404
+        
+        for i in range(2):
+            with self.assertRaises(Http404):
+                self.get(view=view)
+        
+        self.assertEqual(2, self.calls)
+    
+    def test_synchronization_save_invalidates_cached_responses(self):
+        self.get()
+        
+        Synchronization.objects.create(name="name")
+        response = self.get()
+        
+        self.assertEqual(2, self.calls)
+        self.assertEqual('MISS', response['X-Cache'])
+    
+    def test_admin_edit_invalidates_cached_responses(self):
+        self.get()
+        user = User.objects.create(username="username")
+        
+        LogEntry.objects.log_action(user.pk, None, None, u"object", ADDITION)
+        self.get()
+        
+        self.assertEqual(2, self.calls)
+    
+    def test_stats_count_hits_and_misses(self):
+        cache.reset_stats()
+        
+        self.get('/a/')
+        self.get('/a/')
+        self.get('/a/')
+        self.get('/b/')
+        
+        self.assertEqual((2, 2), cache.stats())
+    
+    def test_concurrent_miss_waits_for_response_computed_by_lock_holder(self):
+        response_cache = cache.get_cache()
+        request = self.factory.get('/objects/')
+        key = cache.response_key(request, cache.dataset_version(response_cache))
+        response_cache.add(key + ':lock', 1, cache.LOCK_TIMEOUT)
+        
+        def compute():
+            response_cache.set(key, ('computed', 'application/json; charset=utf-8'))
+            response_cache.delete(key + ':lock')
+        timer = threading.Timer(0.2, compute)
+        timer.start()
+        
+        response = cache.cache_response(self.view)(request)
+        timer.join()
+        
+        self.assertEqual(0, self.calls)
+        self.assertEqual('computed', response.content)
+        self.assertEqual('HIT', response['X-Cache'])
+    
+    def test_concurrent_miss_computes_response_if_lock_holder_fails(self):
+        response_cache = cache.get_cache()
+        request = self.factory.get('/objects/')
+        key = cache.response_key(request, cache.dataset_version(response_cache))
+        response_cache.add(key + ':lock', 1, cache.LOCK_TIMEOUT)
+        
+        timer = threading.Timer(0.2, lambda: response_cache.delete(key + ':lock'))
+        timer.start()
+        
+        response = cache.cache_response(self.view)(request)
+        timer.join()
+        
+        self.assertEqual(1, self.calls)
+        self.assertEqual('MISS', response['X-Cache'])
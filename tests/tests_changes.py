@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_changes.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.core.exceptions import SuspiciousOperation
+from django.test import TestCase, override_settings
+from mock import patch
+
+from superlachaise_api import changes, views
+from superlachaise_api.models import *
+from superlachaise_api.tests.tests_views import ViewsTestCase
+
+class ChangeLogTestCase(TestCase):
+    
+    def change_log(self):
+        return list(ChangeLogEntry.objects.values_list('action', 'object_type', 'natural_key'))
+    
+    def test_created_updated_and_deleted_objects_are_logged_once(self):
+        wikimedia_commons_file = WikimediaCommonsFile.objects.create(wikimedia_commons_id="File:file.jpg")
+        self.assertEqual([(ChangeLogEntry.CREATE, 'wikimediacommonsfile', 'File:file.jpg')], self.change_log())
+        
+        wikimedia_commons_file.author = "author"
+        wikimedia_commons_file.save()
+        self.assertEqual([(ChangeLogEntry.UPDATE, 'wikimediacommonsfile', 'File:file.jpg')], self.change_log())
+        
+        wikimedia_commons_file.delete()
+        self.assertEqual([(ChangeLogEntry.DELETE, 'wikimediacommonsfile', 'File:file.jpg')], self.change_log())
+    
+    def test_natural_key_of_openstreetmap_element_includes_type(self):
+        OpenStreetMapElement.objects.create(openstreetmap_id="1000", type=OpenStreetMapElement.WAY)
+        
+        self.assertEqual([(ChangeLogEntry.CREATE, 'openstreetmapelement', 'way/1000')], self.change_log())
+    
+    def test_localization_changes_are_logged_as_updates_of_their_object(self):
+        superlachaise_category = SuperLachaiseCategory.objects.create(code="category", type=SuperLachaiseCategory.OCCUPATION)
+        language = Language.objects.create(code='fr', enumeration_separator=', ', last_enumeration_separator=' & ', artist_prefix='')
+        
+        SuperLachaiseLocalizedCategory.objects.create(superlachaise_category=superlachaise_category, language=language, name="category")
+        
+        self.assertEqual([(ChangeLogEntry.UPDATE, 'superlachaisecategory', 'category')], self.change_log())
+    
+    def test_changes_are_read_in_sequence_order_by_batches(self):
+        for index in range(5):
+            WikimediaCommonsFile.objects.create(wikimedia_commons_id="File:file %d.jpg" % index)
+        
+        (change_log_entries, has_more) = changes.changes(None, 3)
+        self.assertEqual(3, len(change_log_entries))
+        self.assertTrue(has_more)
+        
+        (next_change_log_entries, has_more) = changes.changes(change_log_entries[-1].pk, 3)
+        self.assertEqual(["File:file 3.jpg", "File:file 4.jpg"], [change_log_entry.natural_key for change_log_entry in next_change_log_entries])
+        self.assertFalse(has_more)
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class ChangeListTestCase(ViewsTestCase):
+    
+    def follow_changes(self, since=None):
+        result = []
+        path = '/?since=%d' % since if since is not None else '/'
+        while True:
+            response = self.json_response(views.change_list, path)
+            result.extend(response['result'])
+            if not response['has_more']:
+                return (result, response['next_since'])
+            path = '/?since=%d' % response['next_since']
+    
+    @patch.object(views, 'CHANGES_BATCH_SIZE', 2)
+    def test_change_list_returns_changes_since_token(self):
+        superlachaise_pois = self.create_superlachaise_pois(2)
+        (result, since) = self.follow_changes()
+        self.assertEqual(set(['OpenStreetMapElement', 'WikidataEntry', 'WikimediaCommonsCategory', 'WikimediaCommonsFile', 'SuperLachaiseCategory', 'SuperLachaisePOI']), set([change['model'] for change in result]))
+        self.assertEqual(len(result), len(set([(change['model'], change['id']) for change in result])))
+        
+        superlachaise_poi_id = superlachaise_pois[0].pk
+        superlachaise_pois[0].delete()
+        WikimediaCommonsFile.objects.filter(wikimedia_commons_id="File:file 1.jpg").get().save()
+        
+        (result, next_since) = self.follow_changes(since)
+        
+        self.assertEqual([
+            (ChangeLogEntry.DELETE, 'SuperLachaisePOI', unicode(superlachaise_poi_id)),
+            (ChangeLogEntry.UPDATE, 'WikimediaCommonsFile', "File:file 1.jpg"),
+        ], [(change['action'], change['model'], change['id']) for change in result])
+        self.assertEqual(([], next_since), self.follow_changes(next_since))
+    
+    def test_invalid_since_parameter_raises_suspicious_operation(self):
+        for since in ['invalid', '-1']:
+            with self.assertRaises(SuspiciousOperation):
+                self.get(views.change_list, '/?since=%s' % since)
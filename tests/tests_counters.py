@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_counters.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.contrib.admin.sites import AdminSite
+from django.test import RequestFactory, override_settings
+
+from superlachaise_api import counters, views
+from superlachaise_api.admin import SuperLachaiseCategoryAdmin
+from superlachaise_api.models import *
+from superlachaise_api.tests.tests_views import ViewsTestCase
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class CountersTestCase(ViewsTestCase):
+    
+    def test_update_counts_objects(self):
+        superlachaise_pois = self.create_superlachaise_pois(3)
+        SuperLachaiseCategoryRelation.objects.create(superlachaise_poi=superlachaise_pois[1], superlachaise_category=SuperLachaiseCategory.objects.get(code='category_0'))
+        
+        counters.update()
+        
+        self.assertEqual(3, counters.value(Counter.OBJECTS, 'SuperLachaisePOI'))
+        self.assertEqual(6, counters.value(Counter.OBJECTS, 'WikidataEntry'))
+        self.assertEqual({'category_0': 2, 'category_1': 1, 'category_2': 1}, counters.values(Counter.CATEGORY_MEMBERS))
+        self.assertEqual({'category_0': 1, 'category_1': 1, 'category_2': 1}, counters.values(Counter.CATEGORY_OCCUPATIONS))
+        self.assertEqual({'0': 1, '1': 1, '2': 1}, counters.values(Counter.SECTOR_POIS))
+        self.assertEqual(0, counters.value(Counter.CATEGORY_MEMBERS, 'unknown'))
+    
+    def test_update_writes_changed_counters_only(self):
+        superlachaise_pois = self.create_superlachaise_pois(2)
+        WikidataOccupation.objects.get(wikidata_id='Q5000').used_in.add(*WikidataEntry.objects.all())
+        self.assertNotEqual((0, 0), counters.update())
+        self.assertEqual((0, 0), counters.update())
+        self.assertEqual({'Q5000': 4}, counters.values(Counter.OCCUPATION_USAGE))
+        
+        superlachaise_pois[1].delete()
+        
+        # The POI count and the category_1 and sector 1 counters change
+        self.assertEqual((1, 2), counters.update())
+    
+    def test_synchronization_end_updates_counters(self):
+        self.create_superlachaise_pois(1)
+        
+        Synchronization.objects.create(name='openstreetmap')
+        
+        self.assertEqual(1, counters.value(Counter.OBJECTS, 'SuperLachaisePOI'))
+    
+    def test_changes_mark_the_counters_to_update(self):
+        superlachaise_pois = self.create_superlachaise_pois(2)
+        counters.pop_changes()
+        
+        WikimediaCommonsFile.objects.create(wikimedia_commons_id="File:new file.jpg")
+        SuperLachaiseCategoryRelation.objects.create(superlachaise_poi=superlachaise_pois[0], superlachaise_category=SuperLachaiseCategory.objects.get(code='category_1'))
+        
+        # Relations touch their POI, which marks sectors
+        self.assertEqual((set([Counter.CATEGORY_MEMBERS, Counter.SECTOR_POIS]), set([WikimediaCommonsFile])), counters.pop_changes())
+        
+        WikidataOccupation.objects.get(wikidata_id='Q5000').used_in.add(WikidataEntry.objects.first())
+        
+        self.assertEqual((set([Counter.OCCUPATION_USAGE]), set()), counters.pop_changes())
+    
+    def test_synchronization_end_updates_changed_counters(self):
+        superlachaise_pois = self.create_superlachaise_pois(2)
+        counters.update()
+        counters.pop_changes()
+        
+        WikimediaCommonsFile.objects.create(wikimedia_commons_id="File:new file.jpg")
+        SuperLachaiseCategoryRelation.objects.create(superlachaise_poi=superlachaise_pois[1], superlachaise_category=SuperLachaiseCategory.objects.get(code='category_0'))
+        Synchronization.objects.create(name='superlachaise_pois')
+        
+        self.assertEqual(3, counters.value(Counter.OBJECTS, 'WikimediaCommonsFile'))
+        self.assertEqual({'category_0': 2, 'category_1': 1}, counters.values(Counter.CATEGORY_MEMBERS))
+        self.assertEqual((set(), set()), counters.pop_changes())
+    
+    def test_unchanged_counter_types_are_not_recounted(self):
+        self.create_superlachaise_pois(2)
+        counters.update()
+        counters.pop_changes()
+        Counter.objects.filter(type=Counter.CATEGORY_MEMBERS).update(value=42)
+        
+        WikimediaCommonsFile.objects.create(wikimedia_commons_id="File:new file.jpg")
+        Synchronization.objects.create(name='wikimedia_commons_files')
+        
+        self.assertEqual(3, counters.value(Counter.OBJECTS, 'WikimediaCommonsFile'))
+        self.assertEqual({'category_0': 42, 'category_1': 42}, counters.values(Counter.CATEGORY_MEMBERS))
+    
+    def test_member_count_change_touches_category(self):
+        superlachaise_pois = self.create_superlachaise_pois(2)
+        counters.update()
+        modified = SuperLachaiseCategory.objects.get(code='category_0').modified
+        
+        SuperLachaiseCategoryRelation.objects.create(superlachaise_poi=superlachaise_pois[1], superlachaise_category=SuperLachaiseCategory.objects.get(code='category_0'))
+        counters.update()
+        
+        self.assertTrue(SuperLachaiseCategory.objects.get(code='category_0').modified > modified)
+        self.assertEqual(2, self.json_response(views.superlachaise_category, id='category_0')['result']['members_count'])
+    
+    def test_superlachaise_category_list_returns_member_counts(self):
+        self.create_superlachaise_pois(2)
+        counters.update()
+        
+        result = self.json_response(views.superlachaise_category_list)['result']
+        
+        self.assertEqual([('category_0', 1), ('category_1', 1)], [(item['code'], item['members_count']) for item in result])
+    
+    def test_sectors_view_reads_counters(self):
+        self.create_superlachaise_pois(3)
+        WikidataEntry.objects.filter(burial_plot_reference='2').update(burial_plot_reference='10')
+        counters.update()
+        
+        result = self.json_response(views.superlachaise_poi_sectors)['result']
+        
+        self.assertEqual([('0', 1), ('1', 1), ('10', 1)], [(item['sector'], item['count']) for item in result])
+        self.assertTrue(result[2]['url'].endswith('/superlachaise_pois/?sector=10'))
+    
+    def test_objects_view_reads_counters(self):
+        self.create_superlachaise_pois(1)
+        counters.update()
+        Counter.objects.filter(type=Counter.OBJECTS, key='SuperLachaisePOI').update(value=42)
+        
+        result = self.json_response(views.objects)['result']
+        
+        self.assertEqual(42, [item['count'] for item in result if item['model'] == 'SuperLachaisePOI'][0])
+    
+    def test_superlachaise_category_admin_reads_counters(self):
+        self.create_superlachaise_pois(1)
+        counters.update()
+        model_admin = SuperLachaiseCategoryAdmin(SuperLachaiseCategory, AdminSite())
+        superlachaise_category = SuperLachaiseCategory.objects.get(code='category_0')
+        
+        with self.assertNumQueries(2):
+            self.assertEqual(1, model_admin.members_count(superlachaise_category))
+            self.assertEqual(1, model_admin.wikidata_occupations_count(superlachaise_category))
+    
+    def test_superlachaise_category_admin_reads_counters_once_per_request(self):
+        self.create_superlachaise_pois(3)
+        counters.update()
+        model_admin = SuperLachaiseCategoryAdmin(SuperLachaiseCategory, AdminSite())
+        superlachaise_categories = list(model_admin.get_queryset(RequestFactory().get('/')))
+        
+        with self.assertNumQueries(1):
+            self.assertEqual([1, 1, 1], [model_admin.members_count(superlachaise_category) for superlachaise_category in superlachaise_categories])
+        
+        Counter.objects.filter(type=Counter.CATEGORY_MEMBERS).update(value=42)
+        model_admin.get_queryset(RequestFactory().get('/'))
+        
+        self.assertEqual(42, model_admin.members_count(superlachaise_categories[0]))
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_dumps.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip, hashlib, json, os, shutil, sqlite3, tempfile
+from StringIO import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase, override_settings
+from mock import patch
+
+from superlachaise_api import dumps, reference_data
+from superlachaise_api.fragments import FragmentStore
+from superlachaise_api.models import *
+from superlachaise_api.management.commands import dump_database, dump_sqlite
+from superlachaise_api.tests.tests_views import ViewsTestCase, ViewsTestMixin
+from superlachaise_api.views import SuperLachaiseEncoder
+
+class DumpsTestMixin(ViewsTestMixin):
+    
+    def setUp(self):
+        super(DumpsTestMixin, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(DATABASE_DUMP_DIR=self.directory + '/')
+        self.settings_override.enable()
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory)
+        super(DumpsTestMixin, self).tearDown()
+    
+    def read(self, file_name):
+        with open(os.path.join(self.directory, file_name), 'rb') as dump_file:
+            return dump_file.read()
+    
+    def dump_database(self):
+        with patch('sys.stdout', new_callable=StringIO) as stdout:
+            call_command('dump_database')
+        return stdout.getvalue()
+
+class DumpsTestCase(DumpsTestMixin, ViewsTestCase):
+    
+    def test_dump_database_writes_compressed_variants_and_manifest(self):
+        self.create_superlachaise_pois(2)
+        
+        self.dump_database()
+        
+        manifest = json.loads(self.read(dumps.MANIFEST_FILE_NAME))
+        self.assertEqual(6, len(manifest['files']))
+        for file_name, entry in manifest['files'].iteritems():
+            content = self.read(file_name)
+            self.assertEqual(hashlib.sha256(content).hexdigest(), entry['sha256'])
+            self.assertEqual(len(content), entry['size'])
+            self.assertEqual(content, gzip.GzipFile(fileobj=StringIO(self.read(entry['variants']['gzip']['file']))).read())
+            self.assertEqual(hashlib.sha256(self.read(file_name + '.gz')).hexdigest(), entry['variants']['gzip']['sha256'])
+        self.assertEqual(2, len(json.loads(self.read('superlachaise_pois.json'))['superlachaise_pois']))
+    
+    def test_unchanged_files_are_not_written(self):
+        superlachaise_pois = self.create_superlachaise_pois(2)
+        self.dump_database()
+        manifest = json.loads(self.read(dumps.MANIFEST_FILE_NAME))
+        
+        self.assertIn('Unchanged dump files: 6', self.dump_database())
+        
+        superlachaise_pois[0].delete()
+        with patch.object(dumps, 'publish', wraps=dumps.publish) as publish:
+            self.assertIn('Written dump files: 1', self.dump_database())
+        
+        # The gzip variant, the file and the manifest
+        self.assertEqual(['superlachaise_pois.json.gz', 'superlachaise_pois.json', dumps.MANIFEST_FILE_NAME], [os.path.basename(call[0][1]) for call in publish.call_args_list])
+        self.assertNotEqual(manifest['files']['superlachaise_pois.json'], json.loads(self.read(dumps.MANIFEST_FILE_NAME))['files']['superlachaise_pois.json'])
+    
+    def test_missing_files_are_written(self):
+        self.dump_database()
+        os.remove(os.path.join(self.directory, 'wikidata_entries.json.gz'))
+        
+        self.assertIn('Written dump files: 1', self.dump_database())
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'wikidata_entries.json.gz')))
+    
+    def test_write_atomically_leaves_no_temporary_file(self):
+        path = os.path.join(self.directory, 'file.json')
+        dumps.write_atomically(path, 'content')
+        dumps.write_atomically(path, 'new content')
+        
+        self.assertEqual('new content', self.read('file.json'))
+        self.assertEqual(['file.json'], os.listdir(self.directory))
+    
+    def test_write_artifact_streams_chunks(self):
+        manifest = {'files': {}}
+        
+        self.assertTrue(dumps.write_artifact(self.directory, 'file.json', iter(['con', '', 'tent']), manifest))
+        
+        self.assertEqual('content', self.read('file.json'))
+        self.assertEqual('content', gzip.GzipFile(fileobj=StringIO(self.read('file.json.gz'))).read())
+        self.assertEqual(hashlib.sha256('content').hexdigest(), manifest['files']['file.json']['sha256'])
+        self.assertEqual(7, manifest['files']['file.json']['size'])
+        self.assertFalse(any(name.startswith('.') for name in os.listdir(self.directory)))
+    
+    def test_gzip_compression_is_deterministic(self):
+        manifest = {'files': {}}
+        dumps.write_artifact(self.directory, 'file.json', ['content'], manifest)
+        compressed = self.read('file.json.gz')
+        
+        dumps.write_artifact(self.directory, 'other_file.json', ['content'], manifest)
+        
+        self.assertEqual(compressed, self.read('other_file.json.gz'))
+    
+    def test_failed_write_removes_temporary_files(self):
+        def chunks():
+            yield 'content'
+            raise ValueError()
+        
+        with self.assertRaises(ValueError):
+            dumps.write_artifact(self.directory, 'file.json', chunks(), {'files': {}})
+        
+        self.assertEqual([], os.listdir(self.directory))
+    
+    def test_streamed_dump_is_encoded_like_the_whole_dataset(self):
+        self.create_superlachaise_pois(5)
+        
+        with patch('sys.stdout', new_callable=StringIO):
+            call_command('dump_database', chunk_size=2)
+        
+        encoder = SuperLachaiseEncoder(None, languages=reference_data.languages(), restrict_fields=True)
+        content = json.loads(self.read('superlachaise_pois.json'))
+        expected = encoder.encode({
+            'about': content['about'],
+            'superlachaise_pois': encoder.prefetch(SuperLachaisePOI.objects.all().order_by('openstreetmap_element_id')),
+        })
+        self.assertEqual(expected.encode('utf8'), self.read('superlachaise_pois.json'))
+        self.assertEqual(5, len(content['superlachaise_pois']))
+    
+    def test_streamed_dump_of_an_empty_model(self):
+        self.dump_database()
+        
+        self.assertEqual([], json.loads(self.read('superlachaise_pois.json'))['superlachaise_pois'])
+    
+    def test_benchmark_dump_prints_peak_memory_and_rolls_back_dataset(self):
+        self.create_superlachaise_pois(1)
+        
+        with patch('sys.stdout', new_callable=StringIO) as stdout:
+            call_command('benchmark_dump', count=3, chunk_size=2)
+        
+        self.assertIn('Peak RSS after the dump', stdout.getvalue())
+        self.assertIn('superlachaise_pois.json.gz', stdout.getvalue())
+        self.assertEqual(1, SuperLachaisePOI.objects.count())
+        self.assertEqual([], os.listdir(self.directory))
+    
+    def test_failed_model_dump_publishes_no_file(self):
+        self.create_superlachaise_pois(2)
+        self.dump_database()
+        content = self.read('superlachaise_pois.json')
+        manifest = self.read(dumps.MANIFEST_FILE_NAME)
+        
+        self.create_superlachaise_pois(1)
+        stage_model = dump_database.Command.stage_model
+        def failing_stage_model(command, index, chunk_size, manifest_entry):
+            if dump_database.Command.MODELS_TO_DUMP[index][0] == WikidataEntry:
+                raise ValueError()
+            return stage_model(command, index, chunk_size, manifest_entry)
+        
+        with patch.object(dump_database.Command, 'stage_model', failing_stage_model):
+            with self.assertRaises(CommandError):
+                self.dump_database()
+        
+        self.assertEqual(content, self.read('superlachaise_pois.json'))
+        self.assertEqual(manifest, self.read(dumps.MANIFEST_FILE_NAME))
+        self.assertFalse(any(name.startswith('.') for name in os.listdir(self.directory)))
+    
+    def test_only_modified_objects_are_encoded(self):
+        superlachaise_pois = self.create_superlachaise_pois(3)
+        self.dump_database()
+        
+        with patch.object(FragmentStore, 'encode_object', autospec=True, side_effect=FragmentStore.encode_object) as encode_object:
+            self.assertIn('Unchanged dump files: 6', self.dump_database())
+        self.assertEqual(0, encode_object.call_count)
+        
+        superlachaise_pois[1].burial_plot_reference = u'modified'
+        superlachaise_pois[1].save()
+        superlachaise_pois[2].delete()
+        with patch.object(FragmentStore, 'encode_object', autospec=True, side_effect=FragmentStore.encode_object) as encode_object:
+            self.dump_database()
+        
+        self.assertEqual([superlachaise_pois[1].pk], [call[0][1].pk for call in encode_object.call_args_list])
+        result = json.loads(self.read('superlachaise_pois.json'))['superlachaise_pois']
+        self.assertEqual(2, len(result))
+        self.assertEqual(u'modified', result[1]['burial_plot_reference'])
+    
+    def test_dump_uses_the_fragments_of_the_api(self):
+        self.create_superlachaise_pois(2)
+        with patch('sys.stdout', new_callable=StringIO):
+            call_command('build_fragments')
+        
+        with patch.object(FragmentStore, 'encode_object', autospec=True, side_effect=FragmentStore.encode_object) as encode_object:
+            self.dump_database()
+        
+        self.assertEqual(0, encode_object.call_count)
+    
+    def test_dump_sqlite_writes_tables_and_indexes(self):
+        superlachaise_pois = self.create_superlachaise_pois(3)
+        SuperLachaiseLocalizedPOI.objects.filter(superlachaise_poi=superlachaise_pois[1]).update(name=u'Frédéric Chopin')
+        
+        with patch('sys.stdout', new_callable=StringIO):
+            call_command('dump_sqlite')
+        
+        connection = sqlite3.connect(os.path.join(self.directory, 'superlachaise.sqlite'))
+        try:
+            self.assertEqual(3, connection.execute('SELECT COUNT(*) FROM superlachaise_pois').fetchone()[0])
+            self.assertEqual(6, connection.execute('SELECT COUNT(*) FROM superlachaise_localized_pois').fetchone()[0])
+            self.assertEqual(dump_sqlite.Command.SCHEMA_VERSION, connection.execute('PRAGMA user_version').fetchone()[0])
+            
+            superlachaise_poi_ids = connection.execute("SELECT DISTINCT superlachaise_poi_id FROM superlachaise_localized_pois JOIN superlachaise_localized_pois_search ON superlachaise_localized_pois.id = superlachaise_localized_pois_search.docid WHERE superlachaise_localized_pois_search MATCH 'frederic'").fetchall()
+            self.assertEqual([(superlachaise_pois[1].pk,)], superlachaise_poi_ids)
+            
+            query_plan = connection.execute('EXPLAIN QUERY PLAN SELECT id FROM openstreetmap_elements WHERE latitude BETWEEN 0 AND 1 AND longitude BETWEEN 0 AND 1').fetchall()
+            self.assertIn('openstreetmap_elements_latitude_longitude', unicode(query_plan))
+        finally:
+            connection.close()
+        
+        manifest = json.loads(self.read(dumps.MANIFEST_FILE_NAME))
+        self.assertEqual(hashlib.sha256(self.read('superlachaise.sqlite')).hexdigest(), manifest['files']['superlachaise.sqlite']['sha256'])
+        with patch('sys.stdout', new_callable=StringIO) as stdout:
+            call_command('dump_sqlite')
+        self.assertIn('Unchanged dump files: 1', stdout.getvalue())
+        self.assertFalse(any(name.startswith('.') for name in os.listdir(self.directory)))
+
+class ParallelDumpsTestCase(DumpsTestMixin, TransactionTestCase):
+    """ Job processes open their own database connection, and only see committed objects """
+    
+    def test_jobs_write_the_same_files_as_a_single_process(self):
+        self.create_superlachaise_pois(3)
+        self.dump_database()
+        contents = dict((file_name, self.read(file_name)) for file_name in os.listdir(self.directory) if file_name != dumps.MANIFEST_FILE_NAME)
+        for file_name in contents:
+            os.remove(os.path.join(self.directory, file_name))
+        
+        with patch('sys.stdout', new_callable=StringIO) as stdout:
+            call_command('dump_database', jobs=3)
+        
+        self.assertIn('Written dump files: 6', stdout.getvalue())
+        self.assertEqual(contents, dict((file_name, self.read(file_name)) for file_name in contents))
+        self.assertEqual(3, len(json.loads(self.read('superlachaise_pois.json'))['superlachaise_pois']))
+        self.assertEqual(sorted(contents.keys() + [dumps.MANIFEST_FILE_NAME]), sorted(os.listdir(self.directory)))
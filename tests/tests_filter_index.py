@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_filter_index.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import datetime
+from django.test import override_settings
+
+from superlachaise_api import filter_index, search_index, views
+from superlachaise_api.models import *
+from superlachaise_api.tests.tests_views import ViewsTestCase
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class FilterIndexTestCase(ViewsTestCase):
+    
+    def setUp(self):
+        super(FilterIndexTestCase, self).setUp()
+        superlachaise_pois = self.create_superlachaise_pois(4)
+        SuperLachaiseCategoryRelation.objects.create(superlachaise_poi=superlachaise_pois[1], superlachaise_category=SuperLachaiseCategory.objects.get(code='category_0'))
+        WikidataEntry.objects.filter(wikidata_id__startswith='Q2').update(date_of_birth=datetime.date(1815, 6, 18), date_of_death=datetime.date(1890, 1, 1))
+        WikidataEntry.objects.filter(wikidata_id__startswith='Q3').update(date_of_birth=None, date_of_death=datetime.date(1899, 12, 31))
+        filter_index.build()
+    
+    def test_facet_counts_match_superlachaise_poi_list(self):
+        for query in ['', 'category=category_0', 'category=category_0+category_2', 'category=category_0&category=category_1', 'sector=1+3', 'born_after=1810', 'born_before=1810', 'died_after=1895', 'died_before=1890&category=category_2', 'search=name']:
+            facets = self.json_response(views.superlachaise_poi_facets, '/?' + query)['result']
+            superlachaise_pois = self.json_response(views.superlachaise_poi_list, '/?' + query)['result']
+            
+            self.assertEqual(len(superlachaise_pois), facets['object_count'], query)
+            for category in SuperLachaiseCategory.objects.all():
+                self.assertEqual(len([superlachaise_poi for superlachaise_poi in superlachaise_pois if {'code': category.code} in superlachaise_poi['superlachaise_categories']]), facets['categories'][category.code], query)
+    
+    def test_facet_counts(self):
+        facets = self.json_response(views.superlachaise_poi_facets, '/?category=category_0')['result']
+        
+        self.assertEqual(2, facets['object_count'])
+        self.assertEqual({'category_0': 2, 'category_1': 1, 'category_2': 0, 'category_3': 0}, facets['categories'])
+        self.assertEqual({'0': 1, '1': 1, '2': 0, '3': 0}, facets['sectors'])
+        self.assertEqual({'1800': 2, '1810': 0}, facets['decades_of_birth'])
+        self.assertEqual({'1890': 0}, facets['decades_of_death'])
+    
+    def test_synchronization_end_builds_filter_index(self):
+        self.create_superlachaise_pois(1)
+        
+        Synchronization.objects.create(name='openstreetmap')
+        
+        self.assertEqual(5, self.json_response(views.superlachaise_poi_facets)['result']['object_count'])
+    
+    def test_bitmaps(self):
+        self.assertEqual(0, filter_index.bitmap([]))
+        self.assertEqual(0b100101, filter_index.bitmap([5, 0, 2]))
+        self.assertEqual([0, 2, 5], filter_index.bitmap_ids(0b100101))
+        self.assertEqual([], filter_index.bitmap_ids(0))
+        self.assertEqual(3, filter_index.bitmap_count(0b100101))
+    
+    def test_superlachaise_poi_list_filters_match_joined_filters(self):
+        superlachaise_pois = SuperLachaisePOI.objects.all()
+        for query, joined_superlachaise_pois in [
+            ('category=category_0', superlachaise_pois.filter(superlachaise_categories__code='category_0')),
+            ('category=category_0&category=category_1', superlachaise_pois.filter(superlachaise_categories__code='category_0').filter(superlachaise_categories__code='category_1')),
+            ('category=category_2+category_3&sector=3', superlachaise_pois.filter(superlachaise_categories__code__in=['category_2', 'category_3']).filter(wikidata_entries__burial_plot_reference__in=['3'])),
+            ('born_after=1810&died_before=1895', superlachaise_pois.filter(wikidata_entries__date_of_birth__gte=datetime.date(1810, 1, 1)).filter(wikidata_entries__date_of_death__lte=datetime.date(1895, 12, 31))),
+            ('died_after=1890&sector=2+3', superlachaise_pois.filter(wikidata_entries__date_of_death__gte=datetime.date(1890, 12, 31)).filter(wikidata_entries__burial_plot_reference__in=['2', '3'])),
+        ]:
+            result = self.json_response(views.superlachaise_poi_list, '/?' + query)['result']
+            
+            self.assertEqual(sorted(set(joined_superlachaise_pois.values_list('pk', flat=True))), sorted(superlachaise_poi['id'] for superlachaise_poi in result), query)
+    
+    def test_index_is_built_if_missing(self):
+        FilterIndexEntry.objects.all().delete()
+        
+        self.assertEqual(2, len(self.json_response(views.superlachaise_poi_list, '/?category=category_0')['result']))
+        self.assertNotEqual(0, FilterIndexEntry.objects.count())
+    
+    def test_index_is_reloaded_after_build(self):
+        self.assertEqual(1, len(self.json_response(views.superlachaise_poi_list, '/?category=category_2')['result']))
+        SuperLachaiseCategoryRelation.objects.create(superlachaise_poi=SuperLachaisePOI.objects.get(burial_plot_reference='0'), superlachaise_category=SuperLachaiseCategory.objects.get(code='category_2'))
+        
+        filter_index.build()
+        
+        self.assertEqual(2, len(self.json_response(views.superlachaise_poi_list, '/?category=category_2')['result']))
+    
+    def test_indexed_filters_query_budget(self):
+        filter_index.load()
+        search_index.build_all()
+        
+        # The loaded index is only checked for a newer build, and the search index for being built
+        with self.assertNumQueries(1):
+            self.get(views.superlachaise_poi_facets, '/?category=category_0&sector=0+1&born_after=1800&died_before=1900')
+        with self.assertNumQueries(3):
+            self.get(views.superlachaise_poi_facets, '/?category=category_0&search=name')
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_geo.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from decimal import Decimal
+from django.core.exceptions import SuspiciousOperation
+from django.test import TestCase, override_settings
+
+from superlachaise_api import geo, views
+from superlachaise_api.models import *
+from superlachaise_api.tests.tests_views import ViewsTestCase
+
+class GeoFunctionsTestCase(TestCase):
+    
+    def test_encode_geohash_returns_geohash_of_location(self):
+        self.assertEqual('u4pruydqqvj', geo.encode_geohash(57.64911, 10.40744, precision=11))
+        self.assertEqual('u09ty', geo.encode_geohash(Decimal('48.8614'), Decimal('2.3933'), precision=5))
+    
+    def test_covering_cells_cover_bounding_box(self):
+        bbox = (48.859, 2.389, 48.864, 2.399)
+        
+        cells = geo.covering_cells(*bbox)
+        
+        self.assertTrue(0 < len(cells) <= geo.MAX_CELLS)
+        for latitude in [bbox[0], (bbox[0] + bbox[2]) / 2, bbox[2]]:
+            for longitude in [bbox[1], (bbox[1] + bbox[3]) / 2, bbox[3]]:
+                geohash = geo.encode_geohash(latitude, longitude)
+                self.assertTrue(any([geohash.startswith(cell) for cell in cells]))
+    
+    def test_radius_bbox_contains_circle(self):
+        (min_latitude, min_longitude, max_latitude, max_longitude) = geo.radius_bbox(48.8614, 2.3933, 100)
+        
+        self.assertAlmostEqual(100, (max_latitude - 48.8614) * geo.METERS_PER_DEGREE, places=3)
+        self.assertTrue(max_longitude - 2.3933 > max_latitude - 48.8614)
+    
+    def test_openstreetmap_element_save_sets_geohash(self):
+        openstreetmap_element = OpenStreetMapElement.objects.create(openstreetmap_id="1", type=OpenStreetMapElement.NODE, latitude=Decimal('48.8614'), longitude=Decimal('2.3933'))
+        
+        self.assertEqual(geo.encode_geohash(Decimal('48.8614'), Decimal('2.3933')), openstreetmap_element.geohash)
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class GeoViewsTestCase(ViewsTestCase):
+    
+    LATITUDE = 48.8614
+    LONGITUDE = 2.3933
+    
+    def setUp(self):
+        super(GeoViewsTestCase, self).setUp()
+        
+        # POIs 150, 0, 450 and 50 meters north of the location
+        self.superlachaise_pois = self.create_superlachaise_pois(4)
+        for superlachaise_poi, distance in zip(self.superlachaise_pois, [150, 0, 450, 50]):
+            openstreetmap_element = superlachaise_poi.openstreetmap_element
+            openstreetmap_element.latitude = Decimal(repr(self.LATITUDE + distance / geo.METERS_PER_DEGREE)).quantize(Decimal('.0000001'))
+            openstreetmap_element.longitude = Decimal(repr(self.LONGITUDE))
+            openstreetmap_element.save()
+    
+    def result_ids(self, view, path):
+        return [result['id'] for result in self.json_response(view, path)['result']]
+    
+    def test_near_returns_superlachaise_pois_within_radius_ordered_by_distance(self):
+        ids = self.result_ids(views.superlachaise_poi_list, '/?near=%s,%s&radius=200' % (self.LATITUDE, self.LONGITUDE))
+        
+        self.assertEqual([self.superlachaise_pois[i].pk for i in [1, 3, 0]], ids)
+    
+    def test_near_returns_openstreetmap_elements_within_radius_ordered_by_distance(self):
+        result = self.json_response(views.openstreetmap_element_list, '/?near=%s,%s&radius=500' % (self.LATITUDE, self.LONGITUDE))['result']
+        
+        self.assertEqual([self.superlachaise_pois[i].openstreetmap_element.openstreetmap_id for i in [1, 3, 0, 2]], [openstreetmap_element['openstreetmap_id'] for openstreetmap_element in result])
+    
+    def test_near_is_combined_with_other_filters(self):
+        ids = self.result_ids(views.superlachaise_poi_list, '/?near=%s,%s&radius=200&category=category_0+category_3' % (self.LATITUDE, self.LONGITUDE))
+        
+        self.assertEqual([self.superlachaise_pois[i].pk for i in [3, 0]], ids)
+    
+    def test_bbox_returns_superlachaise_pois_inside_bounding_box(self):
+        bbox = '%s,%s,%s,%s' % (self.LONGITUDE - 0.001, self.LATITUDE + 100 / geo.METERS_PER_DEGREE, self.LONGITUDE + 0.001, self.LATITUDE + 500 / geo.METERS_PER_DEGREE)
+        
+        ids = self.result_ids(views.superlachaise_poi_list, '/?bbox=' + bbox)
+        
+        self.assertEqual(sorted([self.superlachaise_pois[i].pk for i in [0, 2]]), sorted(ids))
+    
+    def test_cursor_can_not_be_combined_with_near(self):
+        with self.assertRaises(SuspiciousOperation):
+            self.get(views.superlachaise_poi_list, '/?near=%s,%s&cursor=' % (self.LATITUDE, self.LONGITUDE))
+    
+    def test_invalid_parameters_raise_suspicious_operation(self):
+        for path in ['/?near=48.8', '/?near=a,b', '/?near=100,2', '/?near=48.8,2.3&radius=0', '/?near=48.8,2.3&radius=100000', '/?bbox=1,2,3', '/?bbox=2.4,48.9,2.3,48.8']:
+            with self.assertRaises(SuspiciousOperation):
+                self.get(views.superlachaise_poi_list, path)
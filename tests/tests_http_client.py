@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_http_client.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json, requests, shutil, tempfile, threading, time
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from mock import patch
+
+from superlachaise_api import http_client
+
+def response(status_code=200, content={}, headers={}):
+    result = requests.Response()
+    result.status_code = status_code
+    result._content = json.dumps(content)
+    result.headers.update(headers)
+    return result
+
+@override_settings(MEDIAWIKI_USER_AGENT='superlachaise_api tests', HTTP_REQUESTS_PER_SECOND=0)
+class ClientTestCase(TestCase):
+    
+    URL = 'https://www.wikidata.org/w/api.php'
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = http_client.Client(directory=self.directory)
+        self.sleep_patch = patch.object(http_client.time, 'sleep')
+        self.sleep = self.sleep_patch.start()
+    
+    def tearDown(self):
+        self.sleep_patch.stop()
+        shutil.rmtree(self.directory)
+    
+    def delays(self):
+        return [call[0][0] for call in self.sleep.call_args_list]
+    
+    def test_server_errors_are_retried_with_exponential_backoff(self):
+        with patch.object(self.client.session, 'request', side_effect=[response(503), response(502), response(content={'result': 1})]):
+            self.assertEqual({'result': 1}, self.client.get(self.URL).json())
+        
+        self.assertEqual([1.0, 2.0], self.delays())
+        self.assertEqual(2, self.client.metrics.requests[0]['retries'])
+    
+    def test_maxlag_errors_are_retried_after_retry_after(self):
+        with patch.object(self.client.session, 'request', side_effect=[response(headers={'MediaWiki-API-Error': 'maxlag', 'Retry-After': '7'}), response(content={'result': 1})]) as request:
+            self.assertEqual({'result': 1}, self.client.mediawiki_result(self.URL, {'action': 'query'}))
+        
+        self.assertEqual([7.0], self.delays())
+        self.assertEqual({'action': 'query', 'format': 'json', 'maxlag': http_client.MAXLAG_SECONDS}, request.call_args[1]['params'])
+    
+    def test_connection_errors_are_retried(self):
+        with patch.object(self.client.session, 'request', side_effect=[requests.ConnectionError(), response(content={'result': 1})]):
+            self.assertEqual({'result': 1}, self.client.get(self.URL).json())
+        
+        self.assertEqual([1.0], self.delays())
+    
+    def test_retries_are_limited(self):
+        self.client.max_retries = 2
+        with patch.object(self.client.session, 'request', return_value=response(503)):
+            with self.assertRaises(requests.HTTPError):
+                self.client.get(self.URL)
+        
+        self.assertEqual([1.0, 2.0], self.delays())
+    
+    def test_client_errors_are_not_retried(self):
+        with patch.object(self.client.session, 'request', return_value=response(404)):
+            with self.assertRaises(requests.HTTPError):
+                self.client.get(self.URL)
+        
+        self.assertEqual([], self.delays())
+    
+    def test_requests_have_timeouts_and_accept_gzip(self):
+        with patch.object(self.client.session, 'request', return_value=response()) as request:
+            self.client.get(self.URL)
+            self.client.get('http://overpass-api.de/api/interpreter', data='query', timeout=http_client.OVERPASS_TIMEOUT)
+        
+        self.assertEqual([http_client.TIMEOUT, http_client.OVERPASS_TIMEOUT], [call[1]['timeout'] for call in request.call_args_list])
+        self.assertIn('gzip', self.client.session.headers['Accept-Encoding'])
+        self.assertEqual('superlachaise_api tests', self.client.session.headers['User-Agent'])
+    
+    def test_mediawiki_results_follow_continue_parameters(self):
+        with patch.object(self.client.session, 'request', side_effect=[response(content={'continue': {'continue': '||', 'rvcontinue': '2'}, 'page': 1}), response(content={'page': 2})]) as request:
+            self.assertEqual([1, 2], [json_result['page'] for json_result in self.client.mediawiki_results(self.URL, {'action': 'query'})])
+        
+        self.assertEqual({'action': 'query', 'continue': '', 'format': 'json', 'maxlag': http_client.MAXLAG_SECONDS}, request.call_args_list[0][1]['params'])
+        self.assertEqual({'action': 'query', 'continue': '||', 'rvcontinue': '2', 'format': 'json', 'maxlag': http_client.MAXLAG_SECONDS}, request.call_args_list[1][1]['params'])
+    
+    def test_mediawiki_requests_need_a_user_agent(self):
+        with override_settings(MEDIAWIKI_USER_AGENT=''):
+            with self.assertRaises(ImproperlyConfigured):
+                self.client.mediawiki_result(self.URL, {'action': 'query'})
+    
+    def test_metrics(self):
+        with patch.object(self.client.session, 'request', side_effect=[response(503, content={}), response(content={'result': 1}), response(content={'result': 22})]):
+            self.client.get(self.URL)
+            self.client.get(self.URL)
+        
+        summary = self.client.metrics.summary()['www.wikidata.org']
+        self.assertEqual(2, summary['requests'])
+        self.assertEqual(1, summary['retries'])
+        self.assertEqual(len('{"result": 1}') + len('{"result": 22}'), summary['bytes'])
+        self.assertTrue(summary['latency'] >= summary['max_latency'])
+        self.assertTrue(self.client.metrics.summary_lines()[0].startswith('www.wikidata.org: 2 requests, 1 retries'))
+
+class HostLimiterTestCase(TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_concurrent_requests_are_limited_by_host(self):
+        host_limiter = http_client.HostLimiter(2, None, self.directory)
+        lock = threading.Lock()
+        requests = {'en': [0, 0], 'fr': [0, 0]}
+        def request(host):
+            with host_limiter.limit(host):
+                with lock:
+                    requests[host][0] += 1
+                    requests[host][1] = max(requests[host][1], requests[host][0])
+                time.sleep(0.02)
+                with lock:
+                    requests[host][0] -= 1
+        
+        threads = [threading.Thread(target=request, args=(host,)) for host in ['en', 'fr'] * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual({'en': [0, 2], 'fr': [0, 2]}, requests)
+    
+    def test_requests_are_spaced_by_host_across_processes(self):
+        # Limiters sharing a directory stand for processes
+        host_limiters = [http_client.HostLimiter(10, 50, self.directory) for i in range(2)]
+        start = time.time()
+        for i in range(5):
+            with host_limiters[i % 2].limit('en'):
+                pass
+        with host_limiters[0].limit('fr'):
+            pass
+        
+        # 4 intervals of 20 ms between the requests to the first host, none for the first request to the other one
+        self.assertTrue(0.08 <= time.time() - start < 0.2)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_map_tiles.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+from decimal import Decimal
+from django.http import Http404
+from django.test import override_settings
+
+from superlachaise_api import map_tiles, views
+from superlachaise_api.models import *
+from superlachaise_api.tests.tests_views import ViewsTestCase
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class MapTilesTestCase(ViewsTestCase):
+    
+    LOCATIONS = [
+        (Decimal('48.8614000'), Decimal('2.3933000')),
+        (Decimal('48.8615000'), Decimal('2.3934000')),
+        (Decimal('48.8600000'), Decimal('2.3940000')),
+    ]
+    
+    def setUp(self):
+        super(MapTilesTestCase, self).setUp()
+        self.superlachaise_pois = self.create_superlachaise_pois(4)
+        for superlachaise_poi, (latitude, longitude) in zip(self.superlachaise_pois, self.LOCATIONS):
+            OpenStreetMapElement.objects.filter(pk=superlachaise_poi.openstreetmap_element_id).update(latitude=latitude, longitude=longitude)
+        # A POI without OpenStreetMap element is not on the map
+        self.superlachaise_pois[3].openstreetmap_element.delete()
+        WikimediaCommonsFile.objects.filter(pk=self.superlachaise_pois[0].main_image_id).update(url_512px='https://upload.wikimedia.org/file_0.jpg')
+        map_tiles.build()
+    
+    def tile_features(self, zoom):
+        features = []
+        for map_tile in MapTile.objects.filter(zoom=zoom):
+            features.extend(json.loads(map_tile.content)['features'])
+        return features
+    
+    def tile_path(self, zoom, location):
+        (x, y) = map_tiles.pixel_coordinates(location[0], location[1], zoom)
+        return (zoom, x // map_tiles.TILE_SIZE, y // map_tiles.TILE_SIZE)
+    
+    def test_every_zoom_level_contains_every_poi(self):
+        for zoom in range(map_tiles.MIN_ZOOM, map_tiles.MAX_ZOOM + 1):
+            features = self.tile_features(zoom)
+            self.assertEqual(3, sum(feature['properties'].get('count', 1) for feature in features), zoom)
+        self.assertEqual(0, MapTile.objects.exclude(zoom__range=(map_tiles.MIN_ZOOM, map_tiles.MAX_ZOOM)).count())
+    
+    def test_close_pois_are_clustered_at_low_zoom_levels(self):
+        self.assertEqual(sorted(superlachaise_poi.pk for superlachaise_poi in self.superlachaise_pois[:3]), sorted(feature['properties']['id'] for feature in self.tile_features(map_tiles.MAX_ZOOM)))
+        
+        (cluster,) = [feature for feature in self.tile_features(map_tiles.MIN_ZOOM) if feature['properties'].get('cluster')]
+        self.assertEqual(3, cluster['properties']['count'])
+        self.assertEqual([2.3933, 48.86, 2.394, 48.8615], cluster['bbox'])
+        self.assertAlmostEqual(48.8609667, cluster['geometry']['coordinates'][1])
+    
+    def test_pixel_coordinates(self):
+        self.assertEqual((0, 0), map_tiles.pixel_coordinates(85.0511287798, -180, 0))
+        self.assertEqual((128, 128), map_tiles.pixel_coordinates(0, 0, 0))
+        self.assertEqual((33203, 22544), tuple(coordinate // map_tiles.TILE_SIZE for coordinate in map_tiles.pixel_coordinates(48.8614, 2.3933, 16)))
+    
+    def test_map_tile(self):
+        (zoom, x, y) = self.tile_path(map_tiles.MAX_ZOOM, self.LOCATIONS[0])
+        response = self.get(views.map_tile, zoom=str(zoom), x=str(x), y=str(y))
+        
+        self.assertEqual('application/geo+json; charset=utf-8', response['Content-Type'])
+        result = json.loads(response.content)
+        self.assertEqual('FeatureCollection', result['type'])
+        self.assertIn(self.superlachaise_pois[0].pk, [feature['properties']['id'] for feature in result['features']])
+    
+    def test_empty_map_tile(self):
+        result = self.json_response(views.map_tile, zoom='15', x='0', y='0')
+        
+        self.assertEqual({'type': 'FeatureCollection', 'features': []}, result)
+    
+    def test_map_tile_outside_zoom_levels(self):
+        with self.assertRaises(Http404):
+            self.get(views.map_tile, zoom='11', x='0', y='0')
+    
+    def test_map_tile_query_budget(self):
+        with self.assertNumQueries(1):
+            self.get(views.map_tile, zoom='12', x='0', y='0')
+    
+    def test_synchronization_end_builds_map_tiles(self):
+        MapTile.objects.all().delete()
+        
+        Synchronization.objects.create(name='openstreetmap')
+        
+        self.assertEqual(3, sum(feature['properties'].get('count', 1) for feature in self.tile_features(map_tiles.MAX_ZOOM)))
+    
+    def test_map_tile_builds_map_tiles_never_built(self):
+        MapTile.objects.all().delete()
+        map_tiles.tiles_built = False
+        (zoom, x, y) = self.tile_path(map_tiles.MAX_ZOOM, self.LOCATIONS[0])
+        
+        result = self.json_response(views.map_tile, zoom=str(zoom), x=str(x), y=str(y))
+        
+        self.assertIn(self.superlachaise_pois[0].pk, [feature['properties']['id'] for feature in result['features']])
+    
+    def test_map_tiles_are_rebuilt_only_if_pois_may_have_moved(self):
+        map_tiles.pop_changes()
+        map_tile_ids = list(MapTile.objects.values_list('pk', flat=True))
+        
+        self.superlachaise_pois[0].main_image.save()
+        Synchronization.objects.create(name='wikimedia_commons_files')
+        self.assertEqual(map_tile_ids, list(MapTile.objects.values_list('pk', flat=True)))
+        
+        openstreetmap_element = self.superlachaise_pois[2].openstreetmap_element
+        openstreetmap_element.latitude = Decimal('48.8614000')
+        openstreetmap_element.longitude = Decimal('2.3933000')
+        openstreetmap_element.save()
+        Synchronization.objects.create(name='openstreetmap')
+        self.assertNotEqual(map_tile_ids, list(MapTile.objects.values_list('pk', flat=True)))
+        self.assertEqual(2, len(self.tile_features(map_tiles.MAX_ZOOM)))
+    
+    def test_superlachaise_poi_geojson(self):
+        response = self.get(views.superlachaise_poi_geojson, '/?language=fr')
+        
+        self.assertEqual('application/geo+json; charset=utf-8', response['Content-Type'])
+        result = json.loads(response.content)
+        self.assertEqual('FeatureCollection', result['type'])
+        self.assertEqual([superlachaise_poi.pk for superlachaise_poi in self.superlachaise_pois[:3]], [feature['properties']['id'] for feature in result['features']])
+        self.assertEqual({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [2.3933, 48.8614]},
+            'properties': {
+                'id': self.superlachaise_pois[0].pk,
+                'localizations': [{'language_code': 'fr', 'name': 'name 0'}],
+                'superlachaise_categories': [{'code': 'category_0'}],
+                'main_image_url': 'https://upload.wikimedia.org/file_0.jpg',
+            },
+        }, result['features'][0])
+    
+    def test_superlachaise_poi_geojson_query_budget(self):
+        with self.assertNumQueries(3):
+            self.get(views.superlachaise_poi_geojson)
+        
+        self.create_superlachaise_pois(10)
+        with self.assertNumQueries(3):
+            self.assertEqual(13, len(json.loads(self.get(views.superlachaise_poi_geojson).content)['features']))
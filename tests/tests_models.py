@@ -422,3 +422,33 @@ class WikidataOccupationTestCase(TestCase):
         wikidata_occupation = WikidataOccupation(wikidata_id=wikidata_id)
         
         self.assertEqual(WikidataEntry.URL_FORMAT.format(id=wikidata_id, language_code=language_code), wikidata_occupation.wikidata_url(language_code))
+    
+    def test_save_updates_superlachaise_categories_modified_if_superlachaise_category_changed(self):
+        superlachaise_category_1 = SuperLachaiseCategory.objects.create(code="code_1")
+        superlachaise_category_2 = SuperLachaiseCategory.objects.create(code="code_2")
+        wikidata_occupation = WikidataOccupation.objects.create(wikidata_id="Q123", superlachaise_category=superlachaise_category_1)
+        now = timezone.now()
+        
+        wikidata_occupation.superlachaise_category = superlachaise_category_2
+        wikidata_occupation.save()
+        
+        self.assertTrue(SuperLachaiseCategory.objects.get(pk=superlachaise_category_1.pk).modified > now)
+        self.assertTrue(SuperLachaiseCategory.objects.get(pk=superlachaise_category_2.pk).modified > now)
+    
+    def test_save_does_not_update_superlachaise_category_modified_if_superlachaise_category_did_not_change(self):
+        superlachaise_category = SuperLachaiseCategory.objects.create(code="code")
+        wikidata_occupation = WikidataOccupation.objects.create(wikidata_id="Q123", superlachaise_category=superlachaise_category)
+        now = timezone.now()
+        
+        WikidataOccupation.objects.get(pk=wikidata_occupation.pk).save()
+        
+        self.assertTrue(SuperLachaiseCategory.objects.get(pk=superlachaise_category.pk).modified < now)
+    
+    def test_delete_updates_superlachaise_category_modified(self):
+        superlachaise_category = SuperLachaiseCategory.objects.create(code="code")
+        wikidata_occupation = WikidataOccupation.objects.create(wikidata_id="Q123", superlachaise_category=superlachaise_category)
+        now = timezone.now()
+        
+        wikidata_occupation.delete()
+        
+        self.assertTrue(SuperLachaiseCategory.objects.get(pk=superlachaise_category.pk).modified > now)
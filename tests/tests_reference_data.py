@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_reference_data.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.test import TestCase, override_settings
+
+from superlachaise_api import cache, reference_data
+from superlachaise_api.models import *
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reference_data'},
+}
+
+class ReferenceDataTestCase(TestCase):
+    
+    def setUp(self):
+        for code in ['fr', 'en']:
+            Language.objects.create(code=code, enumeration_separator=', ', last_enumeration_separator=' & ', artist_prefix='')
+        Setting.objects.create(key=u'openstreetmap:synced_tags', value=u'["historic=tomb"]')
+    
+    def test_reference_data_is_loaded_once(self):
+        reference_data.languages()
+        reference_data.json_setting(u'openstreetmap:synced_tags')
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(['en', 'fr'], [language.code for language in reference_data.languages()])
+            self.assertEqual('fr', reference_data.language('fr').code)
+            self.assertIsNone(reference_data.language('de'))
+            self.assertEqual(['historic=tomb'], reference_data.json_setting(u'openstreetmap:synced_tags'))
+    
+    def test_saved_and_deleted_objects_reload_reference_data(self):
+        self.assertEqual(u'["historic=tomb"]', reference_data.setting(u'openstreetmap:synced_tags'))
+        
+        Setting.objects.filter(key=u'openstreetmap:synced_tags').update(value=u'[]')
+        Language.objects.create(code='de', enumeration_separator=', ', last_enumeration_separator=' & ', artist_prefix='')
+        self.assertEqual(['de', 'en', 'fr'], [language.code for language in reference_data.languages()])
+        self.assertEqual([], reference_data.json_setting(u'openstreetmap:synced_tags'))
+        
+        Language.objects.get(code='fr').delete()
+        self.assertEqual(['de', 'en'], [language.code for language in reference_data.languages()])
+    
+    def test_superlachaise_categories_include_wikidata_occupations(self):
+        superlachaise_category = SuperLachaiseCategory.objects.create(code='writer', type=SuperLachaiseCategory.OCCUPATION)
+        WikidataOccupation.objects.create(wikidata_id='Q36180', superlachaise_category=superlachaise_category)
+        reference_data.superlachaise_categories()
+        
+        with self.assertNumQueries(0):
+            self.assertEqual([(u'writer', [u'Q36180'])], [(category.code, [occupation.wikidata_id for occupation in category.wikidata_occupations.all()]) for category in reference_data.superlachaise_categories()])
+    
+    def test_missing_setting_raises_does_not_exist(self):
+        with self.assertRaises(Setting.DoesNotExist):
+            reference_data.setting(u'unknown')
+    
+    @override_settings(CACHES=CACHES, RESPONSE_CACHE='responses')
+    def test_dataset_version_change_reloads_reference_data(self):
+        reference_data.languages()
+        # An edit in another process does not send signals to this one
+        Language.objects.filter(code='fr').update(code='it')
+        self.assertEqual(['en', 'fr'], [language.code for language in reference_data.languages()])
+        
+        cache.bump_dataset_version()
+        
+        self.assertEqual(['en', 'it'], [language.code for language in reference_data.languages()])
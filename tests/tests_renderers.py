@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_renderers.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+from unittest import skipIf
+from django.core.exceptions import SuspiciousOperation
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+
+from superlachaise_api import renderers, views
+from superlachaise_api.tests.tests_views import ViewsTestCase
+
+class RenderersTestCase(TestCase):
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+    
+    def test_compact_dumps_has_no_whitespace_between_tokens(self):
+        obj = {'a': u'b \" c: d\\', 'e': [1, {'f': None}], 'g': u'h\ni'}
+        
+        self.assertEqual(u'{"a":"b \\" c: d\\\\","e":[1,{"f":null}],"g":"h\\ni"}', renderers.dumps(obj, pretty=False))
+        self.assertEqual(json.loads(renderers.dumps(obj)), json.loads(renderers.dumps(obj, pretty=False)))
+    
+    def test_negotiate_format_returns_format_parameter(self):
+        self.assertEqual(renderers.JSON, renderers.negotiate_format(self.factory.get('/?format=json', HTTP_ACCEPT='text/html')))
+        self.assertEqual(renderers.PRETTY_JSON, renderers.negotiate_format(self.factory.get('/?format=pretty')))
+    
+    def test_negotiate_format_raises_suspicious_operation_if_format_is_unknown(self):
+        with self.assertRaises(SuspiciousOperation):
+            renderers.negotiate_format(self.factory.get('/?format=xml'))
+    
+    def test_negotiate_format_returns_pretty_json_for_browsers(self):
+        self.assertEqual(renderers.PRETTY_JSON, renderers.negotiate_format(self.factory.get('/', HTTP_ACCEPT='text/html,application/xhtml+xml,*/*;q=0.8')))
+    
+    def test_negotiate_format_returns_compact_json_by_default(self):
+        self.assertEqual(renderers.JSON, renderers.negotiate_format(self.factory.get('/')))
+        self.assertEqual(renderers.JSON, renderers.negotiate_format(self.factory.get('/', HTTP_ACCEPT='application/json')))
+    
+    @skipIf(renderers.msgpack is None, 'msgpack is not installed')
+    def test_negotiate_format_returns_msgpack_if_accepted(self):
+        self.assertEqual(renderers.MSGPACK, renderers.negotiate_format(self.factory.get('/', HTTP_ACCEPT='application/x-msgpack')))
+    
+    @skipIf(renderers.msgpack is None, 'msgpack is not installed')
+    def test_render_msgpack_returns_packed_content(self):
+        response = renderers.render(self.factory.get('/?format=msgpack'), renderers.encode(renderers.MSGPACK, {'a': [1, 'é'.decode('utf-8')], 'b': 'c'}))
+        
+        self.assertEqual('application/x-msgpack', response['Content-Type'])
+        self.assertEqual({u'a': [1, u'é'], u'b': u'c'}, renderers.msgpack.unpackb(response.content, encoding='utf-8'))
+    
+    @override_settings(JSON_BACKEND='json')
+    def test_json_backend_returns_module_of_setting(self):
+        self.assertIs(json, renderers.json_backend())
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class RenderedViewsTestCase(ViewsTestCase):
+    
+    def test_compact_and_pretty_responses_have_the_same_content(self):
+        superlachaise_poi = self.create_superlachaise_pois(2)[0]
+        
+        for view, kwargs in [(views.superlachaise_poi_list, {}), (views.superlachaise_poi, {'id': superlachaise_poi.pk})]:
+            compact_response = self.get(view, '/?format=json', **kwargs)
+            pretty_response = self.get(view, '/?format=pretty', **kwargs)
+            
+            self.assertEqual(json.loads(pretty_response.content), json.loads(compact_response.content))
+            self.assertTrue(len(compact_response.content) < len(pretty_response.content))
+            self.assertNotIn('\n', compact_response.content)
+            self.assertEqual('Accept', compact_response['Vary'])
+    
+    @skipIf(renderers.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_and_json_responses_have_the_same_content(self):
+        superlachaise_poi = self.create_superlachaise_pois(2)[0]
+        
+        for built_fragments in [False, True]:
+            if built_fragments:
+                call_command('build_fragments', stdout=None)
+            for view, path, kwargs in [(views.superlachaise_poi_list, '/', {}), (views.superlachaise_poi, '/', {'id': superlachaise_poi.pk}), (views.superlachaise_poi_list, '/?fields=id,localizations.name', {}), (views.superlachaise_poi_facets, '/', {})]:
+                json_response = self.get(view, path, **kwargs)
+                msgpack_response = self.get(view, path + ('&' if '?' in path else '?') + 'format=msgpack', **kwargs)
+                
+                self.assertEqual(json.loads(json_response.content), renderers.msgpack.unpackb(msgpack_response.content, encoding='utf-8'))
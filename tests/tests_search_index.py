@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_search_index.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.contrib import admin
+from django.contrib.admin.models import LogEntry, ADDITION
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from superlachaise_api import search_index, views
+from superlachaise_api.admin import SuperLachaisePOIAdmin
+from superlachaise_api.models import *
+from superlachaise_api.tests.tests_views import ViewsTestCase
+
+class SearchIndexFunctionsTestCase(TestCase):
+    
+    def test_fold_removes_case_and_accents(self):
+        self.assertEqual(u'frederic chopin', search_index.fold(u'Frédéric CHOPÍN'))
+    
+    def test_fold_replaces_ligatures(self):
+        self.assertEqual(u'oeuvre', search_index.fold(u'Œuvre'))
+    
+    def test_tokens_splits_words_on_punctuation_and_underscores(self):
+        self.assertEqual([u'jean', u'paul', u'sartre', u'1905'], search_index.tokens(u'Jean-Paul_Sartre (1905)'))
+    
+    def test_tokens_returns_empty_list_if_text_is_empty(self):
+        self.assertEqual([], search_index.tokens(None))
+        self.assertEqual([], search_index.tokens(u''))
+    
+    def test_edit_distance_counts_edits_and_transpositions(self):
+        self.assertEqual(0, search_index.edit_distance(u'chopin', u'chopin'))
+        self.assertEqual(1, search_index.edit_distance(u'chopin', u'chopn'))
+        self.assertEqual(1, search_index.edit_distance(u'chopin', u'cohpin'))
+        self.assertEqual(2, search_index.edit_distance(u'chopin', u'hcopni'))
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class SearchIndexTestCase(ViewsTestCase):
+    
+    def setUp(self):
+        super(SearchIndexTestCase, self).setUp()
+        self.superlachaise_pois = self.create_superlachaise_pois(2)
+        SuperLachaiseLocalizedPOI.objects.filter(superlachaise_poi=self.superlachaise_pois[0], language__code='fr').update(name=u'Frédéric Chopín')
+        WikidataLocalizedEntry.objects.filter(wikidata_entry__in=self.superlachaise_pois[1].wikidata_entries.all(), language__code='en').update(description=u'Irish playwright')
+        search_index.build_all()
+    
+    def search_ids(self, view, search):
+        return [result['id'] for result in self.json_response(view, '/?' + search)['result']]
+    
+    def test_search_matches_accent_and_case_variants(self):
+        for search in ['search=chopin', 'search=FREDERIC', 'search=Chop%C3%ADn']:
+            self.assertEqual([self.superlachaise_pois[0].pk], self.search_ids(views.superlachaise_poi_list, search))
+    
+    def test_search_matches_word_prefixes(self):
+        self.assertEqual([self.superlachaise_pois[0].pk], self.search_ids(views.superlachaise_poi_list, 'search=chop'))
+    
+    def test_search_requires_all_words(self):
+        self.assertEqual([self.superlachaise_pois[0].pk], self.search_ids(views.superlachaise_poi_list, 'search=frederic+chopin'))
+        self.assertEqual([], self.search_ids(views.superlachaise_poi_list, 'search=frederic+playwright'))
+    
+    def test_search_matches_wikidata_entries_of_superlachaise_pois(self):
+        self.assertEqual([self.superlachaise_pois[1].pk], self.search_ids(views.superlachaise_poi_list, 'search=playwright'))
+    
+    def test_fuzzy_search_matches_typos(self):
+        self.assertEqual([], self.search_ids(views.superlachaise_poi_list, 'search=chopni'))
+        self.assertEqual([self.superlachaise_pois[0].pk], self.search_ids(views.superlachaise_poi_list, 'search=chopni&fuzzy=1'))
+    
+    def test_search_of_other_list_views(self):
+        self.assertEqual(2, len(self.json_response(views.wikidata_entry_list, '/?search=playwright')['result']))
+        self.assertEqual(1, len(self.json_response(views.openstreetmap_element_list, '/?search=name+1')['result']))
+        self.assertEqual(1, len(self.json_response(views.wikimedia_commons_file_list, '/?search=file+1.jpg')['result']))
+        self.assertEqual(1, len(self.json_response(views.superlachaise_category_list, '/?search=category_1')['result']))
+    
+    def test_build_replaces_entries_of_modified_objects(self):
+        SuperLachaiseLocalizedPOI.objects.filter(superlachaise_poi=self.superlachaise_pois[0]).update(name=u'George Sand')
+        
+        search_index.build_all()
+        
+        self.assertEqual([], self.search_ids(views.superlachaise_poi_list, 'search=chopin'))
+        self.assertEqual([self.superlachaise_pois[0].pk], self.search_ids(views.superlachaise_poi_list, 'search=sand'))
+    
+    def test_admin_search_uses_search_index_and_local_search_fields(self):
+        model_admin = SuperLachaisePOIAdmin(SuperLachaisePOI, admin.site)
+        
+        (queryset, use_distinct) = model_admin.get_search_results(None, SuperLachaisePOI.objects.all(), u'chopin')
+        self.assertEqual([self.superlachaise_pois[0]], list(queryset))
+        self.assertFalse(use_distinct)
+        
+        # A reference which is not contained in the ids of joined search fields
+        SuperLachaisePOI.objects.filter(pk=self.superlachaise_pois[1].pk).update(burial_plot_reference=u'B')
+        (queryset, use_distinct) = model_admin.get_search_results(None, SuperLachaisePOI.objects.all(), u'B')
+        self.assertEqual([self.superlachaise_pois[1]], list(queryset))
+    
+    def test_admin_search_matches_joined_search_fields_without_duplicates(self):
+        model_admin = SuperLachaisePOIAdmin(SuperLachaisePOI, admin.site)
+        superlachaise_poi = self.superlachaise_pois[1]
+        
+        for value in [superlachaise_poi.wikidata_entries.all()[0].pk, superlachaise_poi.wikimedia_commons_category.pk, superlachaise_poi.main_image.pk]:
+            (queryset, use_distinct) = model_admin.get_search_results(None, SuperLachaisePOI.objects.all(), unicode(value))
+            pks = list(queryset.values_list('pk', flat=True))
+            self.assertIn(superlachaise_poi.pk, pks)
+            self.assertEqual(len(set(pks)), len(pks))
+    
+    def test_synchronization_end_and_admin_edit_update_search_index(self):
+        user = User.objects.create(username="username")
+        for (name, save) in [(u'George Sand', lambda: Synchronization.objects.create(name='wikidata')), (u'Honoré de Balzac', lambda: LogEntry.objects.log_action(user.pk, None, None, u"object", ADDITION))]:
+            superlachaise_poi = self.create_superlachaise_pois(1)[0]
+            SuperLachaiseLocalizedPOI.objects.filter(superlachaise_poi=superlachaise_poi).update(name=name)
+            self.assertEqual([], self.search_ids(views.superlachaise_poi_list, 'search=' + name.split()[-1]))
+            
+            save()
+            
+            self.assertEqual([superlachaise_poi.pk], self.search_ids(views.superlachaise_poi_list, 'search=' + name.split()[-1]))
+    
+    def test_update_replaces_entries_of_changed_objects_only(self):
+        search_index.pop_changes()
+        unchanged_entry_ids = set(SearchIndexEntry.objects.exclude(object_type='superlachaisepoi').values_list('pk', flat=True))
+        wikidata_localized_entry = WikidataLocalizedEntry.objects.filter(wikidata_entry__in=self.superlachaise_pois[0].wikidata_entries.all(), language__code='en')[0]
+        wikidata_localized_entry.description = u'Polish composer'
+        wikidata_localized_entry.save()
+        
+        Synchronization.objects.create(name='wikidata')
+        
+        self.assertEqual([self.superlachaise_pois[0].pk], self.search_ids(views.superlachaise_poi_list, 'search=composer'))
+        self.assertEqual(1, len(self.json_response(views.wikidata_entry_list, '/?search=composer')['result']))
+        remaining_entry_ids = set(SearchIndexEntry.objects.exclude(object_type__in=['superlachaisepoi', 'wikidataentry']).values_list('pk', flat=True))
+        self.assertTrue(remaining_entry_ids and remaining_entry_ids <= unchanged_entry_ids)
+    
+    def test_update_removes_entries_of_deleted_objects(self):
+        superlachaise_poi_id = self.superlachaise_pois[0].pk
+        self.superlachaise_pois[0].delete()
+        
+        Synchronization.objects.create(name='superlachaise_pois')
+        
+        self.assertFalse(SearchIndexEntry.objects.filter(object_type='superlachaisepoi', object_id=superlachaise_poi_id).exists())
+    
+    def test_search_builds_empty_search_index(self):
+        SearchIndexEntry.objects.all().delete()
+        
+        self.assertEqual([self.superlachaise_pois[0].pk], self.search_ids(views.superlachaise_poi_list, 'search=chopin'))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_sync_wikipedia.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import threading, time
+from StringIO import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from mock import patch
+
+from superlachaise_api.management.commands import sync_wikipedia
+from superlachaise_api.models import *
+
+class SyncWikipediaTestCase(TestCase):
+    
+    def setUp(self):
+        Synchronization.objects.create(name='wikipedia')
+        self.wikidata_localized_entries = []
+        for code in ['en', 'fr']:
+            language = Language.objects.create(code=code, enumeration_separator=', ', last_enumeration_separator=' & ', artist_prefix='')
+            for index in range(6):
+                wikidata_entry, created = WikidataEntry.objects.get_or_create(wikidata_id='Q%d' % index)
+                self.wikidata_localized_entries.append(WikidataLocalizedEntry.objects.create(wikidata_entry=wikidata_entry, language=language, wikipedia=u'page %d' % index))
+    
+    def test_intros_are_saved_in_the_order_of_the_entries(self):
+        lock = threading.Lock()
+        requests = {'current': 0, 'max': 0}
+        def request_wikipedia_pre_section(command, language_code, title):
+            with lock:
+                requests['current'] += 1
+                requests['max'] = max(requests['max'], requests['current'])
+            # The first pages are the slowest
+            time.sleep(0.01 * (6 - int(title.split()[-1])))
+            with lock:
+                requests['current'] -= 1
+            return u'<p>Intro of <b>%s</b> (%s)</p>' % (title, language_code)
+        
+        with patch.object(sync_wikipedia.Command, 'request_wikipedia_pages', return_value={}):
+            with patch.object(sync_wikipedia.Command, 'request_wikipedia_pre_section', request_wikipedia_pre_section):
+                with patch('sys.stdout', new_callable=StringIO):
+                    call_command('sync_wikipedia', concurrency=3)
+        
+        wikipedia_pages = list(WikipediaPage.objects.order_by('pk').select_related('wikidata_localized_entry__language'))
+        self.assertEqual(self.wikidata_localized_entries, [wikipedia_page.wikidata_localized_entry for wikipedia_page in wikipedia_pages])
+        self.assertEqual(u'<p>Intro of <b>page 2</b> (fr)</p>', wikipedia_pages[8].intro)
+        self.assertEqual(3, requests['max'])
+        self.assertEqual(12, Synchronization.objects.get(name='wikipedia').created_objects)
@@ -0,0 +1,615 @@
+# -*- coding: utf-8 -*-
+
+"""
+tests_views.py
+superlachaise_api
+
+Created by Maxime Le Moine on 17/10/2016.
+Copyright (c) 2016 Maxime Le Moine.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    
+    http:www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import datetime, json
+from StringIO import StringIO
+from django.core.exceptions import SuspiciousOperation
+from django.core.management import call_command
+from django.db import connection
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from mock import patch
+
+from superlachaise_api.fragments import FragmentStore
+from superlachaise_api.models import *
+from superlachaise_api import counters, reference_data, views
+
+class ViewsTestMixin(object):
+    """ Languages and POIs shared by view tests, whether they run in a transaction or not """
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.languages = []
+        for code in ['en', 'fr']:
+            language = Language(code=code, enumeration_separator=', ', last_enumeration_separator=' & ', artist_prefix='')
+            language.save()
+            self.languages.append(language)
+    
+    def create_superlachaise_poi(self, index):
+        openstreetmap_element = OpenStreetMapElement.objects.create(openstreetmap_id=str(1000 + index), type=OpenStreetMapElement.NODE, name="name %d" % index, sorting_name="name %d" % index, latitude=0, longitude=0, wikidata="Q%d" % index)
+        wikimedia_commons_category = WikimediaCommonsCategory.objects.create(wikimedia_commons_id="Category:category %d" % index, main_image="File:file %d.jpg" % index, category_members="File:file %d.jpg" % index)
+        wikimedia_commons_file = WikimediaCommonsFile.objects.create(wikimedia_commons_id="File:file %d.jpg" % index)
+        superlachaise_poi = SuperLachaisePOI.objects.create(openstreetmap_element=openstreetmap_element, wikimedia_commons_category=wikimedia_commons_category, main_image=wikimedia_commons_file, burial_plot_reference=str(index))
+        
+        superlachaise_category = SuperLachaiseCategory.objects.create(code="category_%d" % index, type=SuperLachaiseCategory.OCCUPATION)
+        SuperLachaiseCategoryRelation.objects.create(superlachaise_poi=superlachaise_poi, superlachaise_category=superlachaise_category)
+        WikidataOccupation.objects.create(wikidata_id="Q%d" % (5000 + index), superlachaise_category=superlachaise_category)
+        
+        for relation_type in [SuperLachaiseWikidataRelation.PERSONS, SuperLachaiseWikidataRelation.ARTISTS]:
+            wikidata_entry = WikidataEntry.objects.create(wikidata_id="Q%d%s" % (index, relation_type), instance_of="Q5", date_of_birth=datetime.date(1800, 1, 1), burial_plot_reference=str(index))
+            SuperLachaiseWikidataRelation.objects.create(superlachaise_poi=superlachaise_poi, wikidata_entry=wikidata_entry, relation_type=relation_type)
+            for language in self.languages:
+                wikidata_localized_entry = WikidataLocalizedEntry.objects.create(wikidata_entry=wikidata_entry, language=language, name="name %d" % index, wikipedia="name %d" % index)
+                WikipediaPage.objects.create(wikidata_localized_entry=wikidata_localized_entry, title="name %d" % index, default_sort="name, %d" % index)
+        
+        for language in self.languages:
+            SuperLachaiseLocalizedPOI.objects.create(superlachaise_poi=superlachaise_poi, language=language, name="name %d" % index, sorting_name="name %d" % index)
+            SuperLachaiseLocalizedCategory.objects.create(superlachaise_category=superlachaise_category, language=language, name="category %d" % index)
+        
+        return superlachaise_poi
+    
+    def create_superlachaise_pois(self, count):
+        result = [self.create_superlachaise_poi(index) for index in range(SuperLachaisePOI.objects.count(), SuperLachaisePOI.objects.count() + count)]
+        
+        # Reference data is loaded once per process, not by each request
+        reference_data.languages()
+        
+        return result
+    
+    def get(self, view, path='/', **kwargs):
+        return view(self.factory.get(path), **kwargs)
+    
+    def json_response(self, view, path='/', **kwargs):
+        response = self.get(view, path, **kwargs)
+        self.assertEqual(200, response.status_code)
+        return json.loads(response.content)
+
+class ViewsTestCase(ViewsTestMixin, TestCase):
+    pass
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class QueryBudgetTestCase(ViewsTestCase):
+    """ The number of queries of a view must not depend on the number of objects or languages, even when no JSON fragment is built """
+    
+    def assertListQueryBudget(self, view, budget, **kwargs):
+        self.create_superlachaise_pois(1)
+        with self.assertNumQueries(budget):
+            self.get(view, **kwargs)
+        
+        self.create_superlachaise_pois(24)
+        with self.assertNumQueries(budget):
+            result = self.json_response(view, **kwargs)
+        self.assertTrue(len(result['result']) > 1)
+    
+    def test_openstreetmap_element_list_query_budget(self):
+        self.assertListQueryBudget(views.openstreetmap_element_list, 4)
+    
+    def test_wikidata_entry_list_query_budget(self):
+        self.assertListQueryBudget(views.wikidata_entry_list, 5)
+    
+    def test_wikimedia_commons_category_list_query_budget(self):
+        self.assertListQueryBudget(views.wikimedia_commons_category_list, 4)
+    
+    def test_wikimedia_commons_file_list_query_budget(self):
+        self.assertListQueryBudget(views.wikimedia_commons_file_list, 4)
+    
+    def test_superlachaise_category_list_query_budget(self):
+        self.assertListQueryBudget(views.superlachaise_category_list, 7)
+    
+    def test_superlachaise_poi_list_query_budget(self):
+        self.assertListQueryBudget(views.superlachaise_poi_list, 7)
+    
+    def test_superlachaise_poi_list_query_budget_does_not_depend_on_restrict_fields(self):
+        self.create_superlachaise_pois(5)
+        
+        with self.assertNumQueries(7):
+            self.get(views.superlachaise_poi_list, '/?restrict_fields=1')
+    
+    def test_objects_query_budget(self):
+        counters.update()
+        self.assertListQueryBudget(views.objects, 1)
+    
+    def test_openstreetmap_element_query_budget(self):
+        superlachaise_poi = self.create_superlachaise_pois(3)[0]
+        
+        with self.assertNumQueries(3):
+            self.get(views.openstreetmap_element, type=superlachaise_poi.openstreetmap_element.type, id=superlachaise_poi.openstreetmap_element.openstreetmap_id)
+        with self.assertNumQueries(3):
+            self.get(views.openstreetmap_element, superlachaisepoi_id=superlachaise_poi.pk)
+    
+    def test_wikidata_entry_query_budget(self):
+        wikidata_entry = self.create_superlachaise_pois(3)[0].wikidata_entries.first()
+        
+        with self.assertNumQueries(4):
+            self.get(views.wikidata_entry, id=wikidata_entry.wikidata_id)
+    
+    def test_wikimedia_commons_category_query_budget(self):
+        superlachaise_poi = self.create_superlachaise_pois(3)[0]
+        
+        with self.assertNumQueries(3):
+            self.get(views.wikimedia_commons_category, id=superlachaise_poi.wikimedia_commons_category.wikimedia_commons_id)
+        with self.assertNumQueries(3):
+            self.get(views.wikimedia_commons_category, superlachaisepoi_id=superlachaise_poi.pk)
+    
+    def test_wikimedia_commons_file_query_budget(self):
+        superlachaise_poi = self.create_superlachaise_pois(3)[0]
+        
+        with self.assertNumQueries(3):
+            self.get(views.wikimedia_commons_file, id=superlachaise_poi.main_image.wikimedia_commons_id)
+    
+    def test_superlachaise_category_query_budget(self):
+        superlachaise_category = self.create_superlachaise_pois(3)[0].superlachaise_categories.first()
+        
+        with self.assertNumQueries(6):
+            self.get(views.superlachaise_category, id=superlachaise_category.code)
+    
+    def test_superlachaise_poi_query_budget(self):
+        superlachaise_poi = self.create_superlachaise_pois(3)[0]
+        
+        with self.assertNumQueries(6):
+            self.get(views.superlachaise_poi, id=superlachaise_poi.pk)
+    
+    def test_benchmark_queries_prints_endpoints_and_rolls_back_dataset(self):
+        self.create_superlachaise_pois(1)
+        
+        with patch('sys.stdout', new_callable=StringIO) as stdout:
+            call_command('benchmark_queries', count=3, repeat=1)
+        
+        self.assertIn('/superlachaise_pois/?category=benchmark_0+benchmark_1&category=benchmark_2', stdout.getvalue())
+        self.assertNotIn('Status: 500', stdout.getvalue())
+        self.assertEqual(1, SuperLachaisePOI.objects.count())
+        self.assertEqual(0, SuperLachaiseCategory.objects.filter(code__startswith='benchmark').count())
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class PaginationTestCase(ViewsTestCase):
+    
+    def follow(self, view, path, link, key='id'):
+        """ Follow the link of pages from path ; return the keys of each page results and the pages """
+        page_keys = []
+        pages = []
+        while path:
+            response = self.json_response(view, path)
+            page_keys.append([result[key] for result in response['result']])
+            pages.append(response['page'])
+            path = response['page'].get(link)
+            if path:
+                path = '/?' + path.split('?', 1)[1]
+        return (page_keys, pages)
+    
+    def test_cursor_pages_return_all_objects_in_page_order(self):
+        self.create_superlachaise_pois(5)
+        expected_ids = [result['id'] for result in self.json_response(views.superlachaise_poi_list)['result']]
+        
+        (page_ids, pages) = self.follow(views.superlachaise_poi_list, '/?cursor=&page_size=2', 'next_page_url')
+        
+        self.assertEqual(expected_ids, sum(page_ids, []))
+        self.assertEqual([2, 2, 1], [page['per_page'] for page in pages])
+        self.assertNotIn('previous_cursor', pages[0])
+        self.assertNotIn('next_cursor', pages[-1])
+        self.assertEqual(5, pages[0]['object_count'])
+    
+    def test_previous_cursors_return_all_objects_in_page_order(self):
+        self.create_superlachaise_pois(5)
+        (expected_page_ids, pages) = self.follow(views.superlachaise_poi_list, '/?cursor=&page_size=2', 'next_page_url')
+        last_page_path = '/?page_size=2&cursor=' + pages[-2]['next_cursor']
+        
+        (page_ids, pages) = self.follow(views.superlachaise_poi_list, last_page_path, 'previous_page_url')
+        
+        self.assertEqual(expected_page_ids, page_ids[::-1])
+        self.assertNotIn('previous_cursor', pages[-1])
+    
+    def test_cursor_pages_include_pois_without_openstreetmap_element(self):
+        superlachaise_pois = self.create_superlachaise_pois(6)
+        SuperLachaisePOI.objects.filter(pk__in=[superlachaise_pois[1].pk, superlachaise_pois[4].pk, superlachaise_pois[5].pk]).update(openstreetmap_element=None)
+        expected_ids = [result['id'] for result in self.json_response(views.superlachaise_poi_list)['result']]
+        
+        (page_ids, pages) = self.follow(views.superlachaise_poi_list, '/?cursor=&page_size=2', 'next_page_url')
+        (previous_page_ids, previous_pages) = self.follow(views.superlachaise_poi_list, '/?page_size=2&cursor=' + pages[-2]['next_cursor'], 'previous_page_url')
+        
+        self.assertEqual(6, len(expected_ids))
+        self.assertEqual([superlachaise_pois[1].pk, superlachaise_pois[4].pk, superlachaise_pois[5].pk], expected_ids[3:])
+        self.assertEqual(expected_ids, sum(page_ids, []))
+        self.assertEqual(page_ids, previous_page_ids[::-1])
+    
+    def test_cursor_pages_of_string_keys(self):
+        self.create_superlachaise_pois(3)
+        expected_codes = [result['code'] for result in self.json_response(views.superlachaise_category_list)['result']]
+        
+        (page_codes, pages) = self.follow(views.superlachaise_category_list, '/?cursor=&page_size=1', 'next_page_url', key='code')
+        
+        self.assertEqual([[code] for code in expected_codes], page_codes)
+    
+    def test_count_parameter_skips_object_count(self):
+        self.create_superlachaise_pois(3)
+        
+        page = self.json_response(views.superlachaise_poi_list, '/?cursor=&count=0')['page']
+        
+        self.assertNotIn('object_count', page)
+    
+    def test_page_size_parameter_sets_page_size(self):
+        self.create_superlachaise_pois(3)
+        
+        page = self.json_response(views.superlachaise_poi_list, '/?page_size=2')['page']
+        
+        self.assertEqual(2, page['per_page'])
+        self.assertEqual(2, page['page_count'])
+    
+    def test_elements_with_the_same_sorting_name_are_listed_once(self):
+        self.create_superlachaise_pois(3)
+        OpenStreetMapElement.objects.filter(openstreetmap_id__in=['1001', '1002']).update(sorting_name='name 1')
+        
+        (page_names, pages) = self.follow(views.openstreetmap_element_list, '/?cursor=&page_size=1', 'next_page_url', key='sorting_name')
+        
+        self.assertEqual([['name 0'], ['name 1']], page_names)
+        self.assertEqual(2, pages[0]['object_count'])
+    
+    def test_list_queries_do_not_deduplicate_joined_rows(self):
+        superlachaise_poi = self.create_superlachaise_pois(3)[0]
+        SuperLachaiseCategoryRelation.objects.create(superlachaise_poi=superlachaise_poi, superlachaise_category=SuperLachaiseCategory.objects.get(code='category_1'))
+        
+        for view, path, kwargs in [
+            (views.openstreetmap_element_list, '/', {}),
+            (views.wikidata_entry_list, '/', {'superlachaisepoi_id': superlachaise_poi.pk, 'relation_type': SuperLachaiseWikidataRelation.PERSONS}),
+            (views.superlachaise_category_list, '/', {'superlachaisepoi_id': superlachaise_poi.pk}),
+            (views.superlachaise_poi_list, '/?category=category_0+category_1', {}),
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                self.get(view, path, **kwargs)
+            # The page query reads the listed table only
+            page_queries = [query['sql'] for query in queries.captured_queries if 'LIMIT' in query['sql']]
+            self.assertEqual(1, len(page_queries), view.__name__)
+            self.assertNotIn('JOIN', page_queries[0], view.__name__)
+            self.assertFalse([query for query in queries.captured_queries if 'DISTINCT' in query['sql']], view.__name__)
+        
+        self.assertEqual(['category_0', 'category_1'], [result['code'] for result in self.json_response(views.superlachaise_category_list, superlachaisepoi_id=superlachaise_poi.pk)['result']])
+        self.assertEqual(2, len(self.json_response(views.superlachaise_poi_list, '/?category=category_0+category_1')['result']))
+    
+    def test_invalid_parameters_raise_suspicious_operation(self):
+        for path in ['/?page_size=0', '/?page_size=1000', '/?page_size=a', '/?cursor=a', '/?cursor=W10', '/?cursor=' + views.CursorPage.encode_cursor('n', '1000')]:
+            with self.assertRaises(SuspiciousOperation):
+                self.get(views.superlachaise_poi_list, path)
+    
+    def test_cursor_values_of_wrong_types_raise_suspicious_operation(self):
+        self.create_superlachaise_pois(1)
+        
+        for direction in ['n', 'p']:
+            with self.assertRaises(SuspiciousOperation):
+                self.get(views.superlachaise_poi_list, '/?cursor=' + views.CursorPage.encode_cursor(direction, ['a', 'b', 'c']))
+    
+    def test_cursor_page_without_count_query_budget(self):
+        self.create_superlachaise_pois(25)
+        
+        # One query less than test_superlachaise_poi_list_query_budget
+        with self.assertNumQueries(6):
+            self.get(views.superlachaise_poi_list, '/?cursor=&count=0')
+    
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pagination'}}, RESPONSE_CACHE='default')
+    def test_object_count_is_cached(self):
+        self.create_superlachaise_pois(3)
+        self.json_response(views.superlachaise_poi_list, '/?page_size=1')
+        
+        with self.assertNumQueries(6):
+            page = self.json_response(views.superlachaise_poi_list, '/?page_size=1&page=2')['page']
+        self.assertEqual(3, page['object_count'])
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class FragmentStoreTestCase(ViewsTestCase):
+    
+    def build_fragments(self):
+        call_command('build_fragments', stdout=None)
+    
+    def test_responses_do_not_depend_on_built_fragments(self):
+        superlachaise_poi = self.create_superlachaise_pois(3)[0]
+        requests = [
+            (views.openstreetmap_element_list, '/', {}),
+            (views.wikidata_entry_list, '/?language=fr', {}),
+            (views.wikimedia_commons_category_list, '/', {}),
+            (views.wikimedia_commons_file_list, '/', {}),
+            (views.superlachaise_category_list, '/?restrict_fields=1', {}),
+            (views.superlachaise_poi_list, '/', {}),
+            (views.superlachaise_poi_list, '/?language=en&restrict_fields=1', {}),
+            (views.superlachaise_poi, '/?language=fr', {'id': superlachaise_poi.pk}),
+            (views.openstreetmap_element, '/', {'superlachaisepoi_id': superlachaise_poi.pk}),
+        ]
+        contents = [self.get(view, path, **kwargs).content for (view, path, kwargs) in requests]
+        
+        self.build_fragments()
+        
+        self.assertTrue(JSONFragment.objects.exists())
+        for (view, path, kwargs), content in zip(requests, contents):
+            self.assertEqual(content, self.get(view, path, **kwargs).content)
+    
+    def test_encode_returns_encoder_output(self):
+        self.create_superlachaise_pois(2)
+        self.build_fragments()
+        for path in ['/', '/?format=pretty']:
+            encoder = views.SuperLachaiseEncoder(self.factory.get(path), languages=Language.objects.all())
+            for obj_to_encode in [{'result': SuperLachaisePOI.objects.all()}, {'result': SuperLachaisePOI.objects.none()}, {'result': SuperLachaisePOI.objects.first()}]:
+                self.assertEqual(encoder.encode(dict(obj_to_encode)), FragmentStore(encoder).encode(dict(obj_to_encode)))
+    
+    def test_object_deleted_before_encoding_raises_http_404(self):
+        superlachaise_poi = self.create_superlachaise_pois(1)[0]
+        SuperLachaisePOI.objects.filter(pk=superlachaise_poi.pk).delete()
+        
+        for path in ['/', '/?format=msgpack']:
+            encoder = views.SuperLachaiseEncoder(self.factory.get(path), languages=Language.objects.all())
+            with self.assertRaises(Http404):
+                FragmentStore(encoder).encode({'result': superlachaise_poi})
+    
+    def test_outdated_fragment_is_not_used(self):
+        superlachaise_poi = self.create_superlachaise_pois(1)[0]
+        self.build_fragments()
+        
+        superlachaise_poi.burial_plot_reference = "updated"
+        superlachaise_poi.save()
+        
+        result = self.json_response(views.superlachaise_poi, id=superlachaise_poi.pk)['result']
+        self.assertEqual("updated", result['burial_plot_reference'])
+    
+    def test_build_updates_outdated_fragments_and_deletes_fragments_of_deleted_objects(self):
+        superlachaise_pois = self.create_superlachaise_pois(2)
+        fragment_store = FragmentStore(views.SuperLachaiseEncoder(None, languages=Language.objects.all()))
+        self.assertEqual((2, 0), fragment_store.build(SuperLachaisePOI))
+        self.assertEqual((0, 0), fragment_store.build(SuperLachaisePOI))
+        
+        superlachaise_pois[0].save()
+        superlachaise_pois[1].delete()
+        
+        self.assertEqual((1, 1), fragment_store.build(SuperLachaisePOI))
+        self.assertEqual([superlachaise_pois[0].pk], list(JSONFragment.objects.filter(**fragment_store.fragment_filter(SuperLachaisePOI)).values_list('object_id', flat=True)))
+    
+    def test_build_fragments_deletes_fragments_of_deleted_languages(self):
+        self.create_superlachaise_pois(1)
+        self.build_fragments()
+        
+        self.languages[1].delete()
+        self.build_fragments()
+        
+        self.assertEqual(set(['', 'en']), set(JSONFragment.objects.values_list('languages', flat=True)))
+    
+    def test_superlachaise_poi_list_query_budget_with_built_fragments(self):
+        self.create_superlachaise_pois(25)
+        self.build_fragments()
+        
+        with self.assertNumQueries(3):
+            self.get(views.superlachaise_poi_list)
+        with self.assertNumQueries(3):
+            self.get(views.superlachaise_poi_list, '/?language=fr&restrict_fields=1')
+    
+    def test_superlachaise_poi_query_budget_with_built_fragments(self):
+        superlachaise_poi = self.create_superlachaise_pois(3)[0]
+        self.build_fragments()
+        
+        with self.assertNumQueries(2):
+            self.get(views.superlachaise_poi, id=superlachaise_poi.pk)
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class SparseFieldsTestCase(ViewsTestCase):
+    
+    def project(self, value, fields):
+        """ Keep the fields of a response object listed in a parsed fields parameter """
+        if fields is None:
+            return value
+        elif isinstance(value, list):
+            return [self.project(item, fields) for item in value]
+        elif isinstance(value, dict):
+            return {key: self.project(item, fields[key]) for key, item in value.iteritems() if key in fields}
+        else:
+            return value
+    
+    def test_fields_parameter_returns_requested_fields(self):
+        superlachaise_poi = self.create_superlachaise_pois(2)[0]
+        
+        for view, kwargs, fields in [
+            (views.superlachaise_poi, {'id': superlachaise_poi.pk}, 'id,localizations.name,openstreetmap_element.type'),
+            (views.superlachaise_poi_list, {}, 'id,wikidata_entries.persons,superlachaise_categories'),
+            (views.wikidata_entry_list, {}, 'wikidata_id,date_of_birth,localizations.sorting_name,localizations.wikipedia.url'),
+            (views.wikidata_entry_list, {}, 'localizations.wikipedia,localizations.wikipedia.title'),
+            (views.openstreetmap_element_list, {}, 'url,latitude,unknown'),
+            (views.wikimedia_commons_category_list, {}, 'category_members'),
+            (views.wikimedia_commons_file_list, {}, 'author,url'),
+            (views.superlachaise_category_list, {}, 'code,wikidata_occupations,localizations.language_code'),
+        ]:
+            full_result = self.json_response(view, '/?language=fr', **kwargs)['result']
+            result = self.json_response(view, '/?language=fr&fields=' + fields, **kwargs)['result']
+            
+            self.assertEqual(self.project(full_result, views.get_fields(self.factory.get('/?fields=' + fields))), result)
+    
+    def test_unrequested_columns_are_not_loaded(self):
+        self.create_superlachaise_pois(2)
+        
+        with CaptureQueriesContext(connection) as context:
+            self.get(views.wikidata_entry_list, '/?fields=wikidata_id,localizations.wikipedia.title')
+        sql = u' '.join(query['sql'] for query in context.captured_queries)
+        self.assertIn('"superlachaise_api_wikipediapage"."title"', sql)
+        for column in ['"superlachaise_api_wikipediapage"."intro"', '"superlachaise_api_wikidataentry"."notes"', '"superlachaise_api_wikidataentry"."created"', '"superlachaise_api_wikidataentry"."occupations"']:
+            self.assertNotIn(column, sql)
+        
+        with CaptureQueriesContext(connection) as context:
+            self.get(views.superlachaise_poi_list)
+        sql = u' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('"superlachaise_api_superlachaisepoi"."notes"', sql)
+        self.assertNotIn('"superlachaise_api_openstreetmapelement"."name"', sql)
+    
+    def test_unrequested_relations_are_not_queried(self):
+        superlachaise_poi = self.create_superlachaise_pois(1)[0]
+        
+        # Languages, object, projected object
+        with self.assertNumQueries(2):
+            self.get(views.superlachaise_poi, '/?fields=id,burial_plot_reference', id=superlachaise_poi.pk)
+    
+    def test_invalid_fields_parameter_raises_suspicious_operation(self):
+        for fields in ['', 'id,', 'localizations..name', 'Name']:
+            with self.assertRaises(SuspiciousOperation):
+                self.get(views.superlachaise_poi_list, '/?fields=' + fields)
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class BatchTestCase(ViewsTestCase):
+    
+    def test_batch_returns_detail_results_in_requested_order(self):
+        superlachaise_pois = self.create_superlachaise_pois(3)
+        
+        response = self.json_response(views.superlachaise_poi_batch, '/?language=fr&ids=%d|0|%d|%d' % (superlachaise_pois[2].pk, superlachaise_pois[0].pk, superlachaise_pois[2].pk))
+        
+        self.assertEqual([self.json_response(views.superlachaise_poi, '/?language=fr', id=superlachaise_poi.pk)['result'] for superlachaise_poi in [superlachaise_pois[2], superlachaise_pois[0]]], response['result'])
+        self.assertEqual(['0'], response['not_found'])
+    
+    def test_batch_ids_are_natural_keys(self):
+        self.create_superlachaise_pois(2)
+        
+        for view, ids, key in [
+            (views.openstreetmap_element_batch, ['node/1001', 'way/1000', 'node/1000'], 'openstreetmap_id'),
+            (views.wikidata_entry_batch, ['Q1persons', 'Q0artists'], 'wikidata_id'),
+            (views.wikimedia_commons_category_batch, ['Category:category 1'], 'wikimedia_commons_id'),
+            (views.wikimedia_commons_file_batch, ['File:file 0.jpg', 'File:file 1.jpg'], 'wikimedia_commons_id'),
+            (views.superlachaise_category_batch, ['category_1', 'unknown'], 'code'),
+        ]:
+            response = self.json_response(view, '/?ids=' + '|'.join(ids))
+            found_ids = [id for id in ids if not id in response['not_found']]
+            self.assertEqual([id.split('/')[-1] for id in found_ids], [result[key] for result in response['result']])
+        
+        self.assertEqual(['way/1000'], self.json_response(views.openstreetmap_element_batch, '/?ids=node/1001|way/1000|node/1000')['not_found'])
+    
+    def test_batch_ids_may_be_posted(self):
+        superlachaise_pois = self.create_superlachaise_pois(2)
+        ids = [str(superlachaise_poi.pk) for superlachaise_poi in superlachaise_pois]
+        
+        content = self.get(views.superlachaise_poi_batch, '/?ids=' + '|'.join(ids)).content
+        
+        self.assertEqual(content, views.superlachaise_poi_batch(self.factory.post('/', {'ids': ids})).content)
+        self.assertEqual(content, views.superlachaise_poi_batch(self.factory.post('/', json.dumps({'ids': [int(id) for id in ids]}), content_type='application/json')).content)
+    
+    def test_batch_query_budget_does_not_depend_on_id_count(self):
+        superlachaise_pois = self.create_superlachaise_pois(10)
+        
+        with self.assertNumQueries(6):
+            self.get(views.superlachaise_poi_batch, '/?ids=%d' % superlachaise_pois[0].pk)
+        with self.assertNumQueries(6):
+            self.get(views.superlachaise_poi_batch, '/?ids=' + '|'.join(str(superlachaise_poi.pk) for superlachaise_poi in superlachaise_pois))
+    
+    def test_invalid_ids_parameter_raises_suspicious_operation(self):
+        for path in ['/', '/?ids=', '/?ids=' + '|'.join(str(index) for index in range(views.MAX_PAGE_SIZE + 1))]:
+            with self.assertRaises(SuspiciousOperation):
+                self.get(views.superlachaise_poi_batch, path)
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class ExportTestCase(ViewsTestCase):
+    
+    def export_lines(self, view, path='/'):
+        response = self.get(view, path)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertEqual('application/x-ndjson; charset=utf-8', response['Content-Type'])
+        content = ''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content == u'' or content.endswith(u'\n'))
+        return content.splitlines()
+    
+    @patch.object(views, 'EXPORT_CHUNK_SIZE', 2)
+    def test_export_lines_are_the_objects_of_detail_views(self):
+        superlachaise_pois = self.create_superlachaise_pois(5)
+        
+        lines = self.export_lines(views.superlachaise_poi_export, '/?language=fr&restrict_fields=1')
+        
+        self.assertEqual(5, len(lines))
+        for superlachaise_poi, line in zip(superlachaise_pois, lines):
+            self.assertNotIn(u'\n', line)
+            self.assertEqual(self.json_response(views.superlachaise_poi, '/?language=fr&restrict_fields=1', id=superlachaise_poi.pk)['result'], json.loads(line))
+    
+    def test_export_of_every_resource(self):
+        self.create_superlachaise_pois(2)
+        
+        for view, model in [
+            (views.openstreetmap_element_export, OpenStreetMapElement),
+            (views.wikidata_entry_export, WikidataEntry),
+            (views.wikimedia_commons_category_export, WikimediaCommonsCategory),
+            (views.wikimedia_commons_file_export, WikimediaCommonsFile),
+            (views.superlachaise_category_export, SuperLachaiseCategory),
+            (views.superlachaise_poi_export, SuperLachaisePOI),
+        ]:
+            self.assertEqual(model.objects.count(), len(self.export_lines(view)))
+    
+    def test_modified_since_parameter_filters_exported_objects(self):
+        superlachaise_pois = self.create_superlachaise_pois(2)
+        SuperLachaisePOI.objects.filter(pk=superlachaise_pois[0].pk).update(modified=datetime.datetime(2000, 1, 1, tzinfo=timezone.utc))
+        
+        lines = self.export_lines(views.superlachaise_poi_export, '/?modified_since=2010-01-01')
+        
+        self.assertEqual([superlachaise_pois[1].pk], [json.loads(line)['id'] for line in lines])
+        self.assertEqual([], self.export_lines(views.superlachaise_poi_export, '/?modified_since=2100-01-01'))
+        with self.assertRaises(SuspiciousOperation):
+            self.get(views.superlachaise_poi_export, '/?modified_since=invalid')
+    
+    @patch.object(views, 'EXPORT_CHUNK_SIZE', 2)
+    def test_export_query_budget_depends_on_chunk_count(self):
+        self.create_superlachaise_pois(4)
+        call_command('build_fragments', stdout=None)
+        
+        # 2 queries for each of the 2 chunks, 1 for the empty chunk
+        with self.assertNumQueries(5):
+            self.export_lines(views.superlachaise_poi_export)
+        
+        self.create_superlachaise_pois(1)
+        call_command('build_fragments', stdout=None)
+        
+        with self.assertNumQueries(7):
+            self.export_lines(views.superlachaise_poi_export)
+
+@override_settings(ROOT_URLCONF='superlachaise_api.urls')
+class SuperLachaiseEncoderTestCase(ViewsTestCase):
+    
+    def test_superlachaise_poi_localizations_follow_requested_languages(self):
+        superlachaise_poi = self.create_superlachaise_pois(1)[0]
+        
+        result = self.json_response(views.superlachaise_poi, '/?language=fr', id=superlachaise_poi.pk)['result']
+        
+        self.assertEqual(['fr'], [localization['language_code'] for localization in result['localizations']])
+    
+    def test_superlachaise_poi_wikidata_entries_are_grouped_by_relation_type(self):
+        superlachaise_poi = self.create_superlachaise_pois(1)[0]
+        
+        result = self.json_response(views.superlachaise_poi, id=superlachaise_poi.pk)['result']
+        
+        self.assertEqual([{'wikidata_id': 'Q0persons'}], result['wikidata_entries']['persons'])
+        self.assertEqual([{'wikidata_id': 'Q0artists'}], result['wikidata_entries']['artists'])
+        self.assertEqual([], result['wikidata_entries']['others'])
+    
+    def test_wikidata_entry_localizations_include_wikipedia_page(self):
+        wikidata_entry = self.create_superlachaise_pois(1)[0].wikidata_entries.first()
+        
+        result = self.json_response(views.wikidata_entry, id=wikidata_entry.wikidata_id)['result']
+        
+        self.assertEqual(2, len(result['localizations']))
+        for localization in result['localizations']:
+            self.assertEqual('name, 0', localization['sorting_name'])
+            self.assertEqual('name 0', localization['wikipedia']['title'])
+    
+    def test_wikidata_entry_localization_without_wikipedia_page_has_no_wikipedia(self):
+        wikidata_entry = self.create_superlachaise_pois(1)[0].wikidata_entries.first()
+        WikipediaPage.objects.filter(wikidata_localized_entry__wikidata_entry=wikidata_entry).delete()
+        
+        result = self.json_response(views.wikidata_entry, id=wikidata_entry.wikidata_id)['result']
+        
+        for localization in result['localizations']:
+            self.assertIsNone(localization['wikipedia'])
+            self.assertEqual('name 0', localization['sorting_name'])
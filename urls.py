@@ -28,27 +28,46 @@ urlpatterns = [
     url(r'^licence/$', views.licence),
     
     url(r'^openstreetmap_elements/$', views.openstreetmap_element_list),
+    url(r'^openstreetmap_elements/batch/$', views.openstreetmap_element_batch),
+    url(r'^openstreetmap_elements/export\.ndjson$', views.openstreetmap_element_export),
     url(r'^openstreetmap_elements/(?P<type>[^\/]*)/$', views.openstreetmap_element_list),
     url(r'^openstreetmap_elements/(?P<type>[^\/]*)/(?P<id>[0-9]*)/$', views.openstreetmap_element),
     
     url(r'^wikidata_entries/$', views.wikidata_entry_list),
+    url(r'^wikidata_entries/batch/$', views.wikidata_entry_batch),
+    url(r'^wikidata_entries/export\.ndjson$', views.wikidata_entry_export),
     url(r'^wikidata_entries/(?P<id>Q[0-9]*)/$', views.wikidata_entry),
     
     url(r'^wikimedia_commons_categories/$', views.wikimedia_commons_category_list),
+    url(r'^wikimedia_commons_categories/batch/$', views.wikimedia_commons_category_batch),
+    url(r'^wikimedia_commons_categories/export\.ndjson$', views.wikimedia_commons_category_export),
     url(r'^wikimedia_commons_categories/(?P<id>[^\/]*)/$', views.wikimedia_commons_category),
     
     url(r'^wikimedia_commons_files/$', views.wikimedia_commons_file_list),
+    url(r'^wikimedia_commons_files/batch/$', views.wikimedia_commons_file_batch),
+    url(r'^wikimedia_commons_files/export\.ndjson$', views.wikimedia_commons_file_export),
     url(r'^wikimedia_commons_files/(?P<id>[^\/]*)/$', views.wikimedia_commons_file),
     
     url(r'^superlachaise_categories/$', views.superlachaise_category_list),
+    url(r'^superlachaise_categories/batch/$', views.superlachaise_category_batch),
+    url(r'^superlachaise_categories/export\.ndjson$', views.superlachaise_category_export),
     url(r'^superlachaise_categories/(?P<id>[^\/]*)/$', views.superlachaise_category),
     
     url(r'^superlachaise_pois/$', views.superlachaise_poi_list),
+    url(r'^superlachaise_pois/batch/$', views.superlachaise_poi_batch),
+    url(r'^superlachaise_pois/facets/$', views.superlachaise_poi_facets),
+    url(r'^superlachaise_pois/sectors/$', views.superlachaise_poi_sectors),
+    url(r'^superlachaise_pois/export\.ndjson$', views.superlachaise_poi_export),
+    url(r'^superlachaise_pois/export\.geojson$', views.superlachaise_poi_geojson),
     url(r'^superlachaise_pois/(?P<id>[0-9]*)/$', views.superlachaise_poi),
     url(r'^superlachaise_pois/(?P<superlachaisepoi_id>[0-9]*)/openstreetmap_element/$', views.openstreetmap_element),
     url(r'^superlachaise_pois/(?P<superlachaisepoi_id>[0-9]*)/wikimedia_commons_category/$', views.wikimedia_commons_category),
     url(r'^superlachaise_pois/(?P<superlachaisepoi_id>[0-9]*)/superlachaise_categories/$', views.superlachaise_category_list),
     url(r'^superlachaise_pois/(?P<superlachaisepoi_id>[0-9]*)/wikidata_entries/(?P<relation_type>[^\/]*)/$', views.wikidata_entry_list),
     
+    url(r'^changes/$', views.change_list),
+    
+    url(r'^map_tiles/(?P<zoom>[0-9]+)/(?P<x>[0-9]+)/(?P<y>[0-9]+)/$', views.map_tile),
+    
     url(r'^$', views.objects),
 ]
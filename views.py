@@ -20,32 +20,354 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import datetime, json, os
+import base64, datetime, json, os, re
 from decimal import Decimal
 from django.core.exceptions import SuspiciousOperation
 from django.core.paginator import Page, Paginator, EmptyPage, PageNotAnInteger
 from django.core.urlresolvers import reverse
-from django.db.models import Q
+from django.db.models import Case, IntegerField, Min, Prefetch, Q, Value, When
+from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
 from django.http import HttpResponse, HttpResponseBadRequest, Http404
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import encoding, timezone, dateparse
 from django.utils.translation import ugettext as _
 
-from superlachaise_api import conf
+from superlachaise_api import changes, conf, counters, filter_index, geo, map_tiles, reference_data, renderers, search_index
+from superlachaise_api.cache import cache_response, cached_count
+from superlachaise_api.fragments import FragmentStore
 from superlachaise_api.models import *
 
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# Objects read and encoded at once by the export views
+EXPORT_CHUNK_SIZE = 500
+
+# A field of the fields parameter, with the names of its parent fields separated by dots
+FIELD_REGEX = re.compile(r'^[a-z0-9_]+(\.[a-z0-9_]+)*$')
+
+# Change log entries returned at once by the change feed
+CHANGES_BATCH_SIZE = 1000
+
+# Radius in meters of the near parameter
+DEFAULT_RADIUS = 100
+MAX_RADIUS = 10000
+
+class CachedCountPaginator(Paginator):
+    """ A paginator whose object count is cached until the next synchronization """
+    
+    def _get_count(self):
+        if self._count is None:
+            self._count = cached_count(self.object_list)
+        return self._count
+    count = property(_get_count)
+
+class CursorPage(object):
+    """ A page of a queryset ordered by a unique field or a unique tuple of non null fields, starting after or ending before a cursor value """
+    
+    NEXT = 'n'
+    PREVIOUS = 'p'
+    
+    def __init__(self, queryset, order_field, cursor, per_page, count=True):
+        (direction, value) = cursor
+        
+        if direction == self.PREVIOUS:
+            objects = list(queryset.filter(self.keyset_filter(order_field, value, 'lt')).order_by(*['-' + field for field in self.order_fields(order_field)])[:per_page + 1])
+            self._has_previous = len(objects) > per_page
+            self._has_next = True
+            self.object_list = list(reversed(objects[:per_page]))
+        else:
+            if value is not None:
+                queryset_after = queryset.filter(self.keyset_filter(order_field, value, 'gt'))
+            else:
+                queryset_after = queryset
+            objects = list(queryset_after[:per_page + 1])
+            self._has_previous = value is not None
+            self._has_next = len(objects) > per_page
+            self.object_list = objects[:per_page]
+        
+        self.order_field = order_field
+        self.count = cached_count(queryset) if count else None
+    
+    @classmethod
+    def order_fields(cls, order_field):
+        return list(order_field) if isinstance(order_field, (list, tuple)) else [order_field]
+    
+    @classmethod
+    def keyset_filter(cls, order_field, value, lookup):
+        """ Return the Q object of the rows after (lookup 'gt') or before (lookup 'lt') a cursor value in the order of order_field """
+        if not isinstance(order_field, (list, tuple)):
+            return Q(**{order_field + '__' + lookup: value})
+        # (a, b) > (x, y) is a > x or (a = x and b > y)
+        result = Q()
+        equal_fields = {}
+        for (field, field_value) in zip(order_field, value):
+            result = result | Q(**dict(equal_fields, **{field + '__' + lookup: field_value}))
+            equal_fields[field] = field_value
+        return result
+    
+    @classmethod
+    def is_valid_value(cls, order_field, value):
+        if isinstance(order_field, (list, tuple)):
+            return isinstance(value, list) and len(value) == len(order_field)
+        else:
+            return not isinstance(value, list)
+    
+    @classmethod
+    def encode_cursor(cls, direction, value):
+        return base64.urlsafe_b64encode(json.dumps([direction, value])).rstrip('=')
+    
+    @classmethod
+    def decode_cursor(cls, cursor):
+        """ Return the (direction, value) tuple of a cursor, or (NEXT, None) for the first page if the cursor is empty """
+        if not cursor:
+            return (cls.NEXT, None)
+        (direction, value) = json.loads(base64.urlsafe_b64decode(str(cursor) + '=' * (-len(cursor) % 4)))
+        if not direction in [cls.NEXT, cls.PREVIOUS]:
+            raise ValueError
+        values = value if isinstance(value, list) else [value]
+        if not values or not all(isinstance(item, (basestring, int, long)) for item in values):
+            raise ValueError
+        return (direction, value)
+    
+    def has_previous(self):
+        return self._has_previous and len(self.object_list) > 0
+    
+    def has_next(self):
+        return self._has_next and len(self.object_list) > 0
+    
+    def object_value(self, obj):
+        if isinstance(self.order_field, (list, tuple)):
+            return [getattr(obj, field) for field in self.order_field]
+        else:
+            return getattr(obj, self.order_field)
+    
+    def previous_cursor(self):
+        return self.encode_cursor(self.PREVIOUS, self.object_value(self.object_list[0]))
+    
+    def next_cursor(self):
+        return self.encode_cursor(self.NEXT, self.object_value(self.object_list[-1]))
+
 class SuperLachaiseEncoder(object):
     
-    def __init__(self, request, languages=None, restrict_fields=False):
+    def __init__(self, request, languages=None, restrict_fields=False, fields=None, response_format=None):
         self.request = request
-        self.languages = languages
+        self.languages = list(languages) if languages is not None else None
         self.restrict_fields = restrict_fields
+        self.fields = fields
+        # Database dumps and fragments built without request are pretty JSON
+        if response_format is None:
+            response_format = renderers.negotiate_format(request) if request is not None else renderers.PRETTY_JSON
+        self.response_format = response_format
+        self.counter_values = {}
+    
+    def requested(self, *path):
+        """ Return whether the fields parameter requests the field at path or some of its subfields """
+        tree = self.fields
+        for key in path:
+            if tree is None:
+                # The field is requested with all its subfields
+                return True
+            if not key in tree:
+                return False
+            tree = tree[key]
+        return True
+    
+    def requested_columns(self, field_columns, path=()):
+        """ Return the columns read by the requested fields, from (field, columns) pairs """
+        result = []
+        for field, columns in field_columns:
+            if self.requested(*(path + (field,))):
+                result.extend(columns)
+        return result
+    
+    def defer_unused(self, queryset, columns, related_columns={}):
+        """ Return the queryset deferring the columns that are not listed, for its model and its select_related relations """
+        deferred = [field.name for field in queryset.model._meta.concrete_fields if not field.primary_key and not field.name in columns]
+        for relation, relation_columns in related_columns.iteritems():
+            related_model = queryset.model._meta.get_field(relation).related_model
+            deferred.extend([relation + '__' + field.name for field in related_model._meta.concrete_fields if not field.primary_key and not field.name in relation_columns])
+        return queryset.defer(*deferred)
+    
+    def prefetch(self, queryset):
+        """ Return the queryset with the relations used by obj_dict loaded in a fixed number of queries, reading only the columns of the requested fields """
+        model = queryset.model
+        language_ids = [language.pk for language in self.languages] if self.languages else []
+        
+        # modified is read by FragmentStore ; notes and created are never encoded
+        columns = ['modified']
+        related_columns = {}
+        prefetches = []
+        
+        if model is SuperLachaisePOI:
+            columns.extend(self.requested_columns([
+                ('burial_plot_reference', ['burial_plot_reference']),
+                ('date_of_birth', ['date_of_birth']),
+                ('date_of_birth_accuracy', ['date_of_birth_accuracy']),
+                ('date_of_death', ['date_of_death']),
+                ('date_of_death_accuracy', ['date_of_death_accuracy']),
+            ]))
+            for relation, relation_field_columns in [
+                ('openstreetmap_element', [('openstreetmap_id', ['openstreetmap_id']), ('type', ['type'])]),
+                ('wikimedia_commons_category', [('wikimedia_commons_id', ['wikimedia_commons_id'])]),
+            ]:
+                if self.requested(relation):
+                    columns.append(relation)
+                    related_columns[relation] = self.requested_columns(relation_field_columns, path=(relation,))
+            
+            if self.requested('localizations'):
+                localizations = SuperLachaiseLocalizedPOI.objects.filter(language__in=language_ids).order_by()
+                localization_columns = ['superlachaise_poi', 'language'] + self.requested_columns([
+                    ('name', ['name']),
+                    ('sorting_name', ['sorting_name']),
+                    ('description', ['description']),
+                ], path=('localizations',))
+                prefetches.append(Prefetch('localizations', queryset=self.defer_unused(localizations, localization_columns)))
+            if self.requested('wikidata_entries'):
+                wikidata_relations = SuperLachaiseWikidataRelation.objects.select_related('wikidata_entry').order_by('relation_type', 'wikidata_entry__wikidata_id')
+                prefetches.append(Prefetch('superlachaisewikidatarelation_set', queryset=self.defer_unused(wikidata_relations, ['superlachaise_poi', 'wikidata_entry', 'relation_type'], {'wikidata_entry': ['wikidata_id']})))
+            if self.requested('superlachaise_categories'):
+                prefetches.append(Prefetch('superlachaise_categories', queryset=self.defer_unused(SuperLachaiseCategory.objects.all(), ['code'])))
+        elif model is SuperLachaiseCategory:
+            columns.extend(self.requested_columns([
+                ('code', ['code']),
+                ('type', ['type']),
+                ('members_count', ['code']),
+            ]))
+            
+            if self.requested('localizations'):
+                localizations = SuperLachaiseLocalizedCategory.objects.filter(language__in=language_ids).order_by()
+                localization_columns = ['superlachaise_category', 'language'] + self.requested_columns([
+                    ('name', ['name']),
+                ], path=('localizations',))
+                prefetches.append(Prefetch('localizations', queryset=self.defer_unused(localizations, localization_columns)))
+            if not self.restrict_fields and self.requested('wikidata_occupations'):
+                prefetches.append(Prefetch('wikidata_occupations', queryset=self.defer_unused(WikidataOccupation.objects.all(), ['superlachaise_category'])))
+        elif model is OpenStreetMapElement:
+            field_columns = [
+                ('openstreetmap_id', ['openstreetmap_id']),
+                ('type', ['type']),
+                ('latitude', ['latitude']),
+                ('longitude', ['longitude']),
+            ]
+            if not self.restrict_fields:
+                field_columns.extend([
+                    ('url', ['type', 'openstreetmap_id']),
+                    ('name', ['name']),
+                    ('sorting_name', ['sorting_name']),
+                    ('nature', ['nature']),
+                    ('wikidata', ['wikidata']),
+                    ('wikimedia_commons', ['wikimedia_commons']),
+                ])
+            columns.extend(self.requested_columns(field_columns))
+        elif model is WikidataEntry:
+            # instance_of selects the fields of persons
+            columns.extend(['instance_of'] + self.requested_columns([
+                ('wikidata_id', ['wikidata_id']),
+                ('date_of_birth', ['date_of_birth']),
+                ('date_of_birth_accuracy', ['date_of_birth_accuracy']),
+                ('date_of_death', ['date_of_death']),
+                ('date_of_death_accuracy', ['date_of_death_accuracy']),
+            ]))
+            if not self.restrict_fields:
+                columns.extend(self.requested_columns([
+                    ('url', ['wikidata_id']),
+                    ('burial_plot_reference', ['burial_plot_reference']),
+                    ('wikimedia_commons_category', ['wikimedia_commons_category']),
+                    ('sex_or_gender', ['sex_or_gender']),
+                    ('occupations', ['occupations']),
+                    ('wikimedia_commons_grave_category', ['wikimedia_commons_grave_category']),
+                    ('grave_of', ['grave_of_wikidata']),
+                ]))
+            
+            if self.requested('localizations'):
+                localizations = WikidataLocalizedEntry.objects.filter(language__in=language_ids).order_by()
+                localization_columns = ['wikidata_entry', 'language'] + self.requested_columns([
+                    ('name', ['name']),
+                    ('sorting_name', ['name']),
+                    ('description', ['description']),
+                ], path=('localizations',))
+                
+                # The Wikipedia page is read for the sorting name
+                wikipedia_page_field_columns = [
+                    ('id', []),
+                    ('title', ['title']),
+                    ('intro', ['intro']),
+                ]
+                if not self.restrict_fields:
+                    wikipedia_page_field_columns.extend([
+                        ('default_sort', ['default_sort']),
+                    ])
+                    if self.requested('localizations', 'wikipedia', 'url'):
+                        localization_columns.append('wikipedia')
+                wikipedia_page_columns = ['wikidata_localized_entry'] + self.requested_columns(wikipedia_page_field_columns, path=('localizations', 'wikipedia'))
+                if self.requested('localizations', 'sorting_name'):
+                    wikipedia_page_columns.append('default_sort')
+                
+                if self.requested('localizations', 'sorting_name') or self.requested('localizations', 'wikipedia'):
+                    localizations = self.defer_unused(localizations.select_related('wikipedia_page'), localization_columns, {'wikipedia_page': wikipedia_page_columns})
+                else:
+                    localizations = self.defer_unused(localizations, localization_columns)
+                prefetches.append(Prefetch('localizations', queryset=localizations))
+        elif model is WikimediaCommonsCategory:
+            field_columns = [
+                ('wikimedia_commons_id', ['wikimedia_commons_id']),
+                ('category_members', ['category_members']),
+                ('main_image', ['main_image']),
+            ]
+            if not self.restrict_fields:
+                field_columns.append(('url', ['wikimedia_commons_id']))
+            columns.extend(self.requested_columns(field_columns))
+        elif model is WikimediaCommonsFile:
+            field_columns = [
+                ('wikimedia_commons_id', ['wikimedia_commons_id']),
+                ('author', ['author']),
+                ('license', ['license']),
+                ('url_512px', ['url_512px']),
+                ('url_1024px', ['url_1024px']),
+                ('url_2048px', ['url_2048px']),
+            ]
+            if not self.restrict_fields:
+                field_columns.append(('url', ['wikimedia_commons_id']))
+            columns.extend(self.requested_columns(field_columns))
+        
+        queryset = self.defer_unused(queryset, columns, related_columns)
+        if related_columns:
+            queryset = queryset.select_related(*related_columns.keys())
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        
+        return queryset
+    
+    def columns_dict(self, obj, field_names, path=()):
+        """ Return the requested fields of an object whose value is the attribute of the same name """
+        return {field_name: getattr(obj, field_name) for field_name in field_names if self.requested(*(path + (field_name,)))}
+    
+    def counter_value(self, counter_type, key):
+        """ Return a counter, reading the counters of its type once per encoder """
+        if not counter_type in self.counter_values:
+            self.counter_values[counter_type] = counters.values(counter_type)
+        return self.counter_values[counter_type].get(key, 0)
+    
+    def localizations(self, obj):
+        """ Return (language, localization) pairs for the requested languages, reading prefetched localizations if any """
+        result = []
+        if self.languages:
+            localizations = {localization.language_id: localization for localization in obj.localizations.all()}
+            for language in self.languages:
+                if language.pk in localizations:
+                    result.append((language, localizations[language.pk]))
+        return result
     
     def encode(self, obj):
         if 'about' not in obj:
             obj['about'] = self.about_dict()
-        return json.dumps(self.obj_dict(obj), ensure_ascii=False, indent=4, separators=(',', ': '), sort_keys=True, default=self.default)
+        return self.dumps(self.obj_dict(obj))
+    
+    def dumps(self, obj_dict):
+        return renderers.encode(self.response_format, obj_dict, default=self.default)
     
     def about_dict(self):
         result = {
@@ -73,6 +395,8 @@ class SuperLachaiseEncoder(object):
     def obj_dict(self, obj):
         if isinstance(obj, Page):
             return self.page_dict(obj)
+        elif isinstance(obj, CursorPage):
+            return self.cursor_page_dict(obj)
         elif isinstance(obj, SuperLachaisePOI):
             return self.superlachaise_poi_dict(obj)
         elif isinstance(obj, SuperLachaiseCategory):
@@ -85,6 +409,8 @@ class SuperLachaiseEncoder(object):
             return self.wikimedia_commons_category_dict(obj)
         elif isinstance(obj, WikimediaCommonsFile):
             return self.wikimedia_commons_file_dict(obj)
+        elif isinstance(obj, ChangeLogEntry):
+            return self.change_log_entry_dict(obj)
         elif isinstance(obj, list) or isinstance(obj, QuerySet):
             return [self.obj_dict(list_item) for list_item in obj]
         elif isinstance(obj, dict):
@@ -92,6 +418,39 @@ class SuperLachaiseEncoder(object):
         else:
             return obj
     
+    def page_url(self, **params_update):
+        params = self.request.GET.copy()
+        for key, value in params_update.iteritems():
+            if value is None:
+                params.pop(key, None)
+            else:
+                params[key] = value
+        page_path = u'{path}?{params}'.format(path=self.request.path, params='&'.join(['%s=%s' % (key, value) for key, value in params.iteritems()]))
+        
+        return self.request.build_absolute_uri(page_path.replace(' ', '+'))
+    
+    def cursor_page_dict(self, page):
+        result = {
+            'per_page': len(page.object_list),
+        }
+        
+        if page.count is not None:
+            result['object_count'] = page.count
+        
+        if page.has_previous():
+            result.update({
+                'previous_cursor': page.previous_cursor(),
+                'previous_page_url': self.page_url(cursor=page.previous_cursor(), page=None),
+            })
+        
+        if page.has_next():
+            result.update({
+                'next_cursor': page.next_cursor(),
+                'next_page_url': self.page_url(cursor=page.next_cursor(), page=None),
+            })
+        
+        return result
+    
     def page_dict(self, page):
         result = {
             'current_page': page.number,
@@ -101,109 +460,85 @@ class SuperLachaiseEncoder(object):
         }
         
         if page.has_previous():
-            params = self.request.GET.copy()
-            params['page'] = page.previous_page_number()
-            page_path = u'{path}?{params}'.format(path=self.request.path, params='&'.join(['%s=%s' % (key, value) for key, value in params.iteritems()]))
-            
             result.update({
-                'previous_page': params['page'],
-                'previous_page_url': self.request.build_absolute_uri(page_path.replace(' ', '+')),
+                'previous_page': page.previous_page_number(),
+                'previous_page_url': self.page_url(page=page.previous_page_number()),
             })
         
         if page.has_next():
-            params = self.request.GET.copy()
-            params['page'] = page.next_page_number()
-            page_path = u'{path}?{params}'.format(path=self.request.path, params='&'.join(['%s=%s' % (key, value) for key, value in params.iteritems()]))
-            
             result.update({
-                'next_page': params['page'],
-                'next_page_url': self.request.build_absolute_uri(page_path.replace(' ', '+')),
+                'next_page': page.next_page_number(),
+                'next_page_url': self.page_url(page=page.next_page_number()),
             })
         
         return result
     
     def superlachaise_poi_dict(self, superlachaise_poi):
-        result = {
-            'id': superlachaise_poi.pk,
-            'burial_plot_reference': superlachaise_poi.burial_plot_reference,
-            'date_of_birth': superlachaise_poi.date_of_birth,
-            'date_of_birth_accuracy': superlachaise_poi.date_of_birth_accuracy,
-            'date_of_death': superlachaise_poi.date_of_death,
-            'date_of_death_accuracy': superlachaise_poi.date_of_death_accuracy,
-        }
-    
-        localizations = []
-        if self.languages:
-            for language in self.languages:
-                superlachaise_localized_poi = superlachaise_poi.localizations.filter(language=language).first()
-                if superlachaise_localized_poi:
-                    localizations.append({
-                        'id': superlachaise_localized_poi.pk,
-                        'language_code': language.code,
-                        'name': superlachaise_localized_poi.name,
-                        'sorting_name': superlachaise_localized_poi.sorting_name,
-                        'description': superlachaise_localized_poi.description,
-                    })
-    
-        wikidata_entry_relations = {
-            'persons': [],
-            'artists': [],
-            'others': [],
-        }
-        for wikidata_entry_relation in superlachaise_poi.superlachaisewikidatarelation_set.all():
-            if wikidata_entry_relation.relation_type in wikidata_entry_relations:
-                wikidata_entry_relations[wikidata_entry_relation.relation_type].append({
-                    'wikidata_id': wikidata_entry_relation.wikidata_entry.wikidata_id,
-                })
+        result = self.columns_dict(superlachaise_poi, ['id', 'burial_plot_reference', 'date_of_birth', 'date_of_birth_accuracy', 'date_of_death', 'date_of_death_accuracy'])
         
-        superlachaise_categories = []
-        for superlachaise_category in superlachaise_poi.superlachaise_categories.all():
-            superlachaise_categories.append({
-                'code': superlachaise_category.code,
-            })
+        if self.requested('localizations'):
+            localizations = []
+            for language, superlachaise_localized_poi in self.localizations(superlachaise_poi):
+                localization = self.columns_dict(superlachaise_localized_poi, ['id', 'name', 'sorting_name', 'description'], path=('localizations',))
+                if self.requested('localizations', 'language_code'):
+                    localization['language_code'] = language.code
+                localizations.append(localization)
+            result['localizations'] = localizations
         
-        if superlachaise_poi.openstreetmap_element:
-            result['openstreetmap_element'] = {
-                'openstreetmap_id': superlachaise_poi.openstreetmap_element.openstreetmap_id,
-                'type': superlachaise_poi.openstreetmap_element.type,
-            }
-        else:
-            result['openstreetmap_element'] = None
+        if self.requested('wikidata_entries'):
+            wikidata_entry_relations = {relation_type: [] for relation_type in ['persons', 'artists', 'others'] if self.requested('wikidata_entries', relation_type)}
+            for wikidata_entry_relation in superlachaise_poi.superlachaisewikidatarelation_set.all():
+                if wikidata_entry_relation.relation_type in wikidata_entry_relations:
+                    wikidata_entry_relations[wikidata_entry_relation.relation_type].append(self.columns_dict(wikidata_entry_relation.wikidata_entry, ['wikidata_id'], path=('wikidata_entries', wikidata_entry_relation.relation_type)))
+            result['wikidata_entries'] = wikidata_entry_relations
         
-        if superlachaise_poi.wikimedia_commons_category:
-            result['wikimedia_commons_category'] = {
-                'wikimedia_commons_id': superlachaise_poi.wikimedia_commons_category.wikimedia_commons_id,
-            }
-        else:
-            result['wikimedia_commons_category'] = None
+        if self.requested('superlachaise_categories'):
+            superlachaise_categories = []
+            for superlachaise_category in superlachaise_poi.superlachaise_categories.all():
+                superlachaise_categories.append(self.columns_dict(superlachaise_category, ['code'], path=('superlachaise_categories',)))
+            result['superlachaise_categories'] = superlachaise_categories
         
-        result.update({
-            'localizations': localizations,
-            'wikidata_entries': wikidata_entry_relations,
-            'superlachaise_categories': self.obj_dict(superlachaise_categories),
-        })
+        if self.requested('openstreetmap_element'):
+            if superlachaise_poi.openstreetmap_element:
+                result['openstreetmap_element'] = self.columns_dict(superlachaise_poi.openstreetmap_element, ['openstreetmap_id', 'type'], path=('openstreetmap_element',))
+            else:
+                result['openstreetmap_element'] = None
+        
+        if self.requested('wikimedia_commons_category'):
+            if superlachaise_poi.wikimedia_commons_category:
+                result['wikimedia_commons_category'] = self.columns_dict(superlachaise_poi.wikimedia_commons_category, ['wikimedia_commons_id'], path=('wikimedia_commons_category',))
+            else:
+                result['wikimedia_commons_category'] = None
         
         return result
     
-    def superlachaise_category_dict(self, superlachaise_category):
+    def change_log_entry_dict(self, change_log_entry):
         result = {
-            'code': superlachaise_category.code,
-            'type': superlachaise_category.type,
+            'sequence': change_log_entry.pk,
+            'action': change_log_entry.action,
+            'model': changes.object_model(change_log_entry.object_type).__name__,
+            'id': change_log_entry.natural_key,
+            'timestamp': change_log_entry.created,
         }
+        
+        return result
     
-        localizations = []
-        if self.languages:
-            for language in self.languages:
-                superlachaise_localized_category = superlachaise_category.localizations.filter(language=language).first()
-                if superlachaise_localized_category:
-                    localizations.append({
-                        'id': superlachaise_localized_category.pk,
-                        'language_code': language.code,
-                        'name': superlachaise_localized_category.name,
-                    })
-        result['localizations'] = localizations
-    
-        if not self.restrict_fields:
+    def superlachaise_category_dict(self, superlachaise_category):
+        result = self.columns_dict(superlachaise_category, ['code', 'type'])
+        
+        if self.requested('members_count'):
+            result['members_count'] = self.counter_value(Counter.CATEGORY_MEMBERS, superlachaise_category.code)
+        
+        if self.requested('localizations'):
+            localizations = []
+            for language, superlachaise_localized_category in self.localizations(superlachaise_category):
+                localization = self.columns_dict(superlachaise_localized_category, ['id', 'name'], path=('localizations',))
+                if self.requested('localizations', 'language_code'):
+                    localization['language_code'] = language.code
+                localizations.append(localization)
+            result['localizations'] = localizations
+        
+        if not self.restrict_fields and self.requested('wikidata_occupations'):
             result.update({
                 'wikidata_occupations': ['Q%s' % wikidata_occupation.id for wikidata_occupation in superlachaise_category.wikidata_occupations.all()],
             })
@@ -211,90 +546,66 @@ class SuperLachaiseEncoder(object):
         return result
     
     def openstreetmap_element_dict(self, openstreetmap_element):
-        result = {
-            'openstreetmap_id': openstreetmap_element.openstreetmap_id,
-            'type': openstreetmap_element.type,
-            'latitude': openstreetmap_element.latitude,
-            'longitude': openstreetmap_element.longitude,
-        }
-    
+        result = self.columns_dict(openstreetmap_element, ['openstreetmap_id', 'type', 'latitude', 'longitude'])
+        
         if not self.restrict_fields:
-            result.update({
-                'url': u'https://www.openstreetmap.org/{type}/{id}'.format(type=openstreetmap_element.type, id=encoding.escape_uri_path(openstreetmap_element.openstreetmap_id)),
-                'name': openstreetmap_element.name,
-                'sorting_name': openstreetmap_element.sorting_name,
-                'nature': openstreetmap_element.nature,
-                'wikidata': openstreetmap_element.wikidata.split(';'),
-                'wikimedia_commons': openstreetmap_element.wikimedia_commons,
-            })
+            result.update(self.columns_dict(openstreetmap_element, ['name', 'sorting_name', 'nature', 'wikimedia_commons']))
+            if self.requested('url'):
+                result['url'] = u'https://www.openstreetmap.org/{type}/{id}'.format(type=openstreetmap_element.type, id=encoding.escape_uri_path(openstreetmap_element.openstreetmap_id))
+            if self.requested('wikidata'):
+                result['wikidata'] = openstreetmap_element.wikidata.split(';')
         
         return result
     
     def wikidata_entry_dict(self, wikidata_entry):
-        result = {
-            'wikidata_id': wikidata_entry.wikidata_id,
-        }
-    
+        result = self.columns_dict(wikidata_entry, ['wikidata_id'])
+        
         if 'Q5' in wikidata_entry.instance_of.split(';'):
-            result.update({
-                'date_of_birth': wikidata_entry.date_of_birth,
-                'date_of_birth_accuracy': wikidata_entry.date_of_birth_accuracy,
-                'date_of_death': wikidata_entry.date_of_death,
-                'date_of_death_accuracy': wikidata_entry.date_of_death_accuracy,
-            })
-    
-        if not self.restrict_fields:
-            result.update({
-                'url': u'https://www.wikidata.org/wiki/{name}'.format(name=encoding.escape_uri_path(wikidata_entry.wikidata_id)),
-                'instance_of': wikidata_entry.instance_of.split(';'),
-                'burial_plot_reference': wikidata_entry.burial_plot_reference,
-                'wikimedia_commons_category': wikidata_entry.wikimedia_commons_category,
-            })
+            result.update(self.columns_dict(wikidata_entry, ['date_of_birth', 'date_of_birth_accuracy', 'date_of_death', 'date_of_death_accuracy']))
         
+        if not self.restrict_fields:
+            result.update(self.columns_dict(wikidata_entry, ['burial_plot_reference', 'wikimedia_commons_category']))
+            if self.requested('url'):
+                result['url'] = u'https://www.wikidata.org/wiki/{name}'.format(name=encoding.escape_uri_path(wikidata_entry.wikidata_id))
+            if self.requested('instance_of'):
+                result['instance_of'] = wikidata_entry.instance_of.split(';')
+            
             if 'Q5' in wikidata_entry.instance_of.split(';'):
-                result.update({
-                    'sex_or_gender': wikidata_entry.sex_or_gender,
-                    'occupations': wikidata_entry.occupations.split(';'),
-                    'wikimedia_commons_grave_category': wikidata_entry.wikimedia_commons_grave_category,
-                })
-            else:
-                result.update({
-                    'grave_of': wikidata_entry.grave_of_wikidata.split(';'),
-                })
-    
-        localizations = []
-        if self.languages:
-            for language in self.languages:
-                wikidata_localized_entry = wikidata_entry.localizations.filter(language=language).first()
-                if wikidata_localized_entry:
-                    localization = {
-                        'id': wikidata_localized_entry.pk,
-                        'language_code': language.code,
-                        'name': wikidata_localized_entry.name,
-                        'sorting_name': wikidata_localized_entry.sorting_name(),
-                        'description': wikidata_localized_entry.description,
-                        'wikipedia': self.wikipedia_page_dict(wikidata_localized_entry),
-                    }
-                    localizations.append(localization)
+                result.update(self.columns_dict(wikidata_entry, ['sex_or_gender', 'wikimedia_commons_grave_category']))
+                if self.requested('occupations'):
+                    result['occupations'] = wikidata_entry.occupations.split(';')
+            elif self.requested('grave_of'):
+                result['grave_of'] = wikidata_entry.grave_of_wikidata.split(';')
         
-        result['localizations'] = localizations
+        if self.requested('localizations'):
+            localizations = []
+            for language, wikidata_localized_entry in self.localizations(wikidata_entry):
+                localization = self.columns_dict(wikidata_localized_entry, ['id', 'name', 'description'], path=('localizations',))
+                if self.requested('localizations', 'language_code'):
+                    localization['language_code'] = language.code
+                if self.requested('localizations', 'sorting_name'):
+                    localization['sorting_name'] = wikidata_localized_entry.sorting_name()
+                if self.requested('localizations', 'wikipedia'):
+                    localization['wikipedia'] = self.wikipedia_page_dict(language, wikidata_localized_entry)
+                localizations.append(localization)
+            result['localizations'] = localizations
         
         return result
     
-    def wikipedia_page_dict(self, wikidata_localized_entry):
-        wikipedia_page = WikipediaPage.objects.filter(wikidata_localized_entry=wikidata_localized_entry).first()
+    def wikipedia_page_dict(self, language, wikidata_localized_entry):
+        try:
+            wikipedia_page = wikidata_localized_entry.wikipedia_page
+        except WikipediaPage.DoesNotExist:
+            wikipedia_page = None
+        
         if wikipedia_page:
-            result = {
-                'id': wikipedia_page.pk,
-                'title': wikipedia_page.title,
-                'intro': wikipedia_page.intro,
-            }
+            path = ('localizations', 'wikipedia')
+            result = self.columns_dict(wikipedia_page, ['id', 'title', 'intro'], path=path)
             
             if not self.restrict_fields:
-                result.update({
-                    'default_sort': wikipedia_page.default_sort,
-                    'url': u'https://{language}.wikipedia.org/wiki/{name}'.format(language=wikidata_localized_entry.language.code, name=encoding.escape_uri_path(wikidata_localized_entry.wikipedia)),
-                })
+                result.update(self.columns_dict(wikipedia_page, ['default_sort'], path=path))
+                if self.requested(*(path + ('url',))):
+                    result['url'] = u'https://{language}.wikipedia.org/wiki/{name}'.format(language=language.code, name=encoding.escape_uri_path(wikidata_localized_entry.wikipedia))
         else:
             result = None
         
@@ -302,19 +613,20 @@ class SuperLachaiseEncoder(object):
     
     def wikimedia_commons_category_dict(self, wikimedia_commons_category):
         if wikimedia_commons_category:
-            result = {
-                'wikimedia_commons_id': wikimedia_commons_category.wikimedia_commons_id,
-                'category_members': [{'wikimedia_commons_id': member} for member in wikimedia_commons_category.category_members_list()],
-            }
+            result = self.columns_dict(wikimedia_commons_category, ['wikimedia_commons_id'])
             
-            if wikimedia_commons_category.main_image:
-                result['main_image'] = {
-                    'wikimedia_commons_id': wikimedia_commons_category.main_image,
-                }
-            else:
-                result['main_image'] = None
+            if self.requested('category_members'):
+                result['category_members'] = [{'wikimedia_commons_id': member} for member in wikimedia_commons_category.category_members_list()]
+            
+            if self.requested('main_image'):
+                if wikimedia_commons_category.main_image:
+                    result['main_image'] = {
+                        'wikimedia_commons_id': wikimedia_commons_category.main_image,
+                    }
+                else:
+                    result['main_image'] = None
     
-            if not self.restrict_fields:
+            if not self.restrict_fields and self.requested('url'):
                 result.update({
                     'url': u'https://commons.wikimedia.org/wiki/{name}'.format(name=encoding.escape_uri_path(wikimedia_commons_category.wikimedia_commons_id)),
                 })
@@ -325,16 +637,9 @@ class SuperLachaiseEncoder(object):
     
     def wikimedia_commons_file_dict(self, wikimedia_commons_file):
         if wikimedia_commons_file:
-            result = {
-                'wikimedia_commons_id': wikimedia_commons_file.wikimedia_commons_id,
-                'author': wikimedia_commons_file.author,
-                'license': wikimedia_commons_file.license,
-                'url_512px': wikimedia_commons_file.url_512px,
-                'url_1024px': wikimedia_commons_file.url_1024px,
-                'url_2048px': wikimedia_commons_file.url_2048px,
-            }
+            result = self.columns_dict(wikimedia_commons_file, ['wikimedia_commons_id', 'author', 'license', 'url_512px', 'url_1024px', 'url_2048px'])
             
-            if not self.restrict_fields:
+            if not self.restrict_fields and self.requested('url'):
                 result.update({
                     'url': u'https://commons.wikimedia.org/wiki/{name}'.format(name=encoding.escape_uri_path(wikimedia_commons_file.wikimedia_commons_id)),
                 })
@@ -346,9 +651,10 @@ class SuperLachaiseEncoder(object):
 def get_languages(request):
     language_code = request.GET.get('language', None)
     if language_code:
-        languages = Language.objects.filter(code=language_code)
+        language = reference_data.language(language_code)
+        languages = [language] if language else []
     else:
-        languages = Language.objects.all()
+        languages = reference_data.languages()
 
     return languages
 
@@ -378,11 +684,220 @@ def get_restrict_fields(request, default=False):
     
     return result
 
+def get_since(request):
+    try:
+        result = request.GET.get('since', None)
+        if result:
+            result = int(result)
+            if result < 0:
+                raise ValueError
+        
+        return result
+    except:
+        raise SuspiciousOperation('Invalid parameter : since')
+
+def get_ids(request):
+    try:
+        if request.method == 'POST' and request.META.get('CONTENT_TYPE', '').startswith('application/json'):
+            result = [unicode(value) for value in json.loads(request.body)['ids']]
+        else:
+            params = request.POST if request.method == 'POST' else request.GET
+            # Values are separated by | like in MediaWiki APIs, since titles may contain commas
+            result = [value for param in params.getlist('ids') for value in param.split('|') if value]
+        
+        # Remove duplicates, keeping the order of the request
+        unique_values = []
+        for value in result:
+            if not value in unique_values:
+                unique_values.append(value)
+            if len(unique_values) > MAX_PAGE_SIZE:
+                raise ValueError
+        if not unique_values:
+            raise ValueError
+        
+        return unique_values
+    except:
+        raise SuspiciousOperation('Invalid parameter : ids')
+
+def get_fields(request):
+    try:
+        result = request.GET.get('fields', None)
+        if result is not None:
+            # Parse 'id,localizations.name' into {'id': None, 'localizations': {'name': None}}, None requesting all subfields
+            fields = result
+            result = {}
+            for field in fields.split(','):
+                if not FIELD_REGEX.match(field):
+                    raise ValueError
+                tree = result
+                keys = field.split('.')
+                for key in keys[:-1]:
+                    if key in tree and tree[key] is None:
+                        break
+                    tree = tree.setdefault(key, {})
+                else:
+                    tree[keys[-1]] = None
+        
+        return result
+    except:
+        raise SuspiciousOperation('Invalid parameter : fields')
+
+def get_page_size(request):
+    try:
+        result = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+        if result < 1 or result > MAX_PAGE_SIZE:
+            raise ValueError
+        
+        return result
+    except:
+        raise SuspiciousOperation('Invalid parameter : page_size')
+
+def get_cursor(request):
+    try:
+        result = request.GET.get('cursor', None)
+        if result is not None:
+            result = CursorPage.decode_cursor(result)
+        
+        return result
+    except:
+        raise SuspiciousOperation('Invalid parameter : cursor')
+
+def get_count(request):
+    result = request.GET.get('count', True)
+    
+    if result == 'False' or result == 'false' or result == '0' or result == 0:
+        result = False
+    else:
+        result = True
+    
+    return result
+
+def paginate(request, queryset, order_field):
+    page_size = get_page_size(request)
+    cursor = get_cursor(request)
+    
+    if cursor is not None:
+        if not order_field:
+            # The order of the queryset is not a unique field
+            raise SuspiciousOperation('Invalid parameter : cursor')
+        if cursor[1] is not None and not CursorPage.is_valid_value(order_field, cursor[1]):
+            raise SuspiciousOperation('Invalid parameter : cursor')
+        try:
+            return CursorPage(queryset, order_field, cursor, page_size, count=get_count(request))
+        except (TypeError, ValueError):
+            # The cursor values do not have the types of the order fields
+            raise SuspiciousOperation('Invalid parameter : cursor')
+    
+    paginator = CachedCountPaginator(queryset, page_size)
+    page = request.GET.get('page')
+    try:
+        page_content = paginator.page(page)
+    except PageNotAnInteger:
+        # If page is not an integer, deliver first page.
+        page_content = paginator.page(1)
+    except EmptyPage:
+        # If page is out of range (e.g. 9999), deliver last page of results.
+        page_content = paginator.page(paginator.num_pages)
+    
+    return page_content
+
+def first_by(queryset, field):
+    """ Keep the object with the smallest pk for each value of a field, so that the field can be a pagination key """
+    return queryset.model.objects.filter(pk__in=queryset.order_by().values(field).annotate(first_pk=Min('pk')).values('first_pk'))
+
+def export_fragments(encoder, queryset):
+    """ Yield the fragments of the objects of a queryset, reading chunks ordered by pk after the last read pk """
+    fragment_store = FragmentStore(encoder)
+    queryset = queryset.only('pk', 'modified').order_by('pk')
+    last_pk = None
+    while True:
+        if last_pk is None:
+            chunk = list(queryset[:EXPORT_CHUNK_SIZE])
+        else:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:EXPORT_CHUNK_SIZE])
+        if not chunk:
+            break
+        
+        for fragment in fragment_store.fragments(queryset.model, chunk):
+            yield fragment
+        
+        last_pk = chunk[-1].pk
+
+def export(request, model):
+    languages = get_languages(request)
+    restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
+    modified_since = get_modified_since(request)
+    
+    if modified_since:
+        queryset = model.objects.filter(modified__gt=modified_since)
+    else:
+        queryset = model.objects.all()
+    
+    encoder = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields, response_format=renderers.JSON)
+    
+    return renderers.stream(export_fragments(encoder, queryset))
+
+def batch(request, model):
+    languages = get_languages(request)
+    restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
+    ids = get_ids(request)
+    
+    objects = changes.natural_key_objects(model, ids)
+    
+    obj_to_encode = {
+        'result': [objects[id] for id in ids if id in objects],
+        'not_found': [id for id in ids if not id in objects],
+    }
+    
+    content = FragmentStore(SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)).encode(obj_to_encode)
+    
+    return renderers.render(request, content)
+
 def get_search(request):
     search = request.GET.get('search', u'')
     
     return search
 
+def get_fuzzy(request):
+    result = request.GET.get('fuzzy', False)
+    
+    if result == 'False' or result == 'false' or result == '0' or result == 0:
+        result = False
+    elif result or result == '':
+        result = True
+    
+    return result
+
+def get_near(request):
+    try:
+        result = request.GET.get('near', None)
+        if result:
+            (latitude, longitude) = [float(coordinate) for coordinate in result.split(',')]
+            radius = float(request.GET.get('radius', DEFAULT_RADIUS))
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius <= MAX_RADIUS):
+                raise ValueError
+            result = (latitude, longitude, radius)
+        
+        return result
+    except:
+        raise SuspiciousOperation('Invalid parameter : near')
+
+def get_bbox(request):
+    try:
+        result = request.GET.get('bbox', None)
+        if result:
+            # Same order as OpenStreetMap and GeoJSON bounding boxes
+            (min_longitude, min_latitude, max_longitude, max_latitude) = [float(coordinate) for coordinate in result.split(',')]
+            if not (-90 <= min_latitude <= max_latitude <= 90 and -180 <= min_longitude <= max_longitude <= 180):
+                raise ValueError
+            result = (min_latitude, min_longitude, max_latitude, max_longitude)
+        
+        return result
+    except:
+        raise SuspiciousOperation('Invalid parameter : bbox')
+
 def get_categories(request):
     categories = request.GET.getlist('category', [])
     
@@ -450,6 +965,7 @@ def get_died_before(request):
         raise SuspiciousOperation('Invalid parameter : died_before')
 
 @require_http_methods(["GET"])
+@cache_response
 def licence(request):
     content = [request.build_absolute_uri(reverse(licence)) + '\n']
     
@@ -459,10 +975,15 @@ def licence(request):
     return HttpResponse('\n'.join(content), content_type='text/plain; charset=utf-8')
 
 @require_http_methods(["GET"])
+@cache_response
 def openstreetmap_element_list(request, type=None):
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
     modified_since = get_modified_since(request)
     search = get_search(request)
+    fuzzy = get_fuzzy(request)
+    near = get_near(request)
+    bbox = get_bbox(request)
     
     if modified_since:
         openstreetmap_elements = OpenStreetMapElement.objects.filter(modified__gt=modified_since)
@@ -472,58 +993,60 @@ def openstreetmap_element_list(request, type=None):
     if type:
         openstreetmap_elements = openstreetmap_elements.filter(type=type)
     
-    for search_term in search.split():
-        openstreetmap_elements = openstreetmap_elements.filter( \
-            Q(name__icontains=search_term) \
-        )
+    openstreetmap_elements = search_index.search(openstreetmap_elements, search, fuzzy=fuzzy)
     
-    openstreetmap_elements = openstreetmap_elements.order_by('sorting_name').distinct('sorting_name')
+    if bbox:
+        openstreetmap_elements = openstreetmap_elements.filter(geo.bbox_filter(*bbox))
     
-    paginator = Paginator(openstreetmap_elements, 25)
-    page = request.GET.get('page')
-    try:
-        page_content = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        page_content = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        page_content = paginator.page(paginator.num_pages)
+    # Elements with the same sorting name are listed once
+    openstreetmap_elements = first_by(openstreetmap_elements, 'sorting_name').order_by('sorting_name')
+    
+    encoder = SuperLachaiseEncoder(request, restrict_fields=restrict_fields, fields=fields)
+    if near:
+        openstreetmap_elements = geo.near(openstreetmap_elements, *near)
+        page_content = paginate(request, openstreetmap_elements.only('pk', 'modified'), None)
+    else:
+        page_content = paginate(request, openstreetmap_elements.only('pk', 'modified', 'sorting_name'), 'sorting_name')
     
     obj_to_encode = {
         'result': page_content.object_list,
         'page': page_content,
     }
     
-    content = SuperLachaiseEncoder(request, restrict_fields=restrict_fields).encode(obj_to_encode)
+    content = FragmentStore(encoder).encode(obj_to_encode)
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def openstreetmap_element(request, type=None, id=None, superlachaisepoi_id=None):
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
     
     try:
         if superlachaisepoi_id:
-            superlachaise_poi = SuperLachaisePOI.objects.get(pk=superlachaisepoi_id)
+            superlachaise_poi = SuperLachaisePOI.objects.select_related('openstreetmap_element').get(pk=superlachaisepoi_id)
             openstreetmap_element = superlachaise_poi.openstreetmap_element
             if not openstreetmap_element:
                 raise OpenStreetMapElement.DoesNotExist
         else:
-            openstreetmap_element = OpenStreetMapElement.objects.get(type=type, openstreetmap_id=id)
+            openstreetmap_element = OpenStreetMapElement.objects.only('pk', 'modified').get(type=type, openstreetmap_id=id)
     except OpenStreetMapElement.DoesNotExist:
         raise Http404(_('OpenStreetMap element does not exist'))
     
-    content = SuperLachaiseEncoder(request, restrict_fields=restrict_fields).encode({'result': openstreetmap_element})
+    content = FragmentStore(SuperLachaiseEncoder(request, restrict_fields=restrict_fields, fields=fields)).encode({'result': openstreetmap_element})
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def wikidata_entry_list(request, superlachaisepoi_id=None, relation_type=None):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
     modified_since = get_modified_since(request)
     search = get_search(request)
+    fuzzy = get_fuzzy(request)
     
     if modified_since:
         wikidata_entries = WikidataEntry.objects.filter(modified__gt=modified_since)
@@ -531,170 +1054,152 @@ def wikidata_entry_list(request, superlachaisepoi_id=None, relation_type=None):
         wikidata_entries = WikidataEntry.objects.all()
     
     if superlachaisepoi_id and relation_type:
-        wikidata_entries = wikidata_entries.filter(superlachaisewikidatarelation__relation_type=relation_type, superlachaisewikidatarelation__superlachaise_poi__pk=superlachaisepoi_id)
+        # Filter on a subquery rather than a join, which never produces duplicate rows
+        wikidata_entries = wikidata_entries.filter(pk__in=SuperLachaiseWikidataRelation.objects.filter(relation_type=relation_type, superlachaise_poi__pk=superlachaisepoi_id).values('wikidata_entry_id'))
     
-    for search_term in search.split():
-        wikidata_entries = wikidata_entries.filter( \
-            Q(localizations__name__icontains=search_term) \
-            | Q(localizations__description__icontains=search_term) \
-            | Q(localizations__wikipedia__icontains=search_term) \
-        )
+    wikidata_entries = search_index.search(wikidata_entries, search, fuzzy=fuzzy)
     
-    wikidata_entries = wikidata_entries.order_by('wikidata_id').distinct('wikidata_id')
+    wikidata_entries = wikidata_entries.order_by('wikidata_id')
     
-    paginator = Paginator(wikidata_entries, 25)
-    page = request.GET.get('page')
-    try:
-        page_content = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        page_content = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        page_content = paginator.page(paginator.num_pages)
+    encoder = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)
+    page_content = paginate(request, wikidata_entries.only('pk', 'modified', 'wikidata_id'), 'wikidata_id')
     
     obj_to_encode = {
         'result': page_content.object_list,
         'page': page_content,
     }
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode(obj_to_encode)
+    content = FragmentStore(encoder).encode(obj_to_encode)
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def wikidata_entry(request, id):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
+    
+    encoder = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)
     
     try:
-        wikidata_entry = WikidataEntry.objects.get(wikidata_id=id)
+        wikidata_entry = WikidataEntry.objects.only('pk', 'modified').get(wikidata_id=id)
     except WikidataEntry.DoesNotExist:
         raise Http404(_('Wikidata entry does not exist'))
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode({'result': wikidata_entry})
+    content = FragmentStore(encoder).encode({'result': wikidata_entry})
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def wikimedia_commons_category_list(request):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
     modified_since = get_modified_since(request)
     search = get_search(request)
+    fuzzy = get_fuzzy(request)
     
     if modified_since:
         wikimedia_commons_categories = WikimediaCommonsCategory.objects.filter(modified__gt=modified_since)
     else:
         wikimedia_commons_categories = WikimediaCommonsCategory.objects.all()
     
-    for search_term in search.split():
-        wikimedia_commons_categories = wikimedia_commons_categories.filter( \
-            Q(wikimedia_commons_id__icontains=search_term) \
-            | Q(main_image__icontains=search_term) \
-        )
+    wikimedia_commons_categories = search_index.search(wikimedia_commons_categories, search, fuzzy=fuzzy)
     
-    wikimedia_commons_categories = wikimedia_commons_categories.order_by('wikimedia_commons_id').distinct('wikimedia_commons_id')
+    wikimedia_commons_categories = wikimedia_commons_categories.order_by('wikimedia_commons_id')
     
-    paginator = Paginator(wikimedia_commons_categories, 25)
-    page = request.GET.get('page')
-    try:
-        page_content = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        page_content = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        page_content = paginator.page(paginator.num_pages)
+    encoder = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)
+    page_content = paginate(request, wikimedia_commons_categories.only('pk', 'modified', 'wikimedia_commons_id'), 'wikimedia_commons_id')
     
     obj_to_encode = {
         'result': page_content.object_list,
         'page': page_content,
     }
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode(obj_to_encode)
+    content = FragmentStore(encoder).encode(obj_to_encode)
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def wikimedia_commons_category(request, id=None, superlachaisepoi_id=None):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
     
     try:
         if superlachaisepoi_id:
-            superlachaise_poi = SuperLachaisePOI.objects.get(pk=superlachaisepoi_id)
+            superlachaise_poi = SuperLachaisePOI.objects.select_related('wikimedia_commons_category').get(pk=superlachaisepoi_id)
             wikimedia_commons_category = superlachaise_poi.wikimedia_commons_category
             if not wikimedia_commons_category:
                 raise WikimediaCommonsCategory.DoesNotExist
         else:
-            wikimedia_commons_category = WikimediaCommonsCategory.objects.get(wikimedia_commons_id=id)
+            wikimedia_commons_category = WikimediaCommonsCategory.objects.only('pk', 'modified').get(wikimedia_commons_id=id)
     except WikimediaCommonsCategory.DoesNotExist:
         raise Http404(_('Wikimedia Commons category does not exist'))
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode({'result': wikimedia_commons_category})
+    content = FragmentStore(SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)).encode({'result': wikimedia_commons_category})
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def wikimedia_commons_file_list(request):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
     modified_since = get_modified_since(request)
     search = get_search(request)
+    fuzzy = get_fuzzy(request)
     
     if modified_since:
         wikimedia_commons_files = WikimediaCommonsFile.objects.filter(modified__gt=modified_since)
     else:
         wikimedia_commons_files = WikimediaCommonsFile.objects.all()
     
-    for search_term in search.split():
-        wikimedia_commons_files = wikimedia_commons_files.filter( \
-            Q(wikimedia_commons_id__icontains=search_term)
-        )
+    wikimedia_commons_files = search_index.search(wikimedia_commons_files, search, fuzzy=fuzzy)
     
-    wikimedia_commons_files = wikimedia_commons_files.order_by('wikimedia_commons_id').distinct('wikimedia_commons_id')
+    wikimedia_commons_files = wikimedia_commons_files.order_by('wikimedia_commons_id')
     
-    paginator = Paginator(wikimedia_commons_files, 25)
-    page = request.GET.get('page')
-    try:
-        page_content = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        page_content = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        page_content = paginator.page(paginator.num_pages)
+    encoder = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)
+    page_content = paginate(request, wikimedia_commons_files.only('pk', 'modified', 'wikimedia_commons_id'), 'wikimedia_commons_id')
     
     obj_to_encode = {
         'result': page_content.object_list,
         'page': page_content,
     }
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode(obj_to_encode)
+    content = FragmentStore(encoder).encode(obj_to_encode)
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def wikimedia_commons_file(request, id=None):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
     
     try:
-        wikimedia_commons_file = WikimediaCommonsFile.objects.get(wikimedia_commons_id=id)
+        wikimedia_commons_file = WikimediaCommonsFile.objects.only('pk', 'modified').get(wikimedia_commons_id=id)
     except WikimediaCommonsFile.DoesNotExist:
         raise Http404(_('Wikimedia Commons file does not exist'))
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode({'result': wikimedia_commons_file})
+    content = FragmentStore(SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)).encode({'result': wikimedia_commons_file})
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def superlachaise_category_list(request, superlachaisepoi_id=None):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
     modified_since = get_modified_since(request)
     search = get_search(request)
+    fuzzy = get_fuzzy(request)
     
     if modified_since:
         superlachaise_categories = SuperLachaiseCategory.objects.filter(modified__gt=modified_since)
@@ -702,130 +1207,117 @@ def superlachaise_category_list(request, superlachaisepoi_id=None):
         superlachaise_categories = SuperLachaiseCategory.objects.all()
     
     if superlachaisepoi_id:
-        superlachaise_categories = superlachaise_categories.filter(superlachaisecategoryrelation__superlachaise_poi__pk=superlachaisepoi_id)
+        superlachaise_categories = superlachaise_categories.filter(pk__in=SuperLachaiseCategoryRelation.objects.filter(superlachaise_poi__pk=superlachaisepoi_id).values('superlachaise_category_id'))
     
-    for search_term in search.split():
-        superlachaise_categories = superlachaise_categories.filter( \
-            Q(code__icontains=search_term) \
-            | Q(type__icontains=search_term) \
-            | Q(values__icontains=search_term) \
-            | Q(localizations__name__icontains=search_term) \
-        )
+    superlachaise_categories = search_index.search(superlachaise_categories, search, fuzzy=fuzzy)
     
-    superlachaise_categories = superlachaise_categories.order_by('code').distinct('code')
+    superlachaise_categories = superlachaise_categories.order_by('code')
     
-    paginator = Paginator(superlachaise_categories, 25)
-    page = request.GET.get('page')
-    try:
-        page_content = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        page_content = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        page_content = paginator.page(paginator.num_pages)
+    encoder = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)
+    page_content = paginate(request, superlachaise_categories.only('pk', 'modified', 'code'), 'code')
     
     obj_to_encode = {
         'result': page_content.object_list,
         'page': page_content,
     }
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode(obj_to_encode)
+    content = FragmentStore(encoder).encode(obj_to_encode)
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def superlachaise_category(request, id):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
+    
+    encoder = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)
     
     try:
-        superlachaise_category = SuperLachaiseCategory.objects.get(code=id)
+        superlachaise_category = SuperLachaiseCategory.objects.only('pk', 'modified').get(code=id)
     except SuperLachaiseCategory.DoesNotExist:
         raise Http404(_('SuperLachaise category does not exist'))
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode({'result': superlachaise_category})
+    content = FragmentStore(encoder).encode({'result': superlachaise_category})
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def superlachaise_poi_list(request):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
     modified_since = get_modified_since(request)
     search = get_search(request)
+    fuzzy = get_fuzzy(request)
     categories = get_categories(request)
     sector = get_sector(request)
     born_after = get_born_after(request)
     born_before = get_born_before(request)
     died_after = get_died_after(request)
     died_before = get_died_before(request)
+    near = get_near(request)
+    bbox = get_bbox(request)
     
     if modified_since:
         superlachaise_pois = SuperLachaisePOI.objects.filter(modified__gt=modified_since)
     else:
         superlachaise_pois = SuperLachaisePOI.objects.all()
     
-    for search_term in search.split():
-        superlachaise_pois = superlachaise_pois.filter( \
-            Q(localizations__name__icontains=search_term) \
-            | Q(localizations__description__icontains=search_term) \
-            | Q(wikidata_entries__localizations__name__icontains=search_term) \
-            | Q(wikidata_entries__localizations__description__icontains=search_term) \
-            | Q(wikidata_entries__localizations__wikipedia__icontains=search_term) \
-        )
+    superlachaise_pois = search_index.search(superlachaise_pois, search, fuzzy=fuzzy)
     
+    # Category, sector and date filters are evaluated on the bitmaps of the filter index instead of joining their relations
     # Apply AND to multiple 'category' keys in query ex. 'category=cinema&category=women'
-    for category in categories:
-        # Apply OR to multiple categories in value ex. 'category=cinema+theatre'
-        superlachaise_pois = superlachaise_pois.filter(superlachaise_categories__code__in=category.split())
-    
-    if sector:
-        superlachaise_pois = superlachaise_pois.filter(wikidata_entries__burial_plot_reference__in=sector.split())
-    
-    if born_after:
-        superlachaise_pois = superlachaise_pois.filter(wikidata_entries__date_of_birth__gte=born_after)
-    if born_before:
-        superlachaise_pois = superlachaise_pois.filter(wikidata_entries__date_of_birth__lte=born_before)
-    if died_after:
-        superlachaise_pois = superlachaise_pois.filter(wikidata_entries__date_of_death__gte=died_after)
-    if died_before:
-        superlachaise_pois = superlachaise_pois.filter(wikidata_entries__date_of_death__lte=died_before)
-    
-    superlachaise_pois = superlachaise_pois.order_by('openstreetmap_element_id').distinct('openstreetmap_element_id')
-    
-    paginator = Paginator(superlachaise_pois, 25)
-    page = request.GET.get('page')
-    try:
-        page_content = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        page_content = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        page_content = paginator.page(paginator.num_pages)
-    
-    wikidata_entries = superlachaise_categories = []
-    if page_content.object_list:
-        wikidata_entries = WikidataEntry.objects.filter(superlachaisewikidatarelation__superlachaise_poi__in=page_content.object_list).distinct()
-        superlachaise_categories = SuperLachaiseCategory.objects.filter(superlachaisecategoryrelation__superlachaise_poi__in=page_content.object_list).distinct()
+    # Apply OR to multiple categories in value ex. 'category=cinema+theatre'
+    filters = {
+        'categories': categories,
+        'sector': sector,
+        'born_after': born_after,
+        'born_before': born_before,
+        'died_after': died_after,
+        'died_before': died_before,
+    }
+    if filter_index.has_filters(**filters):
+        superlachaise_pois = superlachaise_pois.filter(pk__in=filter_index.matching_ids(filter_index.load(), **filters))
+    
+    if bbox:
+        superlachaise_pois = superlachaise_pois.filter(geo.bbox_filter(*bbox, prefix='openstreetmap_element__'))
+    
+    # POIs without OpenStreetMap element are listed last, by pk, so that cursors never hold a null key
+    superlachaise_pois = superlachaise_pois.annotate(
+        without_openstreetmap_element=Case(When(openstreetmap_element_id__isnull=True, then=Value(1)), default=Value(0), output_field=IntegerField()),
+        openstreetmap_element_key=Coalesce('openstreetmap_element_id', Value(0), output_field=IntegerField()),
+    ).order_by('without_openstreetmap_element', 'openstreetmap_element_key', 'pk')
+    
+    encoder = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)
+    if near:
+        superlachaise_pois = geo.near(superlachaise_pois, *near, prefix='openstreetmap_element__')
+        page_content = paginate(request, superlachaise_pois.only('pk', 'modified'), None)
+    else:
+        page_content = paginate(request, superlachaise_pois.only('pk', 'modified'), ('without_openstreetmap_element', 'openstreetmap_element_key', 'pk'))
     
     obj_to_encode = {
         'result': page_content.object_list,
         'page': page_content,
     }
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode(obj_to_encode)
+    content = FragmentStore(encoder).encode(obj_to_encode)
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
 def superlachaise_poi(request, id):
     languages = get_languages(request)
     restrict_fields = get_restrict_fields(request)
+    fields = get_fields(request)
+    
+    encoder = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields, fields=fields)
     
     try:
-        superlachaise_poi = SuperLachaisePOI.objects.get(pk=id)
+        superlachaise_poi = SuperLachaisePOI.objects.only('pk', 'modified').get(pk=id)
     except SuperLachaisePOI.DoesNotExist:
         raise Http404(_('SuperLachaise POI does not exist'))
     
@@ -833,14 +1325,220 @@ def superlachaise_poi(request, id):
         'result': superlachaise_poi,
     }
     
-    content = SuperLachaiseEncoder(request, languages=languages, restrict_fields=restrict_fields).encode(obj_to_encode)
+    content = FragmentStore(encoder).encode(obj_to_encode)
+    
+    return renderers.render(request, content)
+
+@require_http_methods(["GET"])
+@cache_response
+def superlachaise_poi_facets(request):
+    modified_since = get_modified_since(request)
+    search = get_search(request)
+    fuzzy = get_fuzzy(request)
+    categories = get_categories(request)
+    sector = get_sector(request)
+    born_after = get_born_after(request)
+    born_before = get_born_before(request)
+    died_after = get_died_after(request)
+    died_before = get_died_before(request)
+    near = get_near(request)
+    bbox = get_bbox(request)
+    
+    # Apply the filters of superlachaise_poi_list to the bitmaps of the filter index
+    index = filter_index.load()
+    superlachaise_pois_bitmap = filter_index.matching_bitmap(index, categories=categories, sector=sector, born_after=born_after, born_before=born_before, died_after=died_after, died_before=died_before)
+    
+    # The other filters are not indexed and need a query
+    if modified_since or search or near or bbox:
+        if modified_since:
+            superlachaise_pois = SuperLachaisePOI.objects.filter(modified__gt=modified_since)
+        else:
+            superlachaise_pois = SuperLachaisePOI.objects.all()
+        
+        superlachaise_pois = search_index.search(superlachaise_pois, search, fuzzy=fuzzy)
+        
+        if bbox:
+            superlachaise_pois = superlachaise_pois.filter(geo.bbox_filter(*bbox, prefix='openstreetmap_element__'))
+        if near:
+            superlachaise_pois = geo.near(superlachaise_pois, *near, prefix='openstreetmap_element__')
+        
+        superlachaise_pois_bitmap &= filter_index.bitmap(list(superlachaise_pois.order_by().values_list('pk', flat=True)))
+    
+    obj_to_encode = {
+        'result': filter_index.facet_counts(index, superlachaise_pois_bitmap),
+    }
+    
+    content = SuperLachaiseEncoder(request).encode(obj_to_encode)
+    
+    return renderers.render(request, content)
+
+@require_http_methods(["GET"])
+@cache_response
+def superlachaise_poi_sectors(request):
+    # Sectors are listed in numerical order, then the others alphabetically
+    sector_counts = counters.values(Counter.SECTOR_POIS)
+    sectors = sorted(sector_counts.keys(), key=lambda sector: (0, int(sector), sector) if sector.isdigit() else (1, 0, sector))
+    
+    obj_to_encode = {
+        'result': [{
+            'sector': sector,
+            'count': sector_counts[sector],
+            'url': request.build_absolute_uri(u'{path}?sector={sector}'.format(path=reverse(superlachaise_poi_list), sector=sector).replace(' ', '+')),
+        } for sector in sectors],
+    }
+    
+    content = SuperLachaiseEncoder(request).encode(obj_to_encode)
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)
 
 @require_http_methods(["GET"])
+@cache_response
+def superlachaise_poi_geojson(request):
+    languages = get_languages(request)
+    
+    superlachaise_pois = SuperLachaisePOI.objects.filter(openstreetmap_element__isnull=False).select_related('openstreetmap_element', 'main_image').prefetch_related(
+        Prefetch('localizations', queryset=SuperLachaiseLocalizedPOI.objects.filter(language__in=languages).select_related('language').order_by('language__code')),
+        Prefetch('superlachaise_categories', queryset=SuperLachaiseCategory.objects.order_by('code')),
+    ).order_by('pk')
+    
+    features = []
+    for superlachaise_poi in superlachaise_pois:
+        openstreetmap_element = superlachaise_poi.openstreetmap_element
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [float(openstreetmap_element.longitude), float(openstreetmap_element.latitude)]},
+            'properties': {
+                'id': superlachaise_poi.pk,
+                'localizations': [{'language_code': localization.language.code, 'name': localization.name} for localization in superlachaise_poi.localizations.all()],
+                'superlachaise_categories': [{'code': superlachaise_category.code} for superlachaise_category in superlachaise_poi.superlachaise_categories.all()],
+                'main_image_url': superlachaise_poi.main_image.url_512px if superlachaise_poi.main_image else None,
+            },
+        })
+    
+    obj_to_encode = {
+        'type': 'FeatureCollection',
+        'features': features,
+    }
+    
+    content = SuperLachaiseEncoder(request).encode(obj_to_encode)
+    
+    return renderers.render(request, content, renderers.GEOJSON_CONTENT_TYPES)
+
+@require_http_methods(["GET"])
+@cache_response
+def map_tile(request, zoom, x, y):
+    zoom = int(zoom)
+    if zoom < map_tiles.MIN_ZOOM or zoom > map_tiles.MAX_ZOOM:
+        raise Http404(_('Map tiles are computed for zoom levels {min_zoom} to {max_zoom}').format(min_zoom=map_tiles.MIN_ZOOM, max_zoom=map_tiles.MAX_ZOOM))
+    
+    # Tiles without POI are not stored ; stored tiles are compact JSON
+    response_format = renderers.negotiate_format(request)
+    content = MapTile.objects.filter(zoom=zoom, x=int(x), y=int(y)).values_list('content', flat=True).first()
+    if content is None and map_tiles.build_if_empty():
+        content = MapTile.objects.filter(zoom=zoom, x=int(x), y=int(y)).values_list('content', flat=True).first()
+    if content is None:
+        content = renderers.encode(response_format, map_tiles.empty_feature_collection())
+    elif response_format != renderers.JSON:
+        content = renderers.encode(response_format, renderers.json_backend().loads(content))
+    
+    return renderers.render(request, content, renderers.GEOJSON_CONTENT_TYPES)
+
+# Batch views return the objects of the ids parameter, read from the query string or the body of POST requests
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@cache_response
+def openstreetmap_element_batch(request):
+    return batch(request, OpenStreetMapElement)
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@cache_response
+def wikidata_entry_batch(request):
+    return batch(request, WikidataEntry)
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@cache_response
+def wikimedia_commons_category_batch(request):
+    return batch(request, WikimediaCommonsCategory)
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@cache_response
+def wikimedia_commons_file_batch(request):
+    return batch(request, WikimediaCommonsFile)
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@cache_response
+def superlachaise_category_batch(request):
+    return batch(request, SuperLachaiseCategory)
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@cache_response
+def superlachaise_poi_batch(request):
+    return batch(request, SuperLachaisePOI)
+
+# Export views stream every object, and are not cached
+
+@require_http_methods(["GET"])
+def openstreetmap_element_export(request):
+    return export(request, OpenStreetMapElement)
+
+@require_http_methods(["GET"])
+def wikidata_entry_export(request):
+    return export(request, WikidataEntry)
+
+@require_http_methods(["GET"])
+def wikimedia_commons_category_export(request):
+    return export(request, WikimediaCommonsCategory)
+
+@require_http_methods(["GET"])
+def wikimedia_commons_file_export(request):
+    return export(request, WikimediaCommonsFile)
+
+@require_http_methods(["GET"])
+def superlachaise_category_export(request):
+    return export(request, SuperLachaiseCategory)
+
+@require_http_methods(["GET"])
+def superlachaise_poi_export(request):
+    return export(request, SuperLachaisePOI)
+
+@require_http_methods(["GET"])
+@cache_response
+def change_list(request):
+    since = get_since(request)
+    
+    change_log_entries, has_more = changes.changes(since, CHANGES_BATCH_SIZE)
+    if change_log_entries:
+        next_since = change_log_entries[-1].pk
+    else:
+        next_since = since or 0
+    
+    encoder = SuperLachaiseEncoder(request)
+    obj_to_encode = {
+        'result': change_log_entries,
+        'next_since': next_since,
+        'has_more': has_more,
+    }
+    if has_more:
+        obj_to_encode['next_url'] = encoder.page_url(since=next_since)
+    
+    content = encoder.encode(obj_to_encode)
+    
+    return renderers.render(request, content)
+
+@require_http_methods(["GET"])
+@cache_response
 def objects(request):
     modified_since = get_modified_since(request)
     
+    if not modified_since:
+        object_counts = counters.values(Counter.OBJECTS)
+    
     objects = []
     
     for model, view in [
@@ -852,7 +1550,10 @@ def objects(request):
     ]:
         if modified_since:
             count = model.objects.filter(modified__gt=modified_since).count()
+        elif model.__name__ in object_counts:
+            count = object_counts[model.__name__]
         else:
+            # Counters are not updated yet
             count = model.objects.all().count()
         
         if request.GET:
@@ -872,4 +1573,4 @@ def objects(request):
     
     content = SuperLachaiseEncoder(request).encode(obj_to_encode)
     
-    return HttpResponse(content, content_type='application/json; charset=utf-8')
+    return renderers.render(request, content)